@@ -3,28 +3,121 @@ Flask server for Excel to Invoice generation.
 Provides drag-and-drop upload interface and mock invoice generation.
 Also includes a diagnostics page for testing QuickBooks connection.
 """
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Request, Response, current_app, render_template, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+import json
 import os
+import shutil
 import sys
+import tempfile
+import threading
 import time
 from datetime import datetime
 
-from excel_parser import parse_receiving_report
+from excel_parser import parse_receiving_report, COLUMN_MAPPING_VERSION, warm_up as warm_up_parser
 from invoice_generator import generate_mock_invoice
+from parse_cache import ParseCache, content_key
+from jobs import JobManager, JobQueueFull
+from ledger import get_ledger
+from line_items import LineItem, ImeiArray
 
 # Add parent directory to path for quickbooks_desktop imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from quickbooks_desktop.log import configure_logging, get_logger
+from quickbooks_desktop.metrics import get_metrics
+from quickbooks_desktop.progress import emit
+
+
+logger = get_logger('app')
+
+
+class ReportJSONProvider(DefaultJSONProvider):
+    """JSON provider that also serializes compact line items."""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, LineItem):
+            return o.to_dict()
+        if isinstance(o, ImeiArray):
+            return o.tolist()
+        return DefaultJSONProvider.default(o)
+
+
+class UploadRequest(Request):
+    """Request that keeps uploaded files in memory up to UPLOAD_SPOOL_MAX_BYTES."""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Werkzeug's default spills anything over 500KB to a temp file
+        return tempfile.SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_MAX_BYTES'], mode='w+b')
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.json = ReportJSONProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# .xlsx uploads at or above this size are parsed in streaming (read-only) mode
+app.config['STREAMING_PARSE_THRESHOLD'] = int(float(os.getenv('STREAMING_PARSE_THRESHOLD_MB', '2')) * 1024 * 1024)
+# Uploads are parsed straight from memory; only files above this size are
+# spilled to an anonymous temp file
+app.config['UPLOAD_SPOOL_MAX_BYTES'] = int(float(os.getenv('UPLOAD_SPOOL_MAX_MB', '16')) * 1024 * 1024)
 
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Log records are written by a background thread (QB_LOG_LEVEL=DEBUG dumps
+# full request XML)
+configure_logging()
 
 # Environment variable to toggle real QB vs mock mode
 # Default to True since we're working with real QuickBooks Desktop
 USE_REAL_QB = os.getenv('USE_REAL_QB', 'true').lower() == 'true'
 
+# Parsed reports are cached by file content so re-uploads skip parsing.
+# Set PARSE_CACHE_DIR to also keep a compressed copy on disk across restarts.
+PARSE_CACHE = ParseCache(
+    max_memory_bytes=int(float(os.getenv('PARSE_CACHE_MAX_MB', '64')) * 1024 * 1024),
+    cache_dir=os.getenv('PARSE_CACHE_DIR') or None,
+    max_disk_bytes=int(float(os.getenv('PARSE_CACHE_DISK_MAX_MB', '512')) * 1024 * 1024),
+)
+
+# Uploads are processed in the background by a bounded worker pool;
+# clients poll /jobs/<id> for the result
+JOBS = JobManager(
+    max_workers=int(os.getenv('UPLOAD_WORKERS', '2')),
+    max_pending=int(os.getenv('UPLOAD_MAX_PENDING', '50')),
+    retention_seconds=int(os.getenv('UPLOAD_JOB_RETENTION_SECONDS', '3600')),
+)
+
+# Every timed stage (parse, QB connection/session, requests, XML build,
+# cleanup) feeds the histograms served at /metrics
+METRICS = get_metrics()
+
+
+def warm_up():
+    """
+    Import the heavy dependencies the first upload would otherwise pay for.
+    
+    pandas and openpyxl (parser) always; the QuickBooks invoice generator
+    and pythoncom in real QB mode. Everything still imports lazily on first
+    use if this never runs.
+    """
+    start = time.perf_counter()
+    try:
+        warm_up_parser()
+        if USE_REAL_QB:
+            import invoice_generator_qb  # noqa: F401
+            from quickbooks_desktop.session_manager import load_pythoncom
+            load_pythoncom()
+    except Exception as e:
+        logger.warning("Import warm-up failed: %s", e)
+        return
+    logger.info("Import warm-up finished in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+def start_warm_up():
+    """Run warm_up() on a daemon thread (call once the server is starting)."""
+    thread = threading.Thread(target=warm_up, name='import-warm-up', daemon=True)
+    thread.start()
+    return thread
+
 
 # =============================================================================
 # Main Invoice Generator Routes
@@ -38,7 +131,13 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle Excel file upload and generate invoice."""
+    """
+    Handle Excel file upload and queue invoice generation.
+    
+    Returns 202 with a job ID right away; poll /jobs/<id> for the result.
+    With ?wait=true the request blocks and returns the invoice result
+    directly (the original synchronous behavior).
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
@@ -50,28 +149,172 @@ def upload_file():
     if not file.filename.endswith(('.xlsx', '.xls')):
         return jsonify({'error': 'Invalid file type. Please upload an Excel file (.xlsx or .xls)'}), 400
     
+    # The request's file stream is closed when the request ends, so the job
+    # gets its own copy - in memory, spilling to an anonymous temp file only
+    # above UPLOAD_SPOOL_MAX_BYTES (nothing is written under the client filename)
+    upload = tempfile.SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_MAX_BYTES'], mode='w+b')
+    
+    save_start = time.perf_counter()
     try:
-        # Save file temporarily
-        filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(filepath)
-        
-        # Parse the Excel file
-        parsed_data = parse_receiving_report(filepath)
+        shutil.copyfileobj(file.stream, upload)
+        upload.seek(0)
+        save_ms = (time.perf_counter() - save_start) * 1000
+        job = JOBS.submit(process_upload, upload, file.filename, save_ms,
+                          allow_duplicate=_flag(request.args.get('allow_duplicate')),
+                          filename=file.filename)
+    except JobQueueFull as e:
+        upload.close()
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        upload.close()
+        return jsonify({'error': str(e)}), 500
+    
+    if _flag(request.args.get('wait')):
+        job.wait()
+        if job.state == 'failed':
+            return jsonify({'error': job.error}), 500
+        return jsonify(job.result)
+    
+    return jsonify({
+        'job_id': job.id,
+        'state': job.state,
+        'status_url': f"/jobs/{job.id}"
+    }), 202
+
+
+def _flag(value):
+    """True for query string flags like ?wait=true / ?wait=1."""
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def process_upload(job, upload, filename, save_ms=None, allow_duplicate=False):
+    """
+    Parse an uploaded report and generate its invoice (runs on a job worker).
+    
+    Reports whose file, RR number or IMEIs are already in the invoice
+    ledger are not sent to QuickBooks unless allow_duplicate is set.
+    
+    Args:
+        job: The Job being run (used to time stages)
+        upload: Seekable binary file-like object with the upload; closed when done
+        filename: Client filename (used only to tell .xlsx from .xls)
+        save_ms: Time the request spent buffering the file, recorded as a stage
+        allow_duplicate: Invoice even if the ledger has seen this report
+    
+    Returns:
+        Invoice result dict (real QB or mock), or a duplicate result with
+        success False, duplicate True and the earlier invoices
+    """
+    try:
+        if save_ms is not None:
+            job.record_stage('save', save_ms)
         
-        # Generate invoice (real QB or mock based on env var)
-        if USE_REAL_QB:
-            from invoice_generator_qb import create_qb_invoice
-            invoice_result = create_qb_invoice(parsed_data)
-        else:
-            invoice_result = generate_mock_invoice(parsed_data)
+        # Parse the Excel file, unless this exact file was parsed before
+        with job.stage('parse'):
+            cache_key = content_key(upload, COLUMN_MAPPING_VERSION)
+            parsed_data = PARSE_CACHE.get(cache_key)
+            emit('parse', 'progress', cache='hit' if parsed_data is not None else 'miss')
+            if parsed_data is None:
+                # Stream large .xlsx files instead of loading a DataFrame
+                size = upload.seek(0, os.SEEK_END)
+                upload.seek(0)
+                streaming = (
+                    filename.lower().endswith('.xlsx')
+                    and size >= app.config['STREAMING_PARSE_THRESHOLD']
+                )
+                parsed_data = parse_receiving_report(upload, streaming=streaming, compact=True)
+                PARSE_CACHE.put(cache_key, parsed_data)
         
-        # Clean up uploaded file
-        os.remove(filepath)
+        # Indexed lookups in the local ledger - no QuickBooks round trip. The
+        # report is reserved in the same transaction, so a concurrent upload
+        # of it is flagged. Demo invoices are not real, so mock mode skips it.
+        file_sha256 = cache_key.split('-', 1)[0]
+        ledger = get_ledger() if USE_REAL_QB else None
+        report_id = None
+        if ledger is not None:
+            with job.stage('ledger_check'):
+                duplicates, report_id = ledger.reserve(parsed_data, file_sha256=file_sha256,
+                                                       allow_duplicate=allow_duplicate)
+            if duplicates['duplicate'] and allow_duplicate:
+                logger.warning("Invoicing a duplicate report (allow_duplicate): %s", duplicates['message'])
+            elif duplicates['duplicate']:
+                return {
+                    'success': False,
+                    'duplicate': True,
+                    'message': f"{duplicates['message']}. Upload again with allow_duplicate=true to invoice it anyway.",
+                    'duplicates': duplicates,
+                    'invoice': None,
+                    'demo_mode': not USE_REAL_QB,
+                    'timestamp': datetime.now().isoformat()
+                }
         
-        return jsonify(invoice_result)
+        # Generate invoice (real QB or mock based on env var)
+        with job.stage('invoice'):
+            if USE_REAL_QB:
+                try:
+                    from invoice_generator_qb import create_qb_invoice
+                    return create_qb_invoice(parsed_data, file_sha256=file_sha256, report_id=report_id)
+                except BaseException:
+                    if report_id is not None:
+                        ledger.release(report_id)
+                    raise
+            return generate_mock_invoice(parsed_data)
     
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    finally:
+        upload.close()
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report an upload job's state, stage timings and (when done) its result."""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job ID'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-Sent Events stream of an upload job's progress.
+    
+    Each 'progress' event carries one JSON stage event (stage, status and
+    details such as rows, bytes, request or duration_ms); a final 'done'
+    event carries the job status as returned by /jobs/<id>. Reconnecting
+    clients resume after the Last-Event-ID header.
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job ID'}), 404
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', '0'))
+    except ValueError:
+        last_id = 0
+    
+    def generate():
+        after_id = last_id
+        while True:
+            events, finished = job.wait_for_events(after_id, timeout=15)
+            if finished:
+                yield f"event: done\ndata: {app.json.dumps(job.to_dict())}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+            for event in events:
+                after_id = event['id']
+                yield f"id: {after_id}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Stage timing histograms in Prometheus text format."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 
 # =============================================================================
@@ -108,7 +351,7 @@ def test_connection():
             'duration_ms': duration_ms,
             'timestamp': datetime.now().isoformat()
         })
-        
+    
     except ImportError as e:
         return jsonify({
             'success': False,
@@ -155,7 +398,7 @@ def test_query_customers():
             'timestamp': datetime.now().isoformat(),
             'data': result.get('customers', [])
         })
-        
+    
     except ImportError as e:
         return jsonify({
             'success': False,
@@ -174,49 +417,62 @@ def test_query_customers():
 
 @app.route('/test/query-invoices', methods=['POST'])
 def test_query_invoices():
-    """Query invoices from QuickBooks."""
+    """
+    List all invoices from the local invoice mirror, streamed page by page.
+    
+    The mirror is first brought up to date with a delta sync (only invoices
+    modified since the last sync; ?full_sync=true forces a full one). If
+    QuickBooks cannot be reached, the last synced copy is listed instead.
+    
+    Responds with newline-delimited JSON: one {output, data} line per page
+    of invoices, then a final line with success, output, duration_ms and
+    timestamp (the fields the other /test routes return).
+    """
     start_time = time.time()
     
-    try:
-        from quickbooks_desktop.qb_helpers import query_invoices
-        result = query_invoices(max_returned=None)  # None = get all invoices
-        
-        duration_ms = int((time.time() - start_time) * 1000)
+    def ndjson(payload):
+        return json.dumps(payload) + '\n'
+    
+    full_sync = _flag(request.args.get('full_sync'))
+    
+    def generate():
+        count = 0
+        try:
+            from quickbooks_desktop.invoice_mirror import format_sync_time, get_invoice_mirror
+            from quickbooks_desktop.qb_helpers import sync_invoice_mirror
+            
+            synced = sync_invoice_mirror(full=full_sync)
+            if synced['success']:
+                yield ndjson({'output': f"{synced['message']}\n"})
+            elif synced['state']['last_sync'] is None:
+                raise Exception(synced['message'])
+            else:
+                last_sync = format_sync_time(synced['state']['last_sync'])
+                yield ndjson({'output': f"⚠ Sync failed ({synced['message']}) - showing invoices as of {last_sync}\n"})
+            
+            yield ndjson({'output': "All invoices:"})
+            for page in get_invoice_mirror().iter_pages():
+                count += len(page)
+                lines = [f"  #{inv['ref_number']} - {inv['date']} (TxnID: {inv['txn_id'][:10]}...)" for inv in page]
+                yield ndjson({'output': '\n'.join(lines), 'data': page})
+            if not count:
+                yield ndjson({'output': "  (no invoices in database)"})
+            
+            final = {'success': True, 'output': f"\n✅ Found {count} invoice(s)"}
         
-        # Format output
-        output_lines = []
-        if result['success']:
-            output_lines.append(f"✅ {result['message']}\n")
-            output_lines.append("All invoices:")
-            for inv in result['invoices']:
-                output_lines.append(f"  #{inv['ref_number']} - {inv['date']} (TxnID: {inv['txn_id'][:10]}...)")
-            if not result['invoices']:
-                output_lines.append("  (no invoices in database)")
-        else:
-            output_lines.append(f"❌ {result['message']}")
+        except ImportError as e:
+            final = {
+                'success': False,
+                'output': f"❌ Import Error: {str(e)}\n\nMake sure you're running on Windows with pywin32 installed."
+            }
+        except Exception as e:
+            final = {'success': False, 'output': f"\n❌ Error: {str(e)}"}
         
-        return jsonify({
-            'success': result['success'],
-            'output': '\n'.join(output_lines),
-            'duration_ms': duration_ms,
-            'timestamp': datetime.now().isoformat(),
-            'data': result.get('invoices', [])
-        })
-        
-    except ImportError as e:
-        return jsonify({
-            'success': False,
-            'output': f"❌ Import Error: {str(e)}\n\nMake sure you're running on Windows with pywin32 installed.",
-            'duration_ms': int((time.time() - start_time) * 1000),
-            'timestamp': datetime.now().isoformat()
-        })
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'output': f"❌ Error: {str(e)}",
-            'duration_ms': int((time.time() - start_time) * 1000),
-            'timestamp': datetime.now().isoformat()
-        })
+        final['duration_ms'] = int((time.time() - start_time) * 1000)
+        final['timestamp'] = datetime.now().isoformat()
+        yield ndjson(final)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 
 @app.route('/test/create-invoice', methods=['POST'])
@@ -251,7 +507,7 @@ def test_create_invoice():
             'timestamp': datetime.now().isoformat(),
             'data': result.get('invoice')
         })
-        
+    
     except ImportError as e:
         return jsonify({
             'success': False,
@@ -292,7 +548,7 @@ def test_setup_data():
             'duration_ms': duration_ms,
             'timestamp': datetime.now().isoformat()
         })
-        
+    
     except ImportError as e:
         return jsonify({
             'success': False,
@@ -310,6 +566,19 @@ def test_setup_data():
 
 
 if __name__ == '__main__':
-    # Single-threaded mode required for QuickBooks COM operations
-    # COM objects are thread-specific and QB SDK is not thread-safe
-    app.run(debug=True, port=5000, threaded=False)
+    # The Werkzeug reloader (on by default in debug mode) runs this module in
+    # a watcher process and again in the child that serves requests
+    debug = True
+    use_reloader = os.getenv('FLASK_USE_RELOADER', str(debug)).lower() == 'true'
+    serving_process = not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    
+    # pandas/openpyxl/pythoncom load in the background while the server starts
+    # (WARM_UP_IMPORTS=false leaves them to the first upload); only in the
+    # process that serves requests, not the reloader's watcher
+    if serving_process and os.getenv('WARM_UP_IMPORTS', 'true').lower() == 'true':
+        start_warm_up()
+    
+    # Multi-threaded is safe: every QuickBooks COM call is funneled through the
+    # single executor thread in quickbooks_desktop.qb_executor, which owns the
+    # COM apartment and the one open QB session
+    app.run(debug=debug, use_reloader=use_reloader, port=5000, threaded=True)
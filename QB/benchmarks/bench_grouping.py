@@ -0,0 +1,146 @@
+"""
+Speed comparison: vectorized group_line_items vs. the original iterrows loop.
+
+Builds synthetic receiving-report DataFrames, checks that both engines
+produce the same line items (see comparable()), and prints timings.
+
+Usage (from the QB directory):
+    python benchmarks/bench_grouping.py
+    python benchmarks/bench_grouping.py --rows 1000 10000 50000 --parts 60
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_parser import group_line_items
+
+
+def legacy_group_line_items(df, col_part, col_desc, col_imei, col_uc, col_model=None, col_make=None):
+    """The original row-by-row loop from parse_receiving_report, kept as the reference."""
+    line_items = defaultdict(lambda: {
+        'part_number': '',
+        'description': '',
+        'model': '',
+        'make': '',
+        'imeis': [],
+        'quantity': 0,
+        'unit_cost': 0,
+        'amount': 0
+    })
+    
+    total_imeis = 0
+    
+    for idx, row in df.iterrows():
+        part_number = str(row.get(col_part, '')).strip() if col_part else ''
+        description = str(row.get(col_desc, '')).strip() if col_desc else ''
+        imei = str(row.get(col_imei, '')).strip() if col_imei else ''
+        
+        if not part_number or part_number == 'nan':
+            continue
+        
+        key = f"{part_number}|{description}"
+        
+        item = line_items[key]
+        item['part_number'] = part_number
+        item['description'] = description
+        
+        if col_model:
+            item['model'] = str(row.get(col_model, '')).strip()
+        if col_make:
+            item['make'] = str(row.get(col_make, '')).strip()
+        
+        if col_uc and pd.notna(row.get(col_uc)):
+            try:
+                item['unit_cost'] = float(row.get(col_uc, 0))
+            except (ValueError, TypeError):
+                pass
+        
+        if imei and imei != 'nan':
+            item['imeis'].append(imei)
+            total_imeis += 1
+    
+    items_list = []
+    total_amount = 0
+    
+    for key, item in line_items.items():
+        item['quantity'] = len(item['imeis'])
+        item['amount'] = item['quantity'] * item['unit_cost']
+        total_amount += item['amount']
+        items_list.append(item)
+    
+    items_list.sort(key=lambda x: x['part_number'])
+    
+    return items_list, total_imeis, total_amount
+
+
+def comparable(result):
+    """
+    Grouping result with the two intended differences from the legacy loop
+    removed: whole-number IMEIs read from a float column lose their '.0',
+    and money is compared in cents.
+    """
+    items, total_imeis, total_amount = result
+    rows = []
+    for item in items:
+        imeis = [imei[:-2] if imei.endswith('.0') else imei for imei in item['imeis']]
+        rows.append(dict(item, imeis=imeis, unit_cost=round(item['unit_cost'] * 100),
+                         amount=round(item['amount'] * 100)))
+    return rows, total_imeis, round(total_amount * 100)
+
+
+def make_frame(rows, parts, seed=0):
+    """Synthetic receiving report with blank rows, missing IMEIs and costs."""
+    rng = random.Random(seed)
+    catalog = [
+        (f"MAKE{p % 7}-MODEL {p} -A{1000 + p}", f"{64 * (1 + p % 4)}GB-COLOR{p % 5}", f"MODEL {p}", f"MAKE{p % 7}")
+        for p in range(parts)
+    ]
+    data = {'PART NUMBER': [], 'DESCRIPTION': [], 'IMEI': [], 'MODEL': [], 'MAKE': [], 'UC': []}
+    for i in range(rows):
+        part, desc, model, make = catalog[rng.randrange(parts)]
+        if rng.random() < 0.01:
+            part = float('nan')
+        data['PART NUMBER'].append(part)
+        data['DESCRIPTION'].append(desc if rng.random() > 0.01 else float('nan'))
+        data['IMEI'].append(350000000000000 + i if rng.random() > 0.02 else float('nan'))
+        data['MODEL'].append(model)
+        data['MAKE'].append(make)
+        data['UC'].append(rng.choice([65, 80.5, float('nan'), 'n/a']))
+    return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--parts', type=int, default=60)
+    args = parser.parse_args()
+    
+    cols = ('PART NUMBER', 'DESCRIPTION', 'IMEI', 'UC', 'MODEL', 'MAKE')
+    
+    print(f"{'rows':>8}  {'legacy (s)':>11}  {'vectorized (s)':>15}  {'speedup':>8}")
+    for rows in args.rows:
+        df = make_frame(rows, args.parts)
+        
+        start = time.perf_counter()
+        expected = legacy_group_line_items(df, *cols)
+        legacy_s = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        actual = group_line_items(df, *cols)
+        vector_s = time.perf_counter() - start
+        
+        if comparable(actual) != comparable(expected):
+            raise SystemExit(f"Output mismatch at {rows} rows")
+        
+        print(f"{rows:>8}  {legacy_s:>11.3f}  {vector_s:>15.3f}  {legacy_s / vector_s:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
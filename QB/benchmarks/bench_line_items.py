@@ -0,0 +1,78 @@
+"""
+Memory comparison: dict line items with lists of str vs. compact LineItem.
+
+Measures the memory retained by parse results (line items + IMEIs) for a
+synthetic report, and checks that both forms hold the same data.
+
+Usage (from the QB directory):
+    python benchmarks/bench_line_items.py
+    python benchmarks/bench_line_items.py --imeis 100000 --parts 60
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from line_items import LineItem
+
+
+def build_dict_items(imeis, parts):
+    """Line items in the plain dict form, with IMEIs as fresh str objects."""
+    items = []
+    per_part = imeis // parts
+    for p in range(parts):
+        serials = [str(350000000000000 + p * per_part + i) for i in range(per_part)]
+        items.append({
+            'part_number': f"MAKE-MODEL {p} -A{1000 + p}",
+            'description': f"{64 * (1 + p % 4)}GB-COLOR{p % 5}",
+            'model': f"MODEL {p}",
+            'make': 'MAKE',
+            'imeis': serials,
+            'quantity': len(serials),
+            'unit_cost': 65.0,
+            'amount': len(serials) * 65.0,
+        })
+    return items
+
+
+def build_compact_items(imeis, parts):
+    """Same data as LineItem objects; temporary str lists are freed."""
+    return [LineItem.from_dict(item) for item in build_dict_items(imeis, parts)]
+
+
+def retained_bytes(builder, *args):
+    """Bytes still allocated after builder() returns (i.e. held by its result)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = builder(*args)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--imeis', type=int, default=100000)
+    parser.add_argument('--parts', type=int, default=60)
+    args = parser.parse_args()
+    
+    dict_items, dict_bytes = retained_bytes(build_dict_items, args.imeis, args.parts)
+    compact_items, compact_bytes = retained_bytes(build_compact_items, args.imeis, args.parts)
+    
+    if compact_items != dict_items:
+        raise SystemExit("Compact line items do not match the dict form")
+    
+    total = sum(len(item['imeis']) for item in dict_items)
+    print(f"IMEIs:          {total:,}")
+    print(f"dict + list:    {dict_bytes / 1024:,.0f} KiB ({dict_bytes / total:.1f} B/IMEI)")
+    print(f"LineItem:       {compact_bytes / 1024:,.0f} KiB ({compact_bytes / total:.1f} B/IMEI)")
+    print(f"reduction:      {dict_bytes / compact_bytes:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Scaling benchmark for parse_receiving_report on synthetic receiving reports.
+
+Generates reports from 100 to 1M rows (see synthetic_rr.py), then measures
+parse time, rows/sec and peak traced memory for each parser mode. Results
+can be saved as a baseline and later runs checked against it, so a change
+that makes parsing slower or hungrier shows up as a failure.
+
+Generated workbooks are kept in --data-dir (the 1M row file takes a while
+to write) and reused while rows/parts/seed/messy/variant are unchanged.
+
+Usage (from the QB directory):
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --rows 100 1000 10000 --modes pandas streaming
+    python benchmarks/bench_parser.py --save      # record baselines
+    python benchmarks/bench_parser.py --check     # fail on regressions
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_parser import parse_receiving_report
+
+from benchmarks.synthetic_rr import write_report
+
+
+DEFAULT_ROWS = [100, 1000, 10000, 100000, 1000000]
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'parser.json')
+
+# Parser modes: name -> keyword arguments for parse_receiving_report
+MODES = {
+    'pandas': {},
+    'compact': {'compact': True},
+    'streaming': {'streaming': True},
+    'streaming-compact': {'streaming': True, 'compact': True},
+}
+
+
+def report_path(data_dir, rows, parts, seed, messy, variant):
+    """Path of the generated workbook for these arguments (written if missing)."""
+    name = f"rr-{rows}r-{parts}p-s{seed}-v{variant}{'-messy' if messy else ''}.xlsx"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"  generating {name}...", flush=True)
+        partial = path + '.part'
+        write_report(partial, rows, parts, seed, messy, variant)
+        os.replace(partial, path)
+    return path
+
+
+def time_parse(path, kwargs, repeat):
+    """Best wall time over `repeat` parses, and the last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = parse_receiving_report(path, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def peak_memory(path, kwargs):
+    """Peak bytes allocated (tracemalloc) during one parse."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        parse_receiving_report(path, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(rows_list, modes, parts, seed, messy, variant, data_dir, repeat):
+    """
+    Benchmark each mode at each size.
+
+    Returns:
+        dict of "<rows>/<mode>" -> {'seconds', 'rows_per_sec', 'peak_mb', 'imeis'}
+    """
+    results = {}
+    print(f"{'rows':>8}  {'mode':<18} {'time (s)':>9}  {'rows/s':>10}  {'peak MiB':>9}  {'imeis':>8}")
+    for rows in rows_list:
+        path = report_path(data_dir, rows, parts, seed, messy, variant)
+        for mode in modes:
+            kwargs = MODES[mode]
+            # Traced runs are several times slower, so time and measure separately;
+            # big reports are only timed once
+            seconds, result = time_parse(path, kwargs, repeat if rows <= 10000 else 1)
+            peak_mb = peak_memory(path, kwargs) / (1024 * 1024)
+            imeis = result['summary']['total_imeis']
+            del result
+
+            results[f"{rows}/{mode}"] = {
+                'seconds': round(seconds, 4),
+                'rows_per_sec': round(rows / seconds),
+                'peak_mb': round(peak_mb, 2),
+                'imeis': imeis,
+            }
+            print(f"{rows:>8}  {mode:<18} {seconds:>9.3f}  {rows / seconds:>10,.0f}  {peak_mb:>9.1f}  {imeis:>8}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a saved baseline.
+
+    Returns:
+        list of regression messages (empty if everything is within tolerance)
+    """
+    regressions = []
+    for key, current in results.items():
+        expected = baseline.get(key)
+        if not expected:
+            continue
+        if current['imeis'] != expected['imeis']:
+            regressions.append(f"{key}: parsed {current['imeis']} IMEIs, baseline has {expected['imeis']}")
+        for metric in ('seconds', 'peak_mb'):
+            if current[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{key}: {metric} {current[metric]} vs baseline {expected[metric]} "
+                    f"(+{current[metric] / expected[metric] - 1:.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=list(MODES))
+    parser.add_argument('--parts', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--variant', type=int, default=0, help='Column name variant (see synthetic_rr.py)')
+    parser.add_argument('--clean', action='store_true', help='No blank rows, NaNs or mixed dates')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed parses per size up to 10,000 rows (best is kept)')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'rr-bench'))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='Record these results in the baseline file')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero if slower/larger than the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown for --check (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.modes, args.parts, args.seed, not args.clean,
+                  args.variant, args.data_dir, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.check:
+        if not baseline:
+            raise SystemExit(f"No baseline at {args.baseline} (run with --save first)")
+        regressions = compare(results, baseline.get('results', {}), args.tolerance)
+        if regressions:
+            raise SystemExit("Regressions against baseline:\n  " + "\n  ".join(regressions))
+        print(f"\nWithin {args.tolerance:.0%} of baseline")
+
+    if args.save:
+        baseline.setdefault('results', {}).update(results)
+        baseline['config'] = {'parts': args.parts, 'seed': args.seed, 'variant': args.variant,
+                              'messy': not args.clean, 'python': sys.version.split()[0]}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Scaling check: InvoiceAdd XML built with QBXMLBuilder vs. the original
+string-concatenation loop and per-character escape_xml.
+
+Builds invoices with an increasing number of lines, checks both builders
+escape identically, and prints time per line (flat = linear scaling).
+
+Usage (from the QB directory):
+    python benchmarks/bench_qbxml_builder.py
+    python benchmarks/bench_qbxml_builder.py --lines 100 1000 10000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from quickbooks_desktop.qbxml_builder import QBXMLBuilder, escape_xml
+
+
+def legacy_escape_xml(text):
+    """The original escape_xml from invoice_generator_qb, kept as the reference."""
+    if text is None:
+        return ""
+    
+    if not isinstance(text, str):
+        text = str(text)
+    
+    cleaned = []
+    for char in text:
+        code = ord(char)
+        if code == 0x9 or code == 0xA or code == 0xD:
+            cleaned.append(char)
+        elif code >= 0x20 and code <= 0xD7FF:
+            cleaned.append(char)
+        elif code >= 0xE000 and code <= 0xFFFD:
+            cleaned.append(char)
+    
+    text = ''.join(cleaned)
+    
+    text = text.replace('&', '&amp;')
+    text = text.replace('<', '&lt;')
+    text = text.replace('>', '&gt;')
+    text = text.replace('"', '&quot;')
+    text = text.replace("'", '&apos;')
+    
+    return text
+
+
+def make_lines(count):
+    """(desc, quantity, rate) tuples that look like receiving report lines."""
+    return [
+        (f"APPLE-IPHONE {11 + i % 5} -A{2100 + i % 90} | {64 * (1 + i % 4)}GB-BLACK & <GRADE {'AB'[i % 2]}>",
+         1 + i % 250, 65.0 + i % 7)
+        for i in range(count)
+    ]
+
+
+def legacy_build(lines, item_name):
+    """Line XML accumulated with += (the original create_qb_invoice loop)."""
+    lines_xml = ""
+    for desc, qty, rate in lines:
+        lines_xml += f"""
+    <InvoiceLineAdd>
+      <ItemRef>
+        <FullName>{legacy_escape_xml(item_name)}</FullName>
+      </ItemRef>
+      <Desc>{legacy_escape_xml(desc)}</Desc>
+      <Quantity>{qty}</Quantity>
+      <Rate>{rate:.2f}</Rate>
+    </InvoiceLineAdd>"""
+    return lines_xml
+
+
+def builder_build(lines, item_name):
+    """Same lines through QBXMLBuilder (one join)."""
+    builder = QBXMLBuilder()
+    for desc, qty, rate in lines:
+        builder.start('InvoiceLineAdd')
+        builder.ref('ItemRef', item_name)
+        builder.element('Desc', desc)
+        builder.element('Quantity', qty)
+        builder.element('Rate', f"{rate:.2f}")
+        builder.end()
+    return builder.getvalue()
+
+
+def best_time(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, nargs='+', default=[100, 1000, 2500, 5000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    sample = make_lines(200)
+    for desc, _, _ in sample:
+        if escape_xml(desc) != legacy_escape_xml(desc):
+            raise SystemExit(f"escape_xml mismatch for {desc!r}")
+    
+    print(f"{'lines':>7} {'legacy ms':>10} {'us/line':>8} {'builder ms':>11} {'us/line':>8} {'speedup':>8}")
+    for count in args.lines:
+        lines = make_lines(count)
+        legacy = best_time(legacy_build, lines, 'TEST-DEVICE', repeat=args.repeat)
+        built = best_time(builder_build, lines, 'TEST-DEVICE', repeat=args.repeat)
+        print(f"{count:>7} {legacy * 1000:>10.1f} {legacy / count * 1e6:>8.2f} "
+              f"{built * 1000:>11.1f} {built / count * 1e6:>8.2f} {legacy / built:>7.1f}x")
+    
+    descs = [desc for desc, _, _ in make_lines(10000)]
+    legacy = best_time(lambda: [legacy_escape_xml(d) for d in descs], repeat=args.repeat)
+    new = best_time(lambda: [escape_xml(d) for d in descs], repeat=args.repeat)
+    print(f"\nescape_xml x{len(descs)}: legacy {legacy * 1000:.1f} ms, "
+          f"new {new * 1000:.1f} ms ({legacy / new:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
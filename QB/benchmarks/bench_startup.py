@@ -0,0 +1,136 @@
+"""
+Cold-start benchmark: import time of the Flask app (python -X importtime).
+
+Imports a module (default: app) in fresh interpreters, parses the
+-X importtime report and prints the total import time, wall time to
+import, the slowest modules and whether heavy dependencies (pandas,
+openpyxl, numpy, pythoncom, win32com) were loaded at startup. Results can
+be saved as a baseline and checked like bench_parser.py.
+
+Usage (from the QB directory):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --top 15
+    python benchmarks/bench_startup.py --save      # record baseline
+    python benchmarks/bench_startup.py --check     # fail on regressions
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+QB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_PATH = os.path.join(QB_DIR, 'benchmarks', 'baselines', 'startup.json')
+
+# Top-level packages that should not be imported just to start the app
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'pythoncom', 'win32com')
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output.
+
+    Returns:
+        list of (module, self_us, cumulative_us) in report order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue
+        rows.append((fields[2][1:].rstrip(), self_us, cumulative_us))
+    return rows
+
+
+def measure(module):
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        (total import us, wall ms, {module: cumulative us})
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print((time.perf_counter() - start) * 1000)"
+    )
+    # Keep the app quiet and skip background work during the measurement
+    env = dict(os.environ, QB_LOG_LEVEL='WARNING', WARM_UP_IMPORTS='false')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=QB_DIR, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    # Top-level imports (no leading spaces) add up to the whole import cost
+    total_us = sum(cumulative for name, _, cumulative in rows if not name.startswith(' ')) if rows else 0
+    cumulative = {}
+    for name, _, cum_us in rows:
+        cumulative[name.strip()] = cum_us
+    wall_ms = float(proc.stdout.strip().splitlines()[-1])
+    return total_us, wall_ms, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--module', default='app', help='Module to import (run from the QB directory)')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start (median is reported)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest modules to list')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='Record this result as the baseline')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero if slower than the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown for --check (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(total / 1000 for total, _, _ in runs)
+    wall_ms = statistics.median(wall for _, wall, _ in runs)
+    last = runs[-1][2]
+
+    print(f"import {args.module}: {import_ms:.1f} ms (importtime), {wall_ms:.1f} ms wall, "
+          f"median of {args.runs}")
+    print("\nSlowest modules (cumulative, last run):")
+    for name, cum_us in sorted(last.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {cum_us / 1000:>8.1f} ms  {name}")
+
+    loaded = [name for name in HEAVY_MODULES if name in last]
+    print(f"\nHeavy modules loaded at startup: {', '.join(loaded) if loaded else 'none'}")
+
+    result = {'import_ms': round(import_ms, 1), 'wall_ms': round(wall_ms, 1), 'heavy_modules': loaded}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.check:
+        expected = baseline.get(args.module)
+        if not expected:
+            raise SystemExit(f"No baseline for {args.module} in {args.baseline} (run with --save first)")
+        problems = []
+        if wall_ms > expected['wall_ms'] * (1 + args.tolerance):
+            problems.append(f"wall {wall_ms:.1f} ms vs baseline {expected['wall_ms']} ms")
+        new_heavy = sorted(set(loaded) - set(expected.get('heavy_modules', [])))
+        if new_heavy:
+            problems.append(f"now imports {', '.join(new_heavy)} at startup")
+        if problems:
+            raise SystemExit("Startup regressions against baseline:\n  " + "\n  ".join(problems))
+        print(f"\nWithin {args.tolerance:.0%} of baseline")
+
+    if args.save:
+        baseline[args.module] = dict(result, python=sys.version.split()[0])
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+End-to-end load test: concurrent clients uploading reports to /upload.
+
+Starts the Flask app on a local port (or targets --url), then has N client
+threads each POST synthetic receiving reports (see synthetic_rr.py) and
+follow the job's /jobs/<id>/events stream until it finishes. Runs in mock
+mode (generate_mock_invoice) and in simulated-QB mode (create_qb_invoice
+against the fake request processor), and reports:
+
+- Latency p50/p95/p99 (POST sent -> job done event), throughput
+- Per-stage time from the job's progress events: save, parse, ledger
+  (duplicate check and recording), qb_session
+  (connection + BeginSession, only when a session is opened), catalog
+  (lookups and refreshes), build_xml and qb_request (ProcessRequest).
+  Stages nest (catalog refreshes send qb_requests, invoice contains the
+  QB stages), so columns don't add up to the total.
+
+Every upload is a distinct workbook by default so the parse cache never
+hits; --reuse uploads the same one each time. Uploads pass
+allow_duplicate=true so the invoice ledger (a throwaway file for the local
+app) checks and records every report without rejecting repeats.
+
+Usage (from the QB directory):
+    python benchmarks/bench_upload.py
+    python benchmarks/bench_upload.py --clients 1 4 8 --requests 100 --rows 2000
+    python benchmarks/bench_upload.py --modes fake --qb-latency-ms 80 --workers 2
+    python benchmarks/bench_upload.py --url http://localhost:5000 --modes mock
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_rr import write_report
+
+
+# Progress event stages reported, and which event stages feed each column
+STAGE_COLUMNS = {
+    'save': ('save',),
+    'parse': ('parse',),
+    'ledger': ('ledger_check', 'ledger_record'),
+    'qb_session': ('qb_session',),
+    'catalog': ('catalog_lookup', 'catalog_refresh'),
+    'build_xml': ('build_xml',),
+    'qb_request': ('qb_request',),
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def multipart_body(filename, content):
+    """Encode a single 'file' field as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    body = b''.join((
+        f"--{boundary}\r\n".encode(),
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode(),
+        b"Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n",
+        content,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ))
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data = 'message', []
+    for raw in response:
+        line = raw.decode('utf-8').rstrip('\r\n')
+        if not line:
+            if data:
+                yield event, '\n'.join(data)
+            event, data = 'message', []
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data.append(line[5:].lstrip())
+
+
+def upload_one(base_url, filename, content):
+    """
+    Upload one report and follow its job to the end.
+
+    Returns:
+        dict with latency_ms, state, error and stage durations (ms)
+    """
+    body, content_type = multipart_body(filename, content)
+    start = time.perf_counter()
+    request = urllib.request.Request(f"{base_url}/upload?allow_duplicate=true", data=body, method='POST',
+                                     headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request) as response:
+            job = json.load(response)
+    except urllib.error.HTTPError as e:
+        return {'latency_ms': (time.perf_counter() - start) * 1000, 'state': 'rejected',
+                'error': f"HTTP {e.code}", 'stages': {}}
+
+    stages = defaultdict(float)
+    status = {}
+    with urllib.request.urlopen(f"{base_url}/jobs/{job['job_id']}/events") as response:
+        for event, data in iter_sse(response):
+            if event == 'done':
+                status = json.loads(data)
+                break
+            payload = json.loads(data)
+            if payload.get('status') == 'end' and 'duration_ms' in payload:
+                stages[payload['stage']] += payload['duration_ms']
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    # save is timed in the request thread, so it only shows up in job stages
+    for stage in status.get('stages', []):
+        if stage['name'] == 'save':
+            stages['save'] += stage['duration_ms']
+
+    result = status.get('result') or {}
+    error = status.get('error')
+    if status.get('state') == 'done' and result.get('success') is False:
+        error = result.get('error') or result.get('message')
+    return {
+        'latency_ms': latency_ms,
+        'state': 'failed' if error else status.get('state', 'failed'),
+        'error': error,
+        'stages': dict(stages),
+    }
+
+
+def run_load(base_url, reports, clients, requests):
+    """
+    Send `requests` uploads from `clients` threads.
+
+    Returns:
+        (list of per-upload results, wall seconds)
+    """
+    results = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            filename, content = reports[i % len(reports)]
+            outcome = upload_one(base_url, filename, content)
+            with lock:
+                results.append(outcome)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def summarize(mode, clients, results, wall_s):
+    """Print one summary line plus the per-stage breakdown."""
+    ok = [r for r in results if r['state'] == 'done']
+    failed = len(results) - len(ok)
+    if not ok:
+        print(f"{mode:<5} {clients:>7}  all {len(results)} uploads failed: {results[0]['error'] if results else '-'}")
+        return
+    latencies = [r['latency_ms'] for r in ok]
+    print(f"{mode:<5} {clients:>7}  {len(ok) / wall_s * 60:>8.1f}  "
+          f"{percentile(latencies, 50):>8.0f}  {percentile(latencies, 95):>8.0f}  "
+          f"{percentile(latencies, 99):>8.0f}  {failed:>6}")
+
+    parts = []
+    for column, event_stages in STAGE_COLUMNS.items():
+        per_upload = [sum(r['stages'].get(s, 0.0) for s in event_stages) for r in ok]
+        seen = sum(1 for r in ok if any(s in r['stages'] for s in event_stages))
+        if seen:
+            parts.append(f"{column} {sum(per_upload) / len(ok):.1f}")
+    print(f"{'':<15}mean ms/upload: {', '.join(parts)}")
+
+
+@contextlib.contextmanager
+def local_server(mode):
+    """Serve the app on an ephemeral port in this process; yields its base URL."""
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    app_module.USE_REAL_QB = (mode == 'fake')
+    app_module.PARSE_CACHE.clear()
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--modes', nargs='+', choices=('mock', 'fake'), default=['mock', 'fake'])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=40, help='Uploads per run')
+    parser.add_argument('--rows', type=int, default=1000, help='Rows per synthetic report')
+    parser.add_argument('--parts', type=int, default=60)
+    parser.add_argument('--reuse', action='store_true', help='Upload the same workbook every time')
+    parser.add_argument('--workers', type=int, default=2, help='UPLOAD_WORKERS for the local app')
+    parser.add_argument('--qb-latency-ms', type=float, default=50, help='Fake ProcessRequest latency')
+    parser.add_argument('--qb-jitter-ms', type=float, default=10)
+    parser.add_argument('--url', help='Benchmark a running server instead (its mode is whatever it was started with)')
+    parser.add_argument('--verbose', action='store_true', help="Keep the app's INFO logs and request log")
+    args = parser.parse_args()
+
+    # Read by the app, job pool and fake processor at import time
+    os.environ['UPLOAD_WORKERS'] = str(args.workers)
+    os.environ['UPLOAD_MAX_PENDING'] = str(max(args.clients) + args.workers)
+    os.environ['QB_REQUEST_PROCESSOR'] = 'fake'
+    os.environ['QB_FAKE_LATENCY_MS'] = str(args.qb_latency_ms)
+    os.environ['QB_FAKE_JITTER_MS'] = str(args.qb_jitter_ms)
+    # Keep benchmark invoices out of the real ledger
+    os.environ['QB_LEDGER_PATH'] = os.path.join(tempfile.mkdtemp(prefix='bench-ledger-'), 'ledger.sqlite3')
+    if not args.verbose:
+        os.environ['QB_LOG_LEVEL'] = 'WARNING'
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    count = 1 if args.reuse else args.requests
+    print(f"Generating {count} report(s) of {args.rows} rows...", flush=True)
+    reports = []
+    for seed in range(count):
+        buffer = io.BytesIO()
+        write_report(buffer, args.rows, args.parts, seed=seed)
+        reports.append((f"RR-bench-{seed}.xlsx", buffer.getvalue()))
+
+    print(f"\n{'mode':<5} {'clients':>7}  {'rpt/min':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'failed':>6}")
+    for mode in args.modes:
+        for clients in args.clients:
+            if args.url:
+                server = contextlib.nullcontext(args.url.rstrip('/'))
+            else:
+                server = local_server(mode)
+            with server as base_url:
+                results, wall_s = run_load(base_url, reports, clients, args.requests)
+            summarize(mode, clients, results, wall_s)
+
+
+if __name__ == '__main__':
+    main()
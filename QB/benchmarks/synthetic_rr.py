@@ -0,0 +1,201 @@
+"""
+Synthetic Receiving Report workbooks for parser benchmarks.
+
+Writes .xlsx files shaped like the real reports (one row per IMEI, QTY on
+the first row of each group, header fields repeated on every row) with a
+configurable number of rows and distinct part numbers. Column names are
+drawn from the excel_parser.COLUMN_MAPPING variants, and "messy" reports
+add what real exports contain: blank rows, missing part numbers, IMEIs
+and unit costs, text costs, padded cells and dates in mixed formats.
+
+Usage (from the QB directory):
+    python benchmarks/synthetic_rr.py out.xlsx --rows 100000 --parts 500
+    python benchmarks/synthetic_rr.py out.xlsx --rows 1000 --variant 2 --clean
+
+    from benchmarks.synthetic_rr import write_report
+    write_report('big.xlsx', rows=1000000, parts=2000)
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_parser import COLUMN_MAPPING
+
+
+# Mapping keys written to every report, in sheet order (plus TYPE, which
+# the parser ignores but real reports have)
+REPORT_COLUMNS = ('PART NUMBER', 'DESCRIPTION', 'IMEI', 'TYPE', 'MAKE', 'MODEL', 'STORAGE',
+                  'COLOR', 'QTY', 'UC', 'ORDER NUMBER', 'DATE', 'RECEIVING REPORT NUMBER')
+
+_MAKES = {
+    'APPLE': ('IPHONE 11', 'IPHONE 12', 'IPHONE 13 PRO', 'IPHONE XS', 'IPAD 10'),
+    'SAMSUNG': ('GALAXY S21', 'GALAXY S22 ULTRA', 'GALAXY TAB S8', 'GALAXY A52'),
+    'GOOGLE': ('PIXEL 6', 'PIXEL 7 PRO'),
+    'MOTOROLA': ('MOTO G POWER', 'EDGE 2022'),
+}
+_STORAGE = ('64GB', '128GB', '256GB', '512GB')
+_COLORS = ('BLACK', 'SPACE GRAY', 'SILVER', 'GRAPHITE', 'BLUE', 'RED')
+
+# Date formats seen in exports (the first row's date becomes the invoice date)
+_DATE_FORMATS = (None, '%m-%d-%y', '%Y-%m-%d', '%m/%d/%Y', '%d-%b-%Y')
+
+
+def column_names(variant=0):
+    """
+    Sheet header for a report: one COLUMN_MAPPING variant per key.
+
+    Args:
+        variant: Index into each key's list of accepted names (wraps around),
+            or None to pick a random variant per key
+
+    Returns:
+        dict of mapping key (or 'TYPE') -> column name
+    """
+    rng = random.Random(variant)
+    names = {}
+    for key in REPORT_COLUMNS:
+        options = COLUMN_MAPPING.get(key, [key])
+        index = rng.randrange(len(options)) if variant is None else variant % len(options)
+        names[key] = options[index]
+    return names
+
+
+def make_catalog(parts, seed=0):
+    """Distinct (part number, description, make, model, storage, color, unit cost) tuples."""
+    rng = random.Random(seed)
+    catalog = []
+    makes = sorted(_MAKES)
+    for p in range(parts):
+        make = makes[p % len(makes)]
+        model = _MAKES[make][(p // len(makes)) % len(_MAKES[make])]
+        storage = _STORAGE[p % len(_STORAGE)]
+        color = _COLORS[p % len(_COLORS)]
+        a_number = f"A{1000 + p}"
+        catalog.append((
+            f"{make}-{model} -{a_number}",
+            f"{storage}-{color}",
+            make, model, storage, color,
+            rng.choice((45, 65, 80.5, 120, 215.25)),
+        ))
+    return catalog
+
+
+def iter_rows(rows, parts, seed=0, messy=True, variant=0):
+    """
+    Yield the sheet rows of a synthetic report (header row first).
+
+    Args:
+        rows: Data rows (one per IMEI, including any blank/broken rows)
+        parts: Distinct part number + description combinations
+        seed: Random seed (same arguments give the same report)
+        messy: Add blank rows, NaNs, text costs, padding and mixed dates
+        variant: Column name variant (see column_names)
+    """
+    rng = random.Random(seed)
+    names = column_names(variant)
+    yield [names[key] for key in REPORT_COLUMNS]
+
+    catalog = make_catalog(parts, seed)
+    base_date = datetime(2025, 12, 30)
+    date_format = _DATE_FORMATS[seed % len(_DATE_FORMATS)]
+    order_number = f"INV: {50000 + seed % 1000}"
+    rr_number = 2000 + seed % 1000
+    imei = 350000000000000 + seed * 10_000_000
+
+    # Rows come in runs of the same part (like a scanned batch)
+    remaining = 0
+    current = None
+    for i in range(rows):
+        if remaining == 0:
+            current = catalog[rng.randrange(parts)]
+            remaining = rng.randint(1, 250)
+            qty = remaining
+        else:
+            qty = None
+        remaining -= 1
+        part, desc, make, model, storage, color, unit_cost = current
+        imei += rng.randint(1, 9999)
+
+        txn_date = base_date
+        if date_format:
+            txn_date = txn_date.strftime(date_format)
+
+        row = [part, desc, imei, 'PHONE', make, model, storage, color, qty, unit_cost,
+               order_number, txn_date, rr_number]
+
+        if messy and i > 0:
+            roll = rng.random()
+            if roll < 0.002:
+                row = [None] * len(row)          # Blank separator row
+            elif roll < 0.01:
+                row[0] = None                    # Missing part number
+            elif roll < 0.03:
+                row[2] = None                    # Missing IMEI
+            elif roll < 0.05:
+                row[9] = None                    # Missing unit cost
+            elif roll < 0.055:
+                row[9] = 'n/a'                   # Text unit cost
+            elif roll < 0.07:
+                row[0] = f" {part} "             # Padded cells
+                row[1] = f"{desc} "
+            elif roll < 0.08:
+                row[11] = rng.choice((None, 'TBD', (base_date + timedelta(days=1)).strftime('%m/%d/%Y')))
+        yield row
+
+
+def write_report(target, rows, parts=60, seed=0, messy=True, variant=0):
+    """
+    Write a synthetic Receiving Report workbook.
+
+    Args:
+        target: Output path or writable binary stream
+        rows, parts, seed, messy, variant: See iter_rows
+
+    Returns:
+        target
+    """
+    return write_rows(target, iter_rows(rows, parts, seed, messy, variant))
+
+
+def write_rows(target, rows):
+    """
+    Write sheet rows (header row first, e.g. from iter_rows) as a workbook.
+
+    Args:
+        target: Output path or writable binary stream
+        rows: Iterable of row lists
+
+    Returns:
+        target
+    """
+    from openpyxl import Workbook
+
+    # Write-only mode streams rows to disk (constant memory, ~10x faster)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('RR')
+    for row in rows:
+        sheet.append(row)
+    workbook.save(target)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('output', help='Path of the .xlsx file to write')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--parts', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--variant', type=int, default=0, help='Column name variant (index into COLUMN_MAPPING)')
+    parser.add_argument('--clean', action='store_true', help='No blank rows, NaNs or mixed dates')
+    args = parser.parse_args()
+
+    write_report(args.output, args.rows, args.parts, args.seed, not args.clean, args.variant)
+    print(f"Wrote {args.rows} rows ({args.parts} parts) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,197 @@
 """
 Excel parser for Receiving Report format.
 Parses the specific format used by Universal Cellular.
+
+Sheets are read in two passes: the first HEADER_SNIFF_ROWS rows locate the
+header row (vendor sheets may have title rows above it) and resolve
+COLUMN_MAPPING, then only the columns the parser uses are loaded, text
+columns as str. Resolved headers are cached by fingerprint, so repeat
+vendor layouts skip alias resolution.
+
+pandas and openpyxl are imported on first parse, not at module import, so
+the Flask app starts without them (see warm_up to load them early).
 """
-import pandas as pd
-from collections import defaultdict
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from itertools import chain, islice
+from typing import TYPE_CHECKING
+
+from line_items import MAX_PACKED_DIGITS, ImeiArray, LineItem
+
+# Add parent directory to path for quickbooks_desktop imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quickbooks_desktop.progress import emit
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+# Streaming parses report progress every this many rows
+PROGRESS_EVERY_ROWS = 5000
+
+# Bump when parse output changes for the same workbook (invalidates parse caches)
+PARSER_REVISION = 3
+
+# Rows read up front to find the header row (it may sit below title rows)
+HEADER_SNIFF_ROWS = 25
+# A header row must resolve PART NUMBER and at least this many mapped columns
+MIN_HEADER_MATCHES = 2
+# Resolved header layouts remembered by fingerprint (repeat vendors skip detection)
+SCHEMA_CACHE_SIZE = 128
+
+# Map common column name variations
+COLUMN_MAPPING = {
+    'PART NUMBER': ['PART NUMBER', 'PARTNUMBER', 'PART_NUMBER', 'PART #'],
+    'DESCRIPTION': ['DESCRIPTION', 'DESC'],
+    'IMEI': ['IMEI', 'IMEI / SERIAL NUMBER', 'SERIAL NUMBER', 'SERIAL'],
+    'QTY': ['QTY', 'QUANTITY'],
+    'UC': ['UC', 'UNIT COST', 'UNIT_COST', 'RATE', 'PRICE'],
+    'ORDER NUMBER': ['ORDER NUMBER', 'ORDER_NUMBER', 'ORDER #', 'ORDER'],
+    'DATE': ['DATE', 'TXN DATE', 'TRANSACTION DATE'],
+    'RECEIVING REPORT NUMBER': ['RECEIVING REPORT NUMBER', 'RR NUMBER', 'RR #', 'RR'],
+    'MODEL': ['MODEL'],
+    'MAKE': ['MAKE', 'MANUFACTURER'],
+    'COLOR': ['COLOR'],
+    'STORAGE': ['STORAGE'],
+}
+
+# Columns the parser actually reads; everything else in the sheet is skipped
+USED_COLUMNS = ('PART NUMBER', 'DESCRIPTION', 'IMEI', 'UC', 'MODEL', 'MAKE',
+                'ORDER NUMBER', 'DATE', 'RECEIVING REPORT NUMBER')
+# Used columns read as text (UC is converted to numbers, DATE keeps datetimes)
+TEXT_COLUMNS = ('PART NUMBER', 'DESCRIPTION', 'IMEI', 'MODEL', 'MAKE',
+                'ORDER NUMBER', 'RECEIVING REPORT NUMBER')
+
+# Identifies the column mapping + parser revision, used in parse cache keys
+COLUMN_MAPPING_VERSION = hashlib.sha256(
+    json.dumps([PARSER_REVISION, COLUMN_MAPPING], sort_keys=True).encode('utf-8')
+).hexdigest()[:12]
+
+
+def warm_up():
+    """Import pandas and openpyxl now (e.g. on a background thread at startup)."""
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
+
+
+def find_column(columns, possible_names):
+    """Find the actual column name from possible variations."""
+    for name in possible_names:
+        if name in columns:
+            return name
+    return None
+
+
+def resolve_columns(columns) -> dict:
+    """
+    Resolve the actual column name for every COLUMN_MAPPING key.
+    
+    Returns:
+        dict of mapping key -> column name (None if the sheet lacks it)
+    """
+    columns = list(columns)
+    return {key: find_column(columns, names) for key, names in COLUMN_MAPPING.items()}
+
+
+# =============================================================================
+# Header detection
+# =============================================================================
+
+class SheetSchema:
+    """
+    Resolved layout of a header row.
+    
+    Attributes:
+        columns: Stripped column names ('Unnamed: <i>' for blank cells)
+        cols: COLUMN_MAPPING key -> column name (None if missing), as resolve_columns
+        positions: COLUMN_MAPPING key -> 0-based column index (first occurrence)
+    """
+    
+    __slots__ = ('columns', 'cols', 'positions')
+    
+    def __init__(self, cells):
+        self.columns = [cell if cell else f'Unnamed: {i}' for i, cell in enumerate(cells)]
+        self.cols = resolve_columns(self.columns)
+        first = {}
+        for i, name in enumerate(self.columns):
+            first.setdefault(name, i)
+        self.positions = {key: first[name] for key, name in self.cols.items() if name}
+    
+    def is_header(self) -> bool:
+        return 'PART NUMBER' in self.positions and len(self.positions) >= MIN_HEADER_MATCHES
+    
+    def usecols(self) -> list:
+        """Sorted indexes of the USED_COLUMNS this sheet has."""
+        return sorted({self.positions[key] for key in USED_COLUMNS if key in self.positions})
+
+
+_schema_cache = OrderedDict()
+_schema_cache_lock = threading.Lock()
+
+
+def _header_cells(values) -> tuple:
+    """Stripped text of a row's cells without trailing blanks (the header fingerprint)."""
+    cells = ['' if v is None or v != v else str(v).strip() for v in values]  # v != v: NaN/NaT
+    while cells and not cells[-1]:
+        cells.pop()
+    return tuple(cells)
+
+
+def detect_header(rows):
+    """
+    Find the header row among the first rows of a sheet.
+    
+    A row whose fingerprint was resolved before is used straight from the
+    schema cache. Otherwise the first row that resolves PART NUMBER plus at
+    least MIN_HEADER_MATCHES mapped columns is the header (and is cached);
+    failing that, the first non-blank row (the old behavior).
+    
+    Args:
+        rows: Iterable of row value sequences (None or NaN for empty cells)
+    
+    Returns:
+        tuple of (row index, SheetSchema, cache hit); (None, None, False)
+        if every row is blank
+    """
+    fingerprints = [_header_cells(values) for values in rows]
+    
+    with _schema_cache_lock:
+        for i, fingerprint in enumerate(fingerprints):
+            schema = _schema_cache.get(fingerprint)
+            if schema is not None:
+                _schema_cache.move_to_end(fingerprint)
+                return i, schema, True
+    
+    first_non_blank = None
+    for i, fingerprint in enumerate(fingerprints):
+        if not fingerprint:
+            continue
+        if first_non_blank is None:
+            first_non_blank = i
+        schema = SheetSchema(fingerprint)
+        if schema.is_header():
+            with _schema_cache_lock:
+                _schema_cache[fingerprint] = schema
+                while len(_schema_cache) > SCHEMA_CACHE_SIZE:
+                    _schema_cache.popitem(last=False)
+            return i, schema, False
+    
+    if first_non_blank is None:
+        return None, None, False
+    return first_non_blank, SheetSchema(fingerprints[first_non_blank]), False
+
 
+def _empty_result() -> dict:
+    return _build_result(_extract_header({}, resolve_columns([])), [], 0, 0.0)
 
-def parse_receiving_report(filepath: str) -> dict:
+
+def parse_receiving_report(filepath, streaming: bool = False, compact: bool = False) -> dict:
     """
     Parse a Receiving Report Excel file.
     
@@ -23,52 +208,69 @@ def parse_receiving_report(filepath: str) -> dict:
     - DATE: Transaction date
     - RECEIVING REPORT NUMBER: RR number
     
+    The header row is found among the first HEADER_SNIFF_ROWS rows (title
+    rows above it are skipped), and only the columns listed above are read;
+    other columns (notes, grades, formulas, ...) are never parsed.
+    
+    Args:
+        filepath: Path to the .xlsx/.xls file, or a seekable binary file-like
+            object holding it (e.g. BytesIO or a spooled upload stream)
+        streaming: Read rows lazily with openpyxl (read-only, .xlsx only)
+            instead of loading the whole sheet into a DataFrame. Use this for
+            very large reports.
+        compact: Return line items as LineItem objects with packed IMEIs
+            instead of dicts with lists of str (much smaller for big reports)
+    
     Returns:
         dict with invoice data structure
     """
-    # Read Excel file
-    df = pd.read_excel(filepath, header=0)
+    if streaming:
+        return _parse_streaming(filepath, compact)
+    
+    import pandas as pd
+    
+    # One open workbook for both passes
+    with pd.ExcelFile(filepath) as workbook:
+        # Pass 1: the first few rows, untyped, to find the header row and columns
+        sniff = pd.read_excel(workbook, header=None, nrows=HEADER_SNIFF_ROWS, dtype=object)
+        sniff_rows = list(sniff.itertuples(index=False, name=None))
+        header_row, schema, cached = detect_header(sniff_rows)
+        if schema is None:
+            return _empty_result()
+        emit('parse', 'progress', header_row=header_row, schema_cache='hit' if cached else 'miss')
+        
+        # Pass 2: only the used columns, text columns as str (labels are the
+        # raw header cells of this file, before stripping)
+        raw_header = sniff_rows[header_row]
+        dtype = {raw_header[schema.positions[key]]: str for key in TEXT_COLUMNS if key in schema.positions}
+        df = pd.read_excel(workbook, header=header_row, usecols=schema.usecols() or None, dtype=dtype)
+    emit('parse', 'progress', rows=len(df), columns=len(df.columns))
     
     # Normalize column names (strip whitespace, handle variations)
     df.columns = df.columns.str.strip()
     
-    # Map common column name variations
-    column_mapping = {
-        'PART NUMBER': ['PART NUMBER', 'PARTNUMBER', 'PART_NUMBER', 'PART #'],
-        'DESCRIPTION': ['DESCRIPTION', 'DESC'],
-        'IMEI': ['IMEI', 'IMEI / SERIAL NUMBER', 'SERIAL NUMBER', 'SERIAL'],
-        'QTY': ['QTY', 'QUANTITY'],
-        'UC': ['UC', 'UNIT COST', 'UNIT_COST', 'RATE', 'PRICE'],
-        'ORDER NUMBER': ['ORDER NUMBER', 'ORDER_NUMBER', 'ORDER #', 'ORDER'],
-        'DATE': ['DATE', 'TXN DATE', 'TRANSACTION DATE'],
-        'RECEIVING REPORT NUMBER': ['RECEIVING REPORT NUMBER', 'RR NUMBER', 'RR #', 'RR'],
-        'MODEL': ['MODEL'],
-        'MAKE': ['MAKE', 'MANUFACTURER'],
-        'COLOR': ['COLOR'],
-        'STORAGE': ['STORAGE'],
-    }
-    
-    def find_column(df, possible_names):
-        """Find the actual column name from possible variations."""
-        for name in possible_names:
-            if name in df.columns:
-                return name
-        return None
-    
-    # Find actual column names
-    col_part = find_column(df, column_mapping['PART NUMBER'])
-    col_desc = find_column(df, column_mapping['DESCRIPTION'])
-    col_imei = find_column(df, column_mapping['IMEI'])
-    col_qty = find_column(df, column_mapping['QTY'])
-    col_uc = find_column(df, column_mapping['UC'])
-    col_order = find_column(df, column_mapping['ORDER NUMBER'])
-    col_date = find_column(df, column_mapping['DATE'])
-    col_rr = find_column(df, column_mapping['RECEIVING REPORT NUMBER'])
-    col_model = find_column(df, column_mapping['MODEL'])
-    col_make = find_column(df, column_mapping['MAKE'])
+    # Resolved from the header row (same names as resolve_columns(df.columns))
+    cols = schema.cols
     
     # Extract header info from first data row
     first_row = df.iloc[0] if len(df) > 0 else {}
+    header = _extract_header(first_row, cols)
+    
+    # Group items by PART NUMBER + DESCRIPTION (vectorized, see group_line_items)
+    items_list, total_imeis, total_amount = group_line_items(
+        df, cols['PART NUMBER'], cols['DESCRIPTION'], cols['IMEI'], cols['UC'],
+        cols['MODEL'], cols['MAKE'], compact=compact
+    )
+    emit('parse', 'progress', line_items=len(items_list), imeis=total_imeis)
+    
+    return _build_result(header, items_list, total_imeis, total_amount)
+
+
+def _extract_header(first_row, cols) -> dict:
+    """Build the invoice header from the first data row (dict-like with .get)."""
+    col_order = cols['ORDER NUMBER']
+    col_rr = cols['RECEIVING REPORT NUMBER']
+    col_date = cols['DATE']
     
     order_number = str(first_row.get(col_order, 'N/A')) if col_order else 'N/A'
     rr_number = str(first_row.get(col_rr, 'N/A')) if col_rr else 'N/A'
@@ -82,15 +284,17 @@ def parse_receiving_report(filepath: str) -> dict:
     
     # Format date as YYYY-MM-DD for QuickBooks
     date = None
-    if raw_date is not None and pd.notna(raw_date):
+    if raw_date is not None:
         try:
             if hasattr(raw_date, 'strftime'):
-                # It's already a datetime object
+                # It's already a datetime object (NaT raises and falls through)
                 date = raw_date.strftime('%Y-%m-%d')
             else:
                 # Try to parse it
-                parsed = pd.to_datetime(raw_date)
-                date = parsed.strftime('%Y-%m-%d')
+                import pandas as pd
+                if pd.notna(raw_date):
+                    parsed = pd.to_datetime(raw_date)
+                    date = parsed.strftime('%Y-%m-%d')
         except:
             pass
     
@@ -99,77 +303,368 @@ def parse_receiving_report(filepath: str) -> dict:
         from datetime import date as dt_date
         date = dt_date.today().isoformat()
     
-    # Group items by PART NUMBER + DESCRIPTION
-    line_items = defaultdict(lambda: {
-        'part_number': '',
-        'description': '',
-        'model': '',
-        'make': '',
-        'imeis': [],
-        'quantity': 0,
-        'unit_cost': 0,
-        'amount': 0
-    })
+    return {
+        'order_number': order_number,
+        'rr_number': rr_number,
+        'date': date,
+        'customer': 'Universal Cellular Customer',  # Default customer
+    }
+
+
+def _build_result(header, items_list, total_imeis, total_amount) -> dict:
+    return {
+        'header': header,
+        'line_items': items_list,
+        'summary': {
+            'total_line_items': len(items_list),
+            'total_imeis': total_imeis,
+            'total_amount': total_amount
+        }
+    }
+
+
+def _to_cents(value) -> int:
+    """Money value to integer cents (round half to even, like np.rint)."""
+    return int(round(float(value) * 100))
+
+
+def _finalize_line_items(groups, compact=False):
+    """
+    Turn grouped rows into sorted line items.
+    
+    Money is kept in integer cents until the very end, so amounts and the
+    total are exact sums of cent values (no float error accumulating over
+    hundreds of lines).
     
+    Args:
+        groups: Iterable of (part_number, description, model, make, imeis,
+            unit_cents) tuples in first-appearance order
+        compact: Build LineItem objects instead of dicts
+    
+    Returns:
+        tuple of (line items sorted by part number, total IMEIs, total amount
+        as a float - 0.0 when there are no items)
+    """
+    items_list = []
     total_imeis = 0
+    total_cents = 0
+    for part_number, description, model, make, imeis, unit_cents in groups:
+        quantity = len(imeis)
+        amount_cents = quantity * unit_cents
+        total_imeis += quantity
+        total_cents += amount_cents
+        unit_cost = unit_cents / 100
+        amount = amount_cents / 100
+        if compact:
+            items_list.append(LineItem(part_number, description, model, make, imeis, unit_cost, amount))
+            continue
+        items_list.append({
+            'part_number': part_number,
+            'description': description,
+            'model': model,
+            'make': make,
+            'imeis': imeis,
+            'quantity': quantity,
+            'unit_cost': unit_cost,
+            'amount': amount,
+        })
     
-    for idx, row in df.iterrows():
-        part_number = str(row.get(col_part, '')).strip() if col_part else ''
-        description = str(row.get(col_desc, '')).strip() if col_desc else ''
-        imei = str(row.get(col_imei, '')).strip() if col_imei else ''
-        
-        # Skip empty rows
+    # Sort by part number (stable, so groups keep first-appearance order)
+    items_list.sort(key=lambda x: x['part_number'])
+    
+    return items_list, total_imeis, total_cents / 100
+
+
+def _normalize_text(series: 'pd.Series') -> 'pd.Series':
+    """
+    Column-level equivalent of ``str(cell).strip()``.
+    
+    Missing cells become the string 'nan', exactly like ``str(float('nan'))``
+    did in the original row-by-row loop, so downstream checks are unchanged.
+    """
+    as_object = series.astype(object)
+    return as_object.where(series.notna(), 'nan').astype(str).str.strip()
+
+
+def _normalize_serials(series: 'pd.Series') -> 'pd.Series':
+    """
+    _normalize_text for IMEI / serial columns.
+    
+    Whole-number floats are written as integers: a numeric IMEI column with
+    a blank cell is float64, and str() would turn 353220000000000.0 into
+    '353220000000000.0' (or worse, '3.5322e+14' after a round trip).
+    """
+    import pandas as pd
+    
+    if pd.api.types.is_float_dtype(series.dtype):
+        text = _normalize_text(series)
+        whole = (series.notna() & (series % 1 == 0) & (series.abs() < 1e18)).to_numpy()
+        if whole.any():
+            text[whole] = series[whole].astype('int64').astype(str)
+        return text
+    if series.dtype == object:
+        series = series.map(_serial_value)
+    return _normalize_text(series)
+
+
+def _serial_value(value):
+    """Whole-number float -> int (other values unchanged)."""
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e18:
+        return int(value)
+    return value
+
+
+def _last_per_group(group_ids, values, out):
+    """Set out[g] to the last of values in each group g (groups absent from group_ids keep out[g])."""
+    import numpy as np
+    
+    present, first_from_end = np.unique(group_ids[::-1], return_index=True)
+    out[present] = values[::-1][first_from_end]
+    return out
+
+
+def _pack_serials(imeis: 'np.ndarray'):
+    """
+    int64 copy of a serial array if every serial is an ASCII digit string of
+    one width (at most MAX_PACKED_DIGITS), else None.
+    
+    Returns:
+        (int64 ndarray, width) or (None, 0)
+    """
+    import numpy as np
+    import pandas as pd
+    
+    if not len(imeis):
+        return None, 0
+    serials = pd.Series(imeis, dtype=object)
+    width = len(imeis[0])
+    if width > MAX_PACKED_DIGITS or not (serials.str.len() == width).all():
+        return None, 0
+    if not serials.str.fullmatch(r'[0-9]+').all():
+        return None, 0
+    return serials.astype(np.int64).to_numpy(), width
+
+
+def group_line_items(df: 'pd.DataFrame', col_part, col_desc, col_imei, col_uc,
+                     col_model=None, col_make=None, compact=False):
+    """
+    Group receiving report rows into invoice line items.
+    
+    Rows are grouped by PART NUMBER + DESCRIPTION. Rows without a part number
+    are skipped, MODEL/MAKE come from the last row of each group, UNIT COST is
+    the last valid number in the group, and quantity is the IMEI count.
+    
+    All per-row work is vectorized: part and description are factorized
+    into integer codes (first-appearance order), unit costs become int64
+    cents, IMEIs are counted with bincount and, for compact output, packed
+    as int64 in one conversion. Python only loops once per group.
+    
+    Args:
+        df: Receiving report DataFrame with stripped column names
+        col_*: Resolved column names (None if the column is missing)
+        compact: Build LineItem objects instead of dicts
+    
+    Returns:
+        tuple of (line items sorted by part number, total IMEIs, total amount)
+    """
+    if not col_part or len(df) == 0:
+        return _finalize_line_items((), compact)
+    
+    import numpy as np
+    import pandas as pd
+    
+    part = _normalize_text(df[col_part]).to_numpy()
+    keep = (part != '') & (part != 'nan')
+    if not keep.any():
+        return _finalize_line_items((), compact)
+    part = part[keep]
+    
+    def column(col, normalize=_normalize_text):
+        return normalize(df[col]).to_numpy()[keep] if col else None
+    
+    # Group ids in first-appearance order: codes for part and description,
+    # then codes for the (part, description) pairs
+    part_codes, part_values = pd.factorize(part)
+    desc = column(col_desc)
+    if desc is not None:
+        desc_codes, desc_values = pd.factorize(desc)
+    else:
+        desc_codes, desc_values = np.zeros(len(part), dtype=np.int64), np.array([''], dtype=object)
+    n_desc = len(desc_values)
+    group_ids, pairs = pd.factorize(part_codes.astype(np.int64) * n_desc + desc_codes)
+    n_groups = len(pairs)
+    
+    # MODEL / MAKE from the last row of each group
+    blank = np.full(n_groups, '', dtype=object)
+    model = column(col_model)
+    make = column(col_make)
+    models = _last_per_group(group_ids, model, blank.copy()) if model is not None else blank
+    makes = _last_per_group(group_ids, make, blank.copy()) if make is not None else blank
+    
+    # Last valid unit cost of each group, in integer cents (0 if none)
+    unit_cents = np.zeros(n_groups, dtype=np.int64)
+    if col_uc:
+        uc = pd.to_numeric(df[col_uc], errors='coerce').to_numpy(dtype=float)[keep]
+        valid = ~np.isnan(uc)
+        if valid.any():
+            _last_per_group(group_ids[valid], np.rint(uc[valid] * 100).astype(np.int64), unit_cents)
+    
+    # IMEIs grouped contiguously (stable, so each group keeps row order)
+    imeis = column(col_imei, _normalize_serials)
+    if imeis is not None:
+        has_imei = (imeis != '') & (imeis != 'nan')
+        imei_groups = group_ids[has_imei]
+        imeis = imeis[has_imei][np.argsort(imei_groups, kind='stable')]
+        counts = np.bincount(imei_groups, minlength=n_groups)
+    else:
+        imeis = np.empty(0, dtype=object)
+        counts = np.zeros(n_groups, dtype=np.int64)
+    bounds = np.concatenate(([0], np.cumsum(counts))).tolist()
+    
+    numbers, width = _pack_serials(imeis) if compact else (None, 0)
+    
+    def group_imeis(g):
+        start, end = bounds[g], bounds[g + 1]
+        if numbers is not None:
+            return ImeiArray.from_numbers(numbers[start:end], width)
+        return imeis[start:end].tolist()
+    
+    groups = (
+        (
+            part_values[pair // n_desc],
+            desc_values[pair % n_desc] if desc is not None else '',
+            models[g],
+            makes[g],
+            group_imeis(g),
+            int(unit_cents[g]),
+        )
+        for g, pair in enumerate(pairs.tolist())
+    )
+    return _finalize_line_items(groups, compact)
+
+
+# =============================================================================
+# Streaming (read-only) ingestion
+# =============================================================================
+
+def _cell_text(value) -> str:
+    """Per-cell equivalent of _normalize_text for openpyxl values."""
+    if value is None:
+        return 'nan'
+    return str(value).strip()
+
+
+class LineItemAccumulator:
+    """
+    Incremental PART NUMBER + DESCRIPTION grouping for streamed rows.
+    
+    Applies the same rules as group_line_items, one row at a time, so the
+    only state kept is one entry per distinct line item (plus its IMEIs).
+    """
+    
+    def __init__(self):
+        # key -> [model, make, imeis, unit_cents]
+        self._groups = {}
+    
+    def add(self, part, desc, imei, unit_cost, model=None, make=None):
+        """Add one raw row (openpyxl cell values, None for missing cells)."""
+        part_number = _cell_text(part)
         if not part_number or part_number == 'nan':
-            continue
-        
-        # Create unique key for grouping
-        key = f"{part_number}|{description}"
+            return
         
-        item = line_items[key]
-        item['part_number'] = part_number
-        item['description'] = description
+        key = (part_number, desc)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = ['', '', [], 0]  # unit cost in cents
         
-        if col_model:
-            item['model'] = str(row.get(col_model, '')).strip()
-        if col_make:
-            item['make'] = str(row.get(col_make, '')).strip()
+        if model is not None:
+            group[0] = model
+        if make is not None:
+            group[1] = make
         
-        # Get unit cost (should be same for all items in group)
-        if col_uc and pd.notna(row.get(col_uc)):
+        if unit_cost is not None:
             try:
-                item['unit_cost'] = float(row.get(col_uc, 0))
-            except (ValueError, TypeError):
-                pass
+                cents = _to_cents(unit_cost)
+            except (ValueError, TypeError, OverflowError):
+                pass  # Text and NaN/inf costs are skipped, like pd.to_numeric(errors='coerce')
+            else:
+                group[3] = cents
         
-        # Add IMEI to list
         if imei and imei != 'nan':
-            item['imeis'].append(imei)
-            total_imeis += 1
+            group[2].append(imei)
     
-    # Calculate quantities and amounts
-    items_list = []
-    total_amount = 0
-    
-    for key, item in line_items.items():
-        item['quantity'] = len(item['imeis'])
-        item['amount'] = item['quantity'] * item['unit_cost']
-        total_amount += item['amount']
-        items_list.append(item)
+    def result(self, compact=False):
+        """Return (line items, total IMEIs, total amount)."""
+        return _finalize_line_items(
+            (
+                (part, desc, model, make, imeis, unit_cents)
+                for (part, desc), (model, make, imeis, unit_cents) in self._groups.items()
+            ),
+            compact,
+        )
+
+
+def _parse_streaming(filepath, compact=False) -> dict:
+    """Parse a receiving report row by row with openpyxl in read-only mode."""
+    from openpyxl import load_workbook
     
-    # Sort by part number
-    items_list.sort(key=lambda x: x['part_number'])
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        
+        # Find the header among the first rows, then continue after it
+        sniffed = list(islice(rows, HEADER_SNIFF_ROWS))
+        header_row, schema, cached = detect_header(sniffed)
+        if schema is None:
+            return _empty_result()
+        emit('parse', 'progress', header_row=header_row, schema_cache='hit' if cached else 'miss')
+        rows = chain(sniffed[header_row + 1:], rows)
+        
+        columns = schema.columns
+        cols = schema.cols
+        
+        def position(key):
+            return schema.positions.get(key)
+        
+        i_part = position('PART NUMBER')
+        i_desc = position('DESCRIPTION')
+        i_imei = position('IMEI')
+        i_uc = position('UC')
+        i_model = position('MODEL')
+        i_make = position('MAKE')
+        
+        def cell(values, i):
+            return values[i] if i is not None and i < len(values) else None
+        
+        accumulator = LineItemAccumulator()
+        first_row = None
+        row_count = 0
+        
+        for values in rows:
+            row_count += 1
+            if row_count % PROGRESS_EVERY_ROWS == 0:
+                emit('parse', 'progress', rows=row_count)
+            if first_row is None:
+                if all(v is None for v in values):
+                    continue
+                first_row = {
+                    name: float('nan') if v is None else v
+                    for name, v in zip(columns, values)
+                }
+            
+            part = cell(values, i_part) if i_part is not None else ''
+            accumulator.add(
+                part,
+                _cell_text(cell(values, i_desc)) if i_desc is not None else '',
+                _cell_text(_serial_value(cell(values, i_imei))) if i_imei is not None else '',
+                cell(values, i_uc),
+                _cell_text(cell(values, i_model)) if i_model is not None else None,
+                _cell_text(cell(values, i_make)) if i_make is not None else None,
+            )
+    finally:
+        workbook.close()
     
-    return {
-        'header': {
-            'order_number': order_number,
-            'rr_number': rr_number,
-            'date': date,
-            'customer': 'Universal Cellular Customer',  # Default customer
-        },
-        'line_items': items_list,
-        'summary': {
-            'total_line_items': len(items_list),
-            'total_imeis': total_imeis,
-            'total_amount': total_amount
-        }
-    }
+    header = _extract_header(first_row or {}, cols)
+    items_list, total_imeis, total_amount = accumulator.result(compact)
+    emit('parse', 'progress', rows=row_count, line_items=len(items_list), imeis=total_imeis)
+    return _build_result(header, items_list, total_imeis, total_amount)
@@ -2,10 +2,17 @@
 Invoice generator with mock QuickBooks response.
 For demo purposes - simulates QB invoice creation.
 """
+import os
 import random
 import string
+import sys
 from datetime import datetime
 
+# Add parent directory to path for quickbooks_desktop imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from quickbooks_desktop import qbxml_templates as templates
+
 
 def generate_mock_invoice(parsed_data: dict) -> dict:
     """
@@ -18,6 +25,7 @@ def generate_mock_invoice(parsed_data: dict) -> dict:
     
     Args:
         parsed_data: Output from excel_parser.parse_receiving_report()
+            (line items may be dicts or compact LineItem objects)
     
     Returns:
         dict with invoice result and mock QB response
@@ -91,35 +99,13 @@ def generate_qbxml_invoice(parsed_data: dict) -> str:
     """
     header = parsed_data['header']
     
-    # Build line items XML
-    lines_xml = ""
-    for item in parsed_data['line_items']:
-        # For each unique item, create a line
-        lines_xml += f"""
-        <InvoiceLineAdd>
-          <ItemRef>
-            <FullName>{item['part_number']}</FullName>
-          </ItemRef>
-          <Desc>{item['description']}</Desc>
-          <Quantity>{item['quantity']}</Quantity>
-          <Rate>{item['unit_cost']:.2f}</Rate>
-        </InvoiceLineAdd>"""
-    
-    xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <InvoiceAddRq>
-      <InvoiceAdd>
-        <CustomerRef>
-          <FullName>{header['customer']}</FullName>
-        </CustomerRef>
-        <TxnDate>{header['date']}</TxnDate>
-        <Memo>RR# {header['rr_number']} - {header['order_number']}</Memo>
-        {lines_xml}
-      </InvoiceAdd>
-    </InvoiceAddRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
+    # One line per unique item
+    lines = (
+        (item['part_number'], item['description'], item['quantity'], item['unit_cost'])
+        for item in parsed_data['line_items']
+    )
+    xml = templates.invoice_add(
+        header['customer'], header['date'], f"RR# {header['rr_number']} - {header['order_number']}", lines
+    )
     
     return xml
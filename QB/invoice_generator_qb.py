@@ -2,334 +2,81 @@
 Real QuickBooks invoice generator.
 Connects to QB Desktop and creates actual invoices.
 """
-import re
+import logging
 import sys
 import os
+import time
 from datetime import datetime
-import traceback
-
-# CRITICAL: Set COM threading model BEFORE importing pythoncom
-# 0 = COINIT_MULTITHREADED (required for Flask/web apps)
-sys.coinit_flags = 0
-import pythoncom
 
 # Add parent directory to path for quickbooks_desktop imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from quickbooks_desktop.session_manager import SessionManager
+from quickbooks_desktop import qbxml_templates as templates
+from quickbooks_desktop.catalog import get_catalog
+from quickbooks_desktop.log import get_logger, payload
+from quickbooks_desktop.progress import emit, stage
+from quickbooks_desktop.qb_executor import get_executor, run_in_session
+from quickbooks_desktop.qb_helpers import provision_report_items
+from quickbooks_desktop.qbxml_parser import QBXMLError, parse_single_response
 
+from ledger import get_ledger
 
-def escape_xml(text):
-    """
-    Escape special characters for XML and remove invalid XML characters.
-    
-    Args:
-        text: String to escape
-        
-    Returns:
-        XML-safe string
-    """
-    if text is None:
-        return ""
-    
-    if not isinstance(text, str):
-        text = str(text)
-    
-    # Remove control characters that are invalid in XML (except tab, newline, carriage return)
-    # Valid XML chars: #x9 | #xA | #xD | [#x20-#xD7FF] | [#xE000-#xFFFD]
-    cleaned = []
-    for char in text:
-        code = ord(char)
-        if code == 0x9 or code == 0xA or code == 0xD:  # tab, newline, carriage return
-            cleaned.append(char)
-        elif code >= 0x20 and code <= 0xD7FF:
-            cleaned.append(char)
-        elif code >= 0xE000 and code <= 0xFFFD:
-            cleaned.append(char)
-        # else: skip invalid characters
-    
-    text = ''.join(cleaned)
-    
-    # Escape XML special characters (order matters - & must be first!)
-    text = text.replace('&', '&amp;')
-    text = text.replace('<', '&lt;')
-    text = text.replace('>', '&gt;')
-    text = text.replace('"', '&quot;')
-    text = text.replace("'", '&apos;')
-    
-    return text
+
+logger = get_logger('invoice_generator_qb')
+
+# QB has a limit of 250 quantity per line - larger quantities are split into multiple lines
+MAX_QTY_PER_LINE = 250
+
+# Create a service item per part number before invoicing and bill each line
+# against its own item (otherwise every line uses the first existing item)
+AUTO_PROVISION_ITEMS = os.getenv('QB_AUTO_PROVISION_ITEMS', 'false').lower() == 'true'
 
 
 def get_first_customer(qb):
-    """Query QB for the first available customer."""
-    xml = """<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <CustomerQueryRq><MaxReturned>1</MaxReturned></CustomerQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-    response = qb.send_request(xml)
-    match = re.search(r'<FullName>([^<]+)</FullName>', response)
-    return match.group(1) if match else None
+    """Return the first active QB customer (from the local catalog cache)."""
+    with stage('catalog_lookup', entity='customer') as info:
+        info['name'] = get_catalog().first_customer(qb)
+    return info['name']
 
 
 def get_first_item(qb):
-    """Query QB for the first available item (matching create_test_invoice pattern)."""
-    xml = """<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <ItemQueryRq><MaxReturned>5</MaxReturned></ItemQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-    response = qb.send_request(xml)
-    # Find item names
-    matches = re.findall(r'<FullName>([^<]+)</FullName>', response)
-    return matches[0] if matches else None
+    """Return the first active QB item (from the local catalog cache)."""
+    with stage('catalog_lookup', entity='item') as info:
+        info['name'] = get_catalog().first_item(qb)
+    return info['name']
 
 
-def create_qb_invoice(parsed_data: dict) -> dict:
+def create_qb_invoice(parsed_data: dict, file_sha256: str = None, report_id: int = None) -> dict:
     """
     Create a real invoice in QuickBooks from parsed Excel data.
     
+    Created invoices are recorded in the local invoice ledger (RR number,
+    order number, TxnID and IMEIs) for duplicate detection.
+    
     Args:
         parsed_data: Output from excel_parser.parse_receiving_report()
-        
+            (line items may be dicts or compact LineItem objects)
+        file_sha256: SHA-256 of the uploaded file, recorded in the ledger
+        report_id: Pending ledger report from InvoiceLedger.reserve(); it is
+            completed on success and released on failure (otherwise the
+            invoice is recorded as a new report)
+    
     Returns:
         dict with invoice result and QB response (same format as mock generator)
-
+    
     Example: 
         parsed data -> excel parser -> parsed_data -> invoice generator -> invoice xml -> send to qb -> response -> return to app.py
     """
-    # Ensure COM is initialized for THIS thread (Flask may use different threads)
-    # This is critical - COM objects are thread-specific and will crash if accessed from wrong thread
-    print("\n" + "=" * 60)
-    print("CREATE_QB_INVOICE STARTING")
-    print("=" * 60)
+    # All COM work runs on the shared QuickBooks executor thread, which owns
+    # the COM apartment and keeps one session open between uploads
+    logger.info("Creating QuickBooks invoice (%d line items)", len(parsed_data['line_items']))
     
     try:
-        pythoncom.CoInitialize()
-        print("✓ COM initialized")
-    except Exception as e:
-        print(f"COM init error (may be ok if already initialized): {e}")
-    
-    qb = SessionManager()
+        result = run_in_session(_create_invoice, parsed_data)
     
-    try:
-        # Connect to QuickBooks
-        print("\n--- Step 1: Connecting to QuickBooks ---")
-        try:
-            qb.open_connection()
-            print("✓ Connection opened")
-        except Exception as e:
-            print(f"✗ Connection failed: {e}")
-            print(f"  Traceback: {traceback.format_exc()}")
-            raise
-        
-        try:
-            qb.begin_session()
-            print("✓ Session started")
-        except Exception as e:
-            print(f"✗ Session failed: {e}")
-            print(f"  Traceback: {traceback.format_exc()}")
-            raise
-        
-        header = parsed_data['header']
-        
-        # Get existing customer from QB (same as create_test_invoice)
-        print("\n--- Step 2: Finding Customer ---")
-        try:
-            customer = get_first_customer(qb)
-            if not customer:
-                raise Exception("No customers found in QuickBooks. Please add a customer first.")
-            print(f"✓ Using QB customer: {customer}")
-        except Exception as e:
-            print(f"✗ Customer query failed: {e}")
-            print(f"  Traceback: {traceback.format_exc()}")
-            raise
-        
-        # Get existing item from QB (same as create_test_invoice - use what already exists!)
-        print("\n--- Step 3: Finding Item ---")
-        try:
-            qb_item = get_first_item(qb)
-            if not qb_item:
-                raise Exception("No items found in QuickBooks. Run 'Setup Sample Data' first.")
-            print(f"✓ Using QB item: {qb_item}")
-        except Exception as e:
-            print(f"✗ Item query failed: {e}")
-            print(f"  Traceback: {traceback.format_exc()}")
-            raise
-        
-        # Build line items XML - use the EXISTING QB item, put part details in description
-        # QB has a limit of 250 quantity per line - split larger quantities into multiple lines
-        MAX_QTY_PER_LINE = 250
-        
-        print(f"\n--- Step 4: Building Invoice XML ({len(parsed_data['line_items'])} line items) ---")
-        lines_xml = ""
-        line_count = 0
-        
-        for idx, item in enumerate(parsed_data['line_items'], 1):
-            part_number = escape_xml(str(item.get('part_number', '') or ''))
-            description = escape_xml(str(item.get('description', '') or ''))
-            
-            # Put full part number + description in the Desc field (limit to 4095 chars - QB max)
-            full_desc = f"{part_number} | {description}"
-            if len(full_desc) > 4095:
-                full_desc = full_desc[:4092] + "..."
-            
-            # Ensure quantity is a valid integer
-            try:
-                quantity = int(item.get('quantity', 1) or 1)
-                if quantity < 1:
-                    quantity = 1
-            except (ValueError, TypeError):
-                quantity = 1
-            
-            # Ensure rate is a valid float
-            try:
-                rate = float(item.get('unit_cost', 0) or 0)
-            except (ValueError, TypeError):
-                rate = 0.00
-            
-            # Split quantities over 250 into multiple lines
-            remaining_qty = quantity
-            split_num = 0
-            while remaining_qty > 0:
-                line_qty = min(remaining_qty, MAX_QTY_PER_LINE)
-                remaining_qty -= line_qty
-                split_num += 1
-                line_count += 1
-                
-                # Add split indicator to description if this item was split
-                line_desc = full_desc
-                if quantity > MAX_QTY_PER_LINE:
-                    line_desc = f"{full_desc} (part {split_num})"
-                
-                if split_num == 1:
-                    print(f"  Line {idx}: qty={quantity}, rate={rate:.2f}, desc={full_desc[:50]}..." + 
-                          (f" [SPLIT into {(quantity // MAX_QTY_PER_LINE) + (1 if quantity % MAX_QTY_PER_LINE else 0)} lines]" if quantity > MAX_QTY_PER_LINE else ""))
-                
-                lines_xml += f"""
-        <InvoiceLineAdd>
-          <ItemRef>
-            <FullName>{escape_xml(qb_item)}</FullName>
-          </ItemRef>
-          <Desc>{line_desc}</Desc>
-          <Quantity>{line_qty}</Quantity>
-          <Rate>{rate:.2f}</Rate>
-        </InvoiceLineAdd>"""
-        
-        print(f"  Total XML lines: {line_count}")
-        
-        # Build full invoice XML
-        memo = escape_xml(f"RR# {header['rr_number']} - {header['order_number']}")
-        txn_date = header['date']
-        
-        # Validate date format (must be YYYY-MM-DD)
-        if not txn_date or len(txn_date) != 10 or txn_date[4] != '-' or txn_date[7] != '-':
-            from datetime import date
-            txn_date = date.today().isoformat()
-        
-        invoice_xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <InvoiceAddRq>
-      <InvoiceAdd>
-        <CustomerRef>
-          <FullName>{escape_xml(customer)}</FullName>
-        </CustomerRef>
-        <TxnDate>{txn_date}</TxnDate>
-        <Memo>{memo}</Memo>{lines_xml}
-      </InvoiceAdd>
-    </InvoiceAddRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-        
-        # Debug: print the FULL XML being sent (so we can see what breaks)
-        print("\n--- Step 5: Sending Invoice to QuickBooks ---")
-        print("FULL INVOICE XML:")
-        print("=" * 40)
-        print(invoice_xml)
-        print("=" * 40)
-        
-        # Send request to QuickBooks
-        try:
-            response = qb.send_request(invoice_xml)
-            print("✓ Request sent successfully")
-        except Exception as e:
-            print(f"✗ Request failed: {e}")
-            print(f"  Traceback: {traceback.format_exc()}")
-            raise
-        
-        # Debug: print QB response
-        print("\nQUICKBOOKS RESPONSE:")
-        print(response[:1000] if len(response) > 1000 else response)
-        
-        # Parse response
-        if 'statusCode="0"' in response:
-            # Success - extract invoice details
-            txn_match = re.search(r'<TxnID>([^<]+)</TxnID>', response)
-            ref_match = re.search(r'<RefNumber>([^<]+)</RefNumber>', response)
-            
-            txn_id = txn_match.group(1) if txn_match else "Unknown"
-            invoice_number = ref_match.group(1) if ref_match else "Unknown"
-            
-            # Build QB-style line items for response
-            qb_line_items = []
-            for idx, item in enumerate(parsed_data['line_items'], 1):
-                qb_line_items.append({
-                    'line_number': idx,
-                    'item_ref': item['part_number'],
-                    'description': f"{item['description']} ({item['make']} {item['model']})" if item.get('make') else item['description'],
-                    'quantity': item['quantity'],
-                    'rate': item['unit_cost'],
-                    'amount': item['amount'],
-                    'serial_numbers': item['imeis'][:5] + (['...'] if len(item['imeis']) > 5 else []),
-                    'total_serials': len(item['imeis'])
-                })
-            
-            return {
-                'success': True,
-                'message': f'Invoice {invoice_number} created in QuickBooks',
-                'invoice': {
-                    'number': invoice_number,
-                    'txn_id': txn_id,
-                    'customer': customer,  # Actual QB customer used
-                    'date': header['date'],
-                    'memo': f"RR# {header['rr_number']} - {header['order_number']}",
-                    'line_items': qb_line_items,
-                    'summary': {
-                        'line_count': len(qb_line_items),
-                        'total_units': parsed_data['summary']['total_imeis'],
-                        'subtotal': parsed_data['summary']['total_amount'],
-                        'total': parsed_data['summary']['total_amount']
-                    }
-                },
-                'qb_response': {
-                    'status_code': 0,
-                    'status_message': 'Status OK',
-                    'txn_id': txn_id,
-                    'ref_number': invoice_number
-                },
-                'demo_mode': False,
-                'timestamp': datetime.now().isoformat()
-            }
-        else:
-            # Error - extract error message
-            error_match = re.search(r'statusMessage="([^"]+)"', response)
-            error_msg = error_match.group(1) if error_match else "Unknown QuickBooks error"
-            
-            # Extract status code
-            code_match = re.search(r'statusCode="([^"]+)"', response)
-            status_code = code_match.group(1) if code_match else "Unknown"
-            
-            raise Exception(f"QuickBooks error ({status_code}): {error_msg}")
-
-                        
-            
     except Exception as e:
+        logger.exception("Invoice creation failed: %s", e)
+        _release_reservation(report_id)
         return {
             'success': False,
             'error': str(e),
@@ -338,37 +85,214 @@ def create_qb_invoice(parsed_data: dict) -> dict:
             'demo_mode': False,
             'timestamp': datetime.now().isoformat()
         }
-        
-    finally:
-        # Clean up in reverse order: session -> connection -> COM
-        print("\n--- Cleanup ---")
+    
+    # Off the QuickBooks thread; the invoice exists either way, so a ledger
+    # failure is logged rather than reported as a failed upload
+    ledger = get_ledger()
+    if ledger is not None:
         try:
-            if qb.session_begun:
-                qb.end_session()
-                print("✓ Session ended")
+            with stage('ledger_record', imeis=parsed_data['summary']['total_imeis']):
+                if report_id is not None:
+                    ledger.complete(report_id, result['invoice']['txn_id'], result['invoice']['number'])
+                else:
+                    ledger.record(parsed_data, result['invoice']['txn_id'], result['invoice']['number'],
+                                  file_sha256=file_sha256)
         except Exception as e:
-            print(f"⚠ Session end error: {e}")
+            logger.exception("Could not record invoice %s in the ledger: %s", result['invoice']['number'], e)
+    
+    return result
+
+
+def _release_reservation(report_id):
+    """Drop a pending ledger report whose invoice was not created (errors are logged)."""
+    ledger = get_ledger()
+    if report_id is None or ledger is None:
+        return
+    try:
+        ledger.release(report_id)
+    except Exception as e:
+        logger.exception("Could not release ledger report %s: %s", report_id, e)
+
+
+def _create_invoice(qb, parsed_data: dict) -> dict:
+    """
+    Build and send the InvoiceAdd request on an open session.
+    
+    Runs on the QuickBooks executor thread (see create_qb_invoice).
+    
+    Raises:
+        Exception: If lookups fail or QuickBooks rejects the invoice
+    """
+    logger.debug("Using shared session (sessions opened so far: %d)", get_executor().sessions_opened)
+    
+    header = parsed_data['header']
+    
+    # Get existing customer (catalog cache - refreshed from QB only when its TTL expires)
+    try:
+        customer = get_first_customer(qb)
+        if not customer:
+            raise Exception("No customers found in QuickBooks. Please add a customer first.")
+        logger.debug("Using QB customer: %s", customer)
+    except Exception as e:
+        logger.error("Customer query failed: %s", e)
+        raise
+    
+    # Get existing item from QB (same as create_test_invoice - use what already exists!)
+    try:
+        qb_item = get_first_item(qb)
+        if not qb_item:
+            raise Exception("No items found in QuickBooks. Run 'Setup Sample Data' first.")
+        logger.debug("Using QB item: %s", qb_item)
+    except Exception as e:
+        logger.error("Item query failed: %s", e)
+        raise
+    
+    # Part number -> QB item; one lookup query plus one batched add for the missing ones
+    item_refs = {}
+    if AUTO_PROVISION_ITEMS:
+        provisioned = provision_report_items(qb, parsed_data)
+        logger.info("Provisioned report items: %s", provisioned['message'])
+        for name, message in provisioned['failed'].items():
+            logger.warning("Could not create item %s (using %s): %s", name, qb_item, message)
+        item_refs = {name: name for name in provisioned['created'] + provisioned['existed']}
+    
+    memo = f"RR# {header['rr_number']} - {header['order_number']}"
+    txn_date = header['date']
+    
+    # Validate date format (must be YYYY-MM-DD)
+    if not txn_date or len(txn_date) != 10 or txn_date[4] != '-' or txn_date[7] != '-':
+        from datetime import date
+        txn_date = date.today().isoformat()
+    
+    # Fragments are collected and joined once (linear in the number of lines)
+    emit('build_xml', 'start', line_items=len(parsed_data['line_items']))
+    build_start = time.perf_counter()
+    lines = list(_invoice_lines(parsed_data['line_items'], qb_item, item_refs))
+    line_count = len(lines)
+    invoice_xml = templates.invoice_add(customer, txn_date, memo, lines)
+    emit('build_xml', 'end', lines=line_count, bytes=len(invoice_xml),
+         duration_ms=round((time.perf_counter() - build_start) * 1000, 1))
+    
+    logger.info("Sending InvoiceAdd: %d lines, %d bytes", line_count, len(invoice_xml))
+    # Full XML only at DEBUG (payload limit 0 = uncapped)
+    logger.debug("Invoice XML:\n%s", payload(invoice_xml, limit=0))
+    
+    # Send request to QuickBooks
+    try:
+        response = qb.send_request(invoice_xml)
+    except Exception as e:
+        logger.error("InvoiceAdd request failed: %s", e)
+        raise
+    
+    logger.debug("QuickBooks response: %s", payload(response))
+    
+    # Parse response
+    rs = parse_single_response(response)
+    if rs.status_code == 0:
+        # Success - extract invoice details
+        invoice_ret = rs.records[0] if rs.records else {}
+        txn_id = invoice_ret.get('TxnID', "Unknown")
+        invoice_number = invoice_ret.get('RefNumber', "Unknown")
+        logger.info("Invoice %s created (TxnID %s)", invoice_number, txn_id)
         
-        try:
-            if qb.connection_open:
-                qb.close_connection()
-                print("✓ Connection closed")
-        except Exception as e:
-            print(f"⚠ Connection close error: {e}")
+        # Build QB-style line items for response
+        qb_line_items = []
+        for idx, item in enumerate(parsed_data['line_items'], 1):
+            qb_line_items.append({
+                'line_number': idx,
+                'item_ref': item['part_number'],
+                'description': f"{item['description']} ({item['make']} {item['model']})" if item.get('make') else item['description'],
+                'quantity': item['quantity'],
+                'rate': item['unit_cost'],
+                'amount': item['amount'],
+                'serial_numbers': item['imeis'][:5] + (['...'] if len(item['imeis']) > 5 else []),
+                'total_serials': len(item['imeis'])
+            })
+        
+        return {
+            'success': True,
+            'message': f'Invoice {invoice_number} created in QuickBooks',
+            'invoice': {
+                'number': invoice_number,
+                'txn_id': txn_id,
+                'customer': customer,  # Actual QB customer used
+                'date': header['date'],
+                'memo': f"RR# {header['rr_number']} - {header['order_number']}",
+                'line_items': qb_line_items,
+                'summary': {
+                    'line_count': len(qb_line_items),
+                    'total_units': parsed_data['summary']['total_imeis'],
+                    'subtotal': parsed_data['summary']['total_amount'],
+                    'total': parsed_data['summary']['total_amount']
+                }
+            },
+            'qb_response': {
+                'status_code': 0,
+                'status_message': 'Status OK',
+                'txn_id': txn_id,
+                'ref_number': invoice_number
+            },
+            'demo_mode': False,
+            'timestamp': datetime.now().isoformat()
+        }
+    else:
+        # Error - raise with QuickBooks' status code and message
+        raise QBXMLError(rs.status_code, rs.status_message or "Unknown QuickBooks error", rs.request_type)
+
+
+def _invoice_lines(line_items, qb_item, item_refs=None):
+    """
+    Invoice lines for parsed line items: (item, description, quantity, rate).
+    
+    Lines use the QB item for their part number from item_refs if there is
+    one, otherwise the EXISTING qb_item, and put the part details in the
+    description; quantities over MAX_QTY_PER_LINE become several lines.
+    """
+    item_refs = item_refs or {}
+    
+    # Checked once: per-line logging is skipped entirely unless DEBUG is on
+    log_lines = logger.isEnabledFor(logging.DEBUG)
+    
+    for idx, item in enumerate(line_items, 1):
+        part_number = str(item.get('part_number', '') or '')
+        description = str(item.get('description', '') or '')
         
-        # Release the COM object reference explicitly
+        # Put full part number + description in the Desc field (limit to 4095 chars - QB max)
+        full_desc = f"{part_number} | {description}"
+        if len(full_desc) > 4095:
+            full_desc = full_desc[:4092] + "..."
+        
+        # Ensure quantity is a valid integer
         try:
-            qb.qbXMLRP = None
-            print("✓ COM object released")
-        except:
-            pass
+            quantity = int(item.get('quantity', 1) or 1)
+            if quantity < 1:
+                quantity = 1
+        except (ValueError, TypeError):
+            quantity = 1
         
+        # Ensure rate is a valid float
         try:
-            pythoncom.CoUninitialize()
-            print("✓ COM uninitialized")
-        except Exception as e:
-            print(f"⚠ COM uninit error (may be ok): {e}")
+            rate = float(item.get('unit_cost', 0) or 0)
+        except (ValueError, TypeError):
+            rate = 0.00
+        
+        if log_lines:
+            logger.debug("Line %d: qty=%d, rate=%.2f, desc=%s...%s", idx, quantity, rate, full_desc[:50],
+                         f" [SPLIT into {-(-quantity // MAX_QTY_PER_LINE)} lines]" if quantity > MAX_QTY_PER_LINE else "")
         
-        print("=" * 60)
-        print("CREATE_QB_INVOICE FINISHED")
-        print("=" * 60 + "\n")
+        line_item_ref = item_refs.get(part_number, qb_item)
+        
+        # Split quantities over 250 into multiple lines
+        remaining_qty = quantity
+        split_num = 0
+        while remaining_qty > 0:
+            line_qty = min(remaining_qty, MAX_QTY_PER_LINE)
+            remaining_qty -= line_qty
+            split_num += 1
+            
+            # Add split indicator to description if this item was split
+            line_desc = full_desc
+            if quantity > MAX_QTY_PER_LINE:
+                line_desc = f"{full_desc} (part {split_num})"
+            
+            yield line_item_ref, line_desc, line_qty, rate
@@ -0,0 +1,209 @@
+"""
+Background upload jobs.
+
+/upload saves the file, enqueues the parse + invoice work here and returns
+a job ID immediately; a bounded worker pool processes jobs and clients poll
+/jobs/<id> for state, per-stage timings and the invoice result, or follow
+/jobs/<id>/events for live progress events.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+# Add parent directory to path for quickbooks_desktop imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quickbooks_desktop import progress
+
+
+# Progress events kept per job (older ones are dropped)
+MAX_JOB_EVENTS = 1000
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when max_pending jobs are already waiting."""
+
+
+class Job:
+    """
+    One upload being processed.
+    
+    state moves queued -> running -> done (result set) or failed (error set).
+    Stages are timed with job.stage(name) by the job function. Progress
+    events emitted while the job runs (see quickbooks_desktop.progress)
+    are numbered and buffered for wait_for_events().
+    """
+    
+    def __init__(self, filename=None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.state = 'queued'
+        self.stages = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._events = deque(maxlen=MAX_JOB_EVENTS)
+        self._event_id = 0
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+    
+    @contextmanager
+    def stage(self, name):
+        """Time a stage of the job (recorded even if it raises) and emit start/end events."""
+        start = time.perf_counter()
+        try:
+            with progress.stage(name):
+                yield
+        finally:
+            self.record_stage(name, (time.perf_counter() - start) * 1000)
+    
+    def record_stage(self, name, duration_ms):
+        """Record a stage timed elsewhere (e.g. in the request thread)."""
+        with self._lock:
+            self.stages.append({'name': name, 'duration_ms': round(duration_ms, 1)})
+    
+    def add_event(self, event):
+        """Buffer a progress event (the job's progress listener)."""
+        with self._changed:
+            self._event_id += 1
+            event['id'] = self._event_id
+            event['elapsed_ms'] = round((event.get('time', time.time()) - self.created_at) * 1000, 1)
+            self._events.append(event)
+            self._changed.notify_all()
+    
+    def wait_for_events(self, after_id=0, timeout=None):
+        """
+        Wait for progress events newer than after_id.
+        
+        Returns:
+            (events, finished) - finished is True once the job is over and
+            every event up to now has been returned
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self._event_id > after_id or self._done.is_set(), timeout
+            )
+            events = [e for e in self._events if e['id'] > after_id]
+            return events, self._done.is_set() and not events
+    
+    @property
+    def finished(self):
+        return self._done.is_set()
+    
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns True if it did."""
+        return self._done.wait(timeout)
+    
+    def _run(self, fn, args, kwargs):
+        with self._lock:
+            self.state = 'running'
+            self.started_at = time.time()
+        self.add_event({'stage': 'job', 'status': 'start'})
+        try:
+            with progress.listening(self.add_event):
+                result = fn(self, *args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self.state = 'failed'
+                self.error = str(e)
+        else:
+            with self._lock:
+                self.state = 'done'
+                self.result = result
+        finally:
+            with self._lock:
+                self.finished_at = time.time()
+            self.add_event({'stage': 'job', 'status': 'end', 'state': self.state})
+            with self._changed:
+                self._done.set()
+                self._changed.notify_all()
+    
+    def to_dict(self):
+        """JSON-ready status snapshot."""
+        def iso(ts):
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+        
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                'id': self.id,
+                'state': self.state,
+                'filename': self.filename,
+                'created_at': iso(self.created_at),
+                'started_at': iso(self.started_at),
+                'finished_at': iso(self.finished_at),
+                'queued_ms': round(((self.started_at or end) - self.created_at) * 1000, 1),
+                'total_ms': round((end - self.created_at) * 1000, 1),
+                'stages': list(self.stages),
+                'result': self.result,
+                'error': self.error
+            }
+
+
+class JobManager:
+    """
+    Runs jobs on a fixed-size thread pool and keeps their status for polling.
+    
+    Finished jobs are kept for retention_seconds (and at most max_retained
+    of them) so clients can fetch the result.
+    """
+    
+    def __init__(self, max_workers=2, max_pending=50, retention_seconds=3600, max_retained=500):
+        """
+        Args:
+            max_workers: Jobs processed in parallel
+            max_pending: Queued + running jobs allowed before submit() refuses
+            retention_seconds: How long finished jobs stay available
+            max_retained: Cap on finished jobs kept (oldest dropped first)
+        """
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, fn, *args, filename=None, **kwargs) -> Job:
+        """
+        Queue fn(job, *args, **kwargs) and return its Job right away.
+        
+        Raises:
+            JobQueueFull: If max_pending jobs are already queued or running
+        """
+        job = Job(filename)
+        with self._lock:
+            self._prune()
+            pending = sum(1 for j in self._jobs.values() if not j.finished)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs already pending - try again shortly")
+            self._jobs[job.id] = job
+        self._pool.submit(job._run, fn, args, kwargs)
+        return job
+    
+    def get(self, job_id):
+        """Return the Job with this ID, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def _prune(self):
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.finished]
+        expired = {j.id for j in finished if now - j.finished_at > self.retention_seconds}
+        excess = len(finished) - len(expired) - self.max_retained
+        if excess > 0:
+            remaining = sorted((j for j in finished if j.id not in expired), key=lambda j: j.finished_at)
+            expired.update(j.id for j in remaining[:excess])
+        for job_id in expired:
+            del self._jobs[job_id]
+    
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,350 @@
+"""
+Local ledger of invoiced receiving reports and their IMEIs.
+
+Every invoice created in QuickBooks is recorded here: RR number, order
+number, TxnID, a hash of the uploaded file and every IMEI. Uploads are
+checked against it before any QuickBooks round trip, so the same file, RR
+number or devices cannot be invoiced twice by accident. Checking QuickBooks
+itself would mean pulling every invoice through query_invoices.
+
+Uploads reserve() the report: the check and a 'pending' row are written in
+one transaction, so two concurrent uploads of the same report cannot both
+pass. The row becomes 'invoiced' with complete() or is dropped with
+release() if the invoice fails. A pending row left by a crash keeps
+blocking the report (its invoice may exist); allow_duplicate gets past it.
+
+Storage is one SQLite file (stdlib sqlite3, WAL mode). Every lookup goes
+through an index (a B-tree), so a check costs O(log n) per key however many
+reports have been recorded. IMEIs are bulk-inserted with executemany in a
+single transaction (100k IMEIs take a fraction of a second).
+
+Environment:
+    QB_LEDGER           false disables the ledger (default true)
+    QB_LEDGER_PATH      Database file (default QB/invoice_ledger.sqlite3)
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from itertools import islice
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'invoice_ledger.sqlite3')
+
+# IMEIs per "IN (...)" lookup (below SQLite's default host parameter limit)
+LOOKUP_CHUNK = 500
+# Duplicate IMEIs listed in a check result (all of them are counted)
+MAX_REPORTED_IMEIS = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    rr_number TEXT,
+    order_number TEXT,
+    file_sha256 TEXT,
+    txn_id TEXT,
+    ref_number TEXT,
+    imei_count INTEGER NOT NULL,
+    total_amount REAL,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'invoiced'  -- 'pending' while the invoice is being created
+);
+CREATE INDEX IF NOT EXISTS reports_rr_number ON reports (rr_number);
+CREATE INDEX IF NOT EXISTS reports_order_number ON reports (order_number);
+CREATE INDEX IF NOT EXISTS reports_txn_id ON reports (txn_id);
+CREATE INDEX IF NOT EXISTS reports_file_sha256 ON reports (file_sha256);
+
+-- Clustered on imei: a lookup is one B-tree search, no separate index
+CREATE TABLE IF NOT EXISTS report_imeis (
+    imei TEXT NOT NULL,
+    report_id INTEGER NOT NULL,
+    PRIMARY KEY (imei, report_id)
+) WITHOUT ROWID;
+"""
+
+_REPORT_COLUMNS = ('id', 'rr_number', 'order_number', 'file_sha256', 'txn_id', 'ref_number',
+                   'imei_count', 'total_amount', 'created_at', 'status')
+
+# Report fields that can be looked up (all indexed)
+LOOKUP_FIELDS = ('rr_number', 'order_number', 'txn_id', 'file_sha256')
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Header values the parser uses for a missing column or a blank cell
+_PLACEHOLDERS = {'', 'n/a', 'nan', 'none'}
+
+
+def _header_key(value):
+    """A header field (RR / order number) as a lookup key, or None if it is a placeholder."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value.lower() in _PLACEHOLDERS else value
+
+
+def _iter_imeis(parsed_data):
+    for item in parsed_data['line_items']:
+        yield from item['imeis']
+
+
+class InvoiceLedger:
+    """
+    SQLite-backed record of invoiced reports.
+    
+    One connection shared by all threads, serialized with a lock (sqlite3
+    releases the GIL while it works, and every operation is short).
+    """
+    
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Args:
+            path: Database file (created if missing), or ':memory:'
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            # Safe with WAL: a crash can lose the last commit, never corrupt the file
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(reports)")}
+            if 'status' not in columns:  # Ledger created before reservations existed
+                self._conn.execute("ALTER TABLE reports ADD COLUMN status TEXT NOT NULL DEFAULT 'invoiced'")
+    
+    # -------------------------------------------------------------------------
+    # Recording
+    # -------------------------------------------------------------------------
+    
+    def _insert(self, parsed_data, status, txn_id=None, ref_number=None, file_sha256=None):
+        """Insert a report and its IMEIs (call inside a transaction, holding the lock)."""
+        header = parsed_data['header']
+        summary = parsed_data.get('summary', {})
+        cursor = self._conn.execute(
+            "INSERT INTO reports (rr_number, order_number, file_sha256, txn_id, ref_number, "
+            "imei_count, total_amount, created_at, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (_header_key(header.get('rr_number')), _header_key(header.get('order_number')), file_sha256,
+             txn_id, ref_number, summary.get('total_imeis', 0), summary.get('total_amount'),
+             datetime.now().isoformat(timespec='seconds'), status)
+        )
+        report_id = cursor.lastrowid
+        # Key order makes every insert land next to the previous one in the
+        # B-tree; a serial repeated within the report is stored once
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO report_imeis (imei, report_id) VALUES (?, ?)",
+            ((imei, report_id) for imei in sorted(set(_iter_imeis(parsed_data))))
+        )
+        return report_id
+    
+    def record(self, parsed_data, txn_id=None, ref_number=None, file_sha256=None):
+        """
+        Record an invoiced report and all of its IMEIs in one transaction.
+        
+        Args:
+            parsed_data: Output from excel_parser.parse_receiving_report()
+            txn_id: QuickBooks TxnID of the invoice
+            ref_number: QuickBooks invoice number
+            file_sha256: SHA-256 of the uploaded file
+        
+        Returns:
+            The new report's id
+        """
+        with self._lock, self._conn:
+            return self._insert(parsed_data, 'invoiced', txn_id, ref_number, file_sha256)
+    
+    def reserve(self, parsed_data, file_sha256=None, allow_duplicate=False):
+        """
+        check() and, unless it finds a duplicate, record the report as pending
+        - atomically, so two uploads of the same report cannot both pass.
+        
+        The pending report is matched by later checks like an invoiced one.
+        Finish it with complete() once the invoice exists, or release() it
+        if invoicing fails.
+        
+        Args:
+            parsed_data: Output from excel_parser.parse_receiving_report()
+            file_sha256: SHA-256 of the uploaded file
+            allow_duplicate: Reserve even if check() finds a duplicate
+        
+        Returns:
+            tuple of (check() result, pending report id or None if the
+            report is a duplicate and allow_duplicate is off)
+        """
+        with self._lock, self._conn:
+            # Take the write lock before reading, so the check and the insert
+            # are one unit for other connections to the file too
+            self._conn.execute('BEGIN IMMEDIATE')
+            result = self._check(parsed_data, file_sha256)
+            if result['duplicate'] and not allow_duplicate:
+                return result, None
+            return result, self._insert(parsed_data, 'pending', file_sha256=file_sha256)
+    
+    def complete(self, report_id, txn_id=None, ref_number=None):
+        """Mark a reserved report as invoiced."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE reports SET status = 'invoiced', txn_id = ?, ref_number = ? WHERE id = ?",
+                (txn_id, ref_number, report_id)
+            )
+    
+    def release(self, report_id):
+        """Drop a reserved report (its invoice was not created)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM report_imeis WHERE report_id = ?", (report_id,))
+            self._conn.execute("DELETE FROM reports WHERE id = ? AND status = 'pending'", (report_id,))
+    
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+    
+    def _reports(self, where, params):
+        rows = self._conn.execute(
+            f"SELECT {', '.join(_REPORT_COLUMNS)} FROM reports WHERE {where} ORDER BY id", params
+        ).fetchall()
+        return [dict(zip(_REPORT_COLUMNS, row)) for row in rows]
+    
+    def find(self, field, value):
+        """
+        Reports whose field equals value.
+        
+        Placeholder RR / order numbers ('N/A', 'nan', blank) match nothing.
+        
+        Args:
+            field: One of LOOKUP_FIELDS
+            value: Value to match
+        
+        Returns:
+            list of report dicts, oldest first
+        """
+        if field not in LOOKUP_FIELDS:
+            raise ValueError(f"field must be one of {LOOKUP_FIELDS}, got {field!r}")
+        if field in ('rr_number', 'order_number'):
+            value = _header_key(value)
+        if value is None:
+            return []  # Placeholders are stored as NULL and never match
+        with self._lock:
+            return self._reports(f"{field} = ?", (value,))
+    
+    def find_imeis(self, imeis):
+        """
+        Map the IMEIs that were already invoiced to their report ids.
+        
+        Returns:
+            dict of imei -> list of report ids
+        """
+        with self._lock:
+            return self._find_imeis(imeis)
+    
+    def _find_imeis(self, imeis):
+        found = {}
+        for chunk in _chunks(imeis, LOOKUP_CHUNK):
+            rows = self._conn.execute(
+                f"SELECT imei, report_id FROM report_imeis WHERE imei IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            for imei, report_id in rows:
+                found.setdefault(imei, []).append(report_id)
+        return found
+    
+    def check(self, parsed_data, file_sha256=None):
+        """
+        Look for an earlier invoice of the same file, RR number or IMEIs.
+        
+        Args:
+            parsed_data: Output from excel_parser.parse_receiving_report()
+            file_sha256: SHA-256 of the uploaded file
+        
+        Returns:
+            dict with duplicate (bool), message, reports (earlier report
+            dicts, each with the list of fields it matched on), imei_count
+            (IMEIs invoiced before) and imeis (up to MAX_REPORTED_IMEIS)
+        """
+        with self._lock:
+            return self._check(parsed_data, file_sha256)
+    
+    def _check(self, parsed_data, file_sha256):
+        rr_number = _header_key(parsed_data['header'].get('rr_number'))
+        matched = {}
+        
+        def match(reports, reason):
+            for report in reports:
+                matched.setdefault(report['id'], dict(report, matched_on=[]))['matched_on'].append(reason)
+        
+        if file_sha256:
+            match(self._reports("file_sha256 = ?", (file_sha256,)), 'file')
+        if rr_number:
+            match(self._reports("rr_number = ?", (rr_number,)), 'rr_number')
+        
+        imeis = self._find_imeis(_iter_imeis(parsed_data))
+        imei_reports = {report_id for report_ids in imeis.values() for report_id in report_ids}
+        if imei_reports:
+            reports = self._reports(
+                f"id IN ({', '.join('?' * len(imei_reports))})", sorted(imei_reports)
+            )
+            match(reports, 'imei')
+        
+        reports = sorted(matched.values(), key=lambda r: r['id'])
+        return {
+            'duplicate': bool(reports),
+            'message': _describe(reports, len(imeis)),
+            'reports': reports,
+            'imei_count': len(imeis),
+            'imeis': sorted(imeis)[:MAX_REPORTED_IMEIS],
+        }
+    
+    def stats(self):
+        """Number of recorded reports and IMEIs."""
+        with self._lock:
+            reports = self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+            imeis = self._conn.execute("SELECT COUNT(*) FROM report_imeis").fetchone()[0]
+        return {'reports': reports, 'imeis': imeis}
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _describe(reports, imei_count):
+    """One-line summary of check() matches ('' if there are none)."""
+    if not reports:
+        return ''
+    parts = []
+    for report in reports[:3]:
+        if report['status'] == 'pending':
+            invoice = "being invoiced now"
+        elif report['ref_number']:
+            invoice = f"invoice {report['ref_number']}"
+        else:
+            invoice = f"report {report['id']}"
+        parts.append(f"RR# {report['rr_number']} ({invoice}, {report['created_at']}, "
+                     f"matched on {', '.join(report['matched_on'])})")
+    more = f" and {len(reports) - 3} more" if len(reports) > 3 else ''
+    imeis = f"; {imei_count} IMEI(s) were invoiced before" if imei_count else ''
+    return f"Already invoiced: {'; '.join(parts)}{more}{imeis}"
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """
+    Return the process-wide InvoiceLedger (opened on first use), or None
+    if QB_LEDGER=false.
+    """
+    global _ledger
+    if os.getenv('QB_LEDGER', 'true').lower() != 'true':
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = InvoiceLedger(os.getenv('QB_LEDGER_PATH') or DEFAULT_PATH)
+        return _ledger
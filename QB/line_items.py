@@ -0,0 +1,189 @@
+"""
+Compact line item representation for parsed receiving reports.
+
+A 100k-IMEI report held as lists of str costs ~70 bytes per serial. Here
+IMEIs are packed into a 64-bit integer array (or one contiguous buffer for
+non-numeric serials) and only decoded back to str when accessed.
+LineItem supports the same item['key'] / item.get('key') access as the
+plain dicts, so invoice generators work with either form.
+"""
+from array import array
+from itertools import accumulate
+
+
+# Digit strings up to this length always fit in a signed 64-bit integer
+MAX_PACKED_DIGITS = 18
+
+
+class ImeiArray:
+    """
+    Read-only sequence of IMEI / serial number strings.
+    
+    Storage is one of:
+    - numbers + width: every serial is an ASCII digit string of the same
+      length, stored as int64 and zero-padded back on access (8 bytes each)
+    - buffer + offsets: UTF-8 bytes of all serials back to back, with
+      array offsets marking where each one starts
+    
+    Indexing returns a str, slicing returns a list of str; only the
+    requested entries are decoded.
+    """
+    
+    __slots__ = ('_numbers', '_width', '_buffer', '_offsets')
+    
+    def __init__(self, numbers=None, width=0, buffer=b'', offsets=None):
+        self._numbers = numbers
+        self._width = width
+        self._buffer = buffer
+        self._offsets = offsets if offsets is not None else array('I', [0])
+    
+    @classmethod
+    def from_strings(cls, values):
+        """Pack a sequence of serial strings."""
+        values = list(values)
+        if values:
+            width = len(values[0])
+            if width <= MAX_PACKED_DIGITS and all(len(v) == width for v in values):
+                joined = ''.join(values)
+                if joined.isascii() and joined.isdigit():
+                    return cls(numbers=array('q', map(int, values)), width=width)
+        
+        encoded = [v.encode('utf-8') for v in values]
+        offsets = array('I', accumulate(map(len, encoded), initial=0))
+        return cls(buffer=b''.join(encoded), offsets=offsets)
+    
+    @classmethod
+    def from_numbers(cls, numbers, width):
+        """
+        Wrap serials that are already integers (zero-padded to width digits on access).
+        
+        Args:
+            numbers: array('q'), a contiguous int64 buffer with tobytes()
+                (e.g. a numpy slice), or an iterable of ints
+            width: Digits per serial
+        """
+        if isinstance(numbers, array):
+            return cls(numbers=numbers, width=width)
+        packed = array('q')
+        if hasattr(numbers, 'tobytes'):
+            packed.frombytes(numbers.tobytes())
+        else:
+            packed.extend(numbers)
+        return cls(numbers=packed, width=width)
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the packed storage."""
+        if self._numbers is not None:
+            return self._numbers.itemsize * len(self._numbers)
+        return len(self._buffer) + self._offsets.itemsize * len(self._offsets)
+    
+    def _decode(self, i):
+        if self._numbers is not None:
+            return str(self._numbers[i]).zfill(self._width)
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+    
+    def __len__(self):
+        if self._numbers is not None:
+            return len(self._numbers)
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(*index.indices(n))]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('ImeiArray index out of range')
+        return self._decode(index)
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._decode(i)
+    
+    def tolist(self) -> list:
+        """Decode every serial into a list of str."""
+        return self[:]
+    
+    def __eq__(self, other):
+        if isinstance(other, (ImeiArray, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    def __repr__(self):
+        preview = ', '.join(repr(s) for s in self[:3])
+        more = ', ...' if len(self) > 3 else ''
+        return f"ImeiArray([{preview}{more}], len={len(self)})"
+
+
+class LineItem:
+    """
+    One invoice line item (a PART NUMBER + DESCRIPTION group).
+    
+    Fields match the dicts produced by parse_receiving_report(); quantity is
+    always len(imeis).
+    """
+    
+    __slots__ = ('part_number', 'description', 'model', 'make', 'imeis', 'unit_cost', 'amount')
+    
+    FIELDS = ('part_number', 'description', 'model', 'make', 'imeis', 'quantity', 'unit_cost', 'amount')
+    
+    def __init__(self, part_number, description, model, make, imeis, unit_cost, amount=None):
+        self.part_number = part_number
+        self.description = description
+        self.model = model
+        self.make = make
+        self.imeis = imeis if isinstance(imeis, ImeiArray) else ImeiArray.from_strings(imeis)
+        self.unit_cost = unit_cost
+        self.amount = len(self.imeis) * unit_cost if amount is None else amount
+    
+    @classmethod
+    def from_dict(cls, item: dict):
+        """Build a LineItem from a parse_receiving_report() line item dict."""
+        return cls(
+            item['part_number'], item['description'], item['model'], item['make'],
+            item['imeis'], item['unit_cost'], item['amount'],
+        )
+    
+    @property
+    def quantity(self) -> int:
+        return len(self.imeis)
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by this item, including packed IMEIs."""
+        return 200 + self.imeis.nbytes
+    
+    # Mapping-style access, so code written against the dict form keeps working
+    
+    def keys(self):
+        return self.FIELDS
+    
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key)
+    
+    def __contains__(self, key):
+        return key in self.FIELDS
+    
+    def to_dict(self) -> dict:
+        """Plain dict form (IMEIs decoded to a list), e.g. for JSON."""
+        item = {key: getattr(self, key) for key in self.FIELDS}
+        item['imeis'] = self.imeis.tolist()
+        return item
+    
+    def __eq__(self, other):
+        if isinstance(other, (LineItem, dict)):
+            return all(self[key] == other[key] for key in self.FIELDS)
+        return NotImplemented
+    
+    def __repr__(self):
+        return (f"LineItem({self.part_number!r}, {self.description!r}, "
+                f"quantity={self.quantity}, unit_cost={self.unit_cost!r})")
@@ -0,0 +1,272 @@
+"""
+Content-addressed cache of parsed receiving reports.
+
+Re-uploading the same workbook (e.g. after a failed QuickBooks submission)
+returns the cached parse instead of reading the Excel file again.
+Entries are keyed by a SHA-256 of the uploaded bytes plus the parser's
+column-mapping version, so changing the mapping never serves stale results.
+
+Two tiers:
+- Memory: LRU, bounded by the approximate size of the parsed data
+- Disk (optional): zlib-compressed JSON files, bounded by total size,
+  oldest-used evicted first
+"""
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from line_items import LineItem
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DISK_SUFFIX = '.json.z'
+
+
+def content_key(source, version: str) -> str:
+    """
+    Build a cache key from file contents and a parser version.
+    
+    Args:
+        source: Path to the file, or a binary file-like object (its position
+            is restored after hashing)
+        version: Parser/column-mapping version string
+    
+    Returns:
+        Hex digest identifying this content + version
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        start = source.tell()
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        source.seek(start)
+    return f"{digest.hexdigest()}-{version}"
+
+
+def serialize(parsed_data: dict) -> bytes:
+    """
+    Compact serialized form of parse_receiving_report() output.
+    
+    Each line item's IMEI list is stored as one newline-joined string, and
+    the whole document is compact JSON compressed with zlib. Compact
+    (LineItem) results are flagged so deserialize() restores the same form.
+    """
+    doc = dict(parsed_data)
+    doc['compact'] = any(isinstance(item, LineItem) for item in parsed_data['line_items'])
+    doc['line_items'] = [
+        {**item, 'imeis': '\n'.join(item['imeis'])}
+        for item in parsed_data['line_items']
+    ]
+    raw = json.dumps(doc, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(raw)
+
+
+def deserialize(blob: bytes) -> dict:
+    """Inverse of serialize()."""
+    doc = json.loads(zlib.decompress(blob))
+    compact = doc.pop('compact', False)
+    for item in doc['line_items']:
+        item['imeis'] = item['imeis'].split('\n') if item['imeis'] else []
+    if compact:
+        doc['line_items'] = [LineItem.from_dict(item) for item in doc['line_items']]
+    return doc
+
+
+def _approx_size(parsed_data: dict) -> int:
+    """Rough in-memory footprint of a parse result, used for LRU accounting."""
+    size = 1024
+    for item in parsed_data['line_items']:
+        if isinstance(item, LineItem):
+            size += item.nbytes
+        else:
+            # ~64 bytes per IMEI str + list slot, plus the item dict itself
+            size += 600 + 64 * len(item['imeis'])
+    return size
+
+
+class ParseCache:
+    """
+    Two-tier (memory LRU + optional disk) cache of parse results.
+    
+    Usage:
+        cache = ParseCache(max_memory_bytes=64 * 1024 * 1024, cache_dir='cache')
+        key = content_key(filepath, COLUMN_MAPPING_VERSION)
+        parsed = cache.get(key)
+        if parsed is None:
+            parsed = parse_receiving_report(filepath)
+            cache.put(key, parsed)
+    
+    Cached results are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, cache_dir=None,
+                 max_disk_bytes=512 * 1024 * 1024):
+        """
+        Args:
+            max_memory_bytes: Memory tier budget (0 disables the memory tier)
+            cache_dir: Directory for the disk tier (None disables it)
+            max_disk_bytes: Disk tier budget
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # key -> (parsed_data, size)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    def get(self, key):
+        """Return the cached parse result for key, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        
+        parsed_data = self._disk_get(key)
+        with self._lock:
+            if parsed_data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory_put(key, parsed_data)
+        return parsed_data
+    
+    def put(self, key, parsed_data: dict):
+        """Store a parse result in every enabled tier."""
+        with self._lock:
+            self._memory_put(key, parsed_data)
+        self._disk_put(key, parsed_data)
+    
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def stats(self) -> dict:
+        """Hit/miss counters and tier usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': sum(size for _, size, _ in self._disk_entries()),
+            }
+    
+    # -------------------------------------------------------------------------
+    # Memory tier (caller holds the lock)
+    # -------------------------------------------------------------------------
+    
+    def _memory_put(self, key, parsed_data):
+        size = _approx_size(parsed_data)
+        if size > self.max_memory_bytes:
+            return
+        
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[1]
+        
+        self._memory[key] = (parsed_data, size)
+        self._memory_bytes += size
+        
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+    
+    # -------------------------------------------------------------------------
+    # Disk tier
+    # -------------------------------------------------------------------------
+    
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + DISK_SUFFIX)
+    
+    def _disk_get(self, key):
+        if not self.cache_dir:
+            return None
+        
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+            os.utime(path)  # mark as recently used
+            return deserialize(blob)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error):
+            # Corrupt or unreadable entry - drop it and re-parse
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+    
+    def _disk_put(self, key, parsed_data):
+        if not self.cache_dir:
+            return
+        
+        blob = serialize(parsed_data)
+        if len(blob) > self.max_disk_bytes:
+            return
+        
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        
+        self._disk_evict()
+    
+    def _disk_entries(self):
+        """List (path, size, mtime) for every disk entry."""
+        if not self.cache_dir:
+            return []
+        
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(DISK_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+    
+    def _disk_evict(self):
+        entries = sorted(self._disk_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -2,6 +2,7 @@
 Step 4: Create a Test Invoice in QuickBooks
 Automatically finds a real customer and item from QB, then creates an invoice.
 """
+from quickbooks_desktop import qbxml_templates as templates
 from quickbooks_desktop.session_manager import SessionManager
 from datetime import date
 import re
@@ -9,13 +10,7 @@ import re
 
 def query_first_customer(qb):
     """Get the first customer name from QuickBooks."""
-    xml = """<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <CustomerQueryRq><MaxReturned>1</MaxReturned></CustomerQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
+    xml = templates.customer_query(max_returned=1)
     response = qb.qbXMLRP.ProcessRequest(qb.ticket, xml)
     match = re.search(r'<FullName>([^<]+)</FullName>', response)
     return match.group(1) if match else None
@@ -23,13 +18,7 @@ def query_first_customer(qb):
 
 def query_first_item(qb):
     """Get the first service/inventory item from QuickBooks."""
-    xml = """<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <ItemQueryRq><MaxReturned>5</MaxReturned></ItemQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
+    xml = templates.item_query(max_returned=5)
     response = qb.qbXMLRP.ProcessRequest(qb.ticket, xml)
     # Find item names (skip subtotals, discounts, etc.)
     matches = re.findall(r'<FullName>([^<]+)</FullName>', response)
@@ -62,29 +51,10 @@ if __name__ == '__main__':
         print(f"  Item: {item_name}")
         
         # Build invoice
-        invoice_xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <InvoiceAddRq>
-      <InvoiceAdd>
-        <CustomerRef>
-          <FullName>{customer_name}</FullName>
-        </CustomerRef>
-        <TxnDate>{date.today().isoformat()}</TxnDate>
-        <Memo>AUTOMATION-TEST</Memo>
-        <InvoiceLineAdd>
-          <ItemRef>
-            <FullName>{item_name}</FullName>
-          </ItemRef>
-          <Desc>Test from automation</Desc>
-          <Quantity>1</Quantity>
-          <Rate>10.00</Rate>
-        </InvoiceLineAdd>
-      </InvoiceAdd>
-    </InvoiceAddRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
+        invoice_xml = templates.invoice_add(
+            customer_name, date.today().isoformat(), 'AUTOMATION-TEST',
+            [(item_name, 'Test from automation', 1, 10.0)]
+        )
         
         print("\n" + "="*50)
         confirm = input(f"Create invoice for {customer_name} with {item_name}? (yes/no): ").strip().lower()
@@ -0,0 +1,159 @@
+"""
+Receiving report parser checks (no QuickBooks needed).
+Needs pandas and openpyxl; run directly or with pytest.
+"""
+import io
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from excel_parser import group_line_items, parse_receiving_report
+
+# Every way parse_receiving_report can read a report
+MODES = {
+    'pandas': {},
+    'pandas-compact': {'compact': True},
+    'streaming': {'streaming': True},
+    'streaming-compact': {'streaming': True, 'compact': True},
+}
+
+
+def needs_readers():
+    pytest.importorskip('pandas')
+    pytest.importorskip('openpyxl')
+
+
+def header_only_report():
+    """An .xlsx with the report's header row and no data rows."""
+    needs_readers()
+    from synthetic_rr import write_report
+    
+    return write_report(io.BytesIO(), rows=0).getvalue()
+
+
+def report_from_rows(rows):
+    """
+    An .xlsx from hand-written rows.
+    
+    Args:
+        rows: dicts of REPORT_COLUMNS key -> value (header fields, make and
+            model are filled in; other missing keys are blank)
+    """
+    needs_readers()
+    from synthetic_rr import REPORT_COLUMNS, column_names, write_rows
+    
+    defaults = {'MAKE': 'APPLE', 'MODEL': 'IPHONE 12', 'ORDER NUMBER': 'INV: 50001',
+                'DATE': '2025-12-30', 'RECEIVING REPORT NUMBER': 2001}
+    names = column_names()
+    sheet = [[names[key] for key in REPORT_COLUMNS]]
+    sheet += [[dict(defaults, **row).get(key) for key in REPORT_COLUMNS] for row in rows]
+    return write_rows(io.BytesIO(), sheet).getvalue()
+
+
+def parse_all_modes(content):
+    """Parse content in every mode; compact line items are converted to dicts."""
+    results = {}
+    for mode, kwargs in MODES.items():
+        result = parse_receiving_report(io.BytesIO(content), **kwargs)
+        result['line_items'] = [
+            item.to_dict() if hasattr(item, 'to_dict') else item for item in result['line_items']
+        ]
+        results[mode] = result
+    return results
+
+
+def assert_modes_agree(results):
+    expected = results['pandas']
+    for mode, result in results.items():
+        assert result == expected, f"{mode} differs from pandas"
+    return expected
+
+
+def test_empty_sheet_same_in_both_modes():
+    content = header_only_report()
+    
+    in_pandas = parse_receiving_report(io.BytesIO(content))
+    streamed = parse_receiving_report(io.BytesIO(content), streaming=True)
+    
+    assert in_pandas == streamed
+    assert in_pandas['line_items'] == []
+    assert type(in_pandas['summary']['total_amount']) is float
+    assert type(streamed['summary']['total_amount']) is float
+
+
+def test_numeric_imeis_with_blanks_stay_exact():
+    rows = [
+        {'PART NUMBER': 'P-1', 'DESCRIPTION': '64GB', 'IMEI': 353220000000000, 'UC': 10},
+        {'PART NUMBER': 'P-1', 'DESCRIPTION': '64GB', 'IMEI': None, 'UC': 10},
+        {'PART NUMBER': 'P-1', 'DESCRIPTION': '64GB', 'IMEI': 353220000000001.0, 'UC': 10},
+        {'PART NUMBER': 'P-1', 'DESCRIPTION': '64GB', 'IMEI': 353220000000002, 'UC': 10},
+    ]
+    result = assert_modes_agree(parse_all_modes(report_from_rows(rows)))
+    
+    imeis = result['line_items'][0]['imeis']
+    assert imeis == ['353220000000000', '353220000000001', '353220000000002']
+    assert result['summary']['total_imeis'] == 3
+
+
+def test_float_imei_column_stays_exact():
+    # A numeric column with a blank is float64 - what default inference gives
+    pd = pytest.importorskip('pandas')
+    df = pd.DataFrame({
+        'PART NUMBER': ['P-1', 'P-1', 'P-1'],
+        'DESCRIPTION': ['64GB', '64GB', '64GB'],
+        'IMEI': [353220000000000, None, 353220000000001],
+        'UC': [10, 10, 10],
+    })
+    assert df['IMEI'].dtype == 'float64'
+    
+    for compact in (False, True):
+        items, total_imeis, _ = group_line_items(df, 'PART NUMBER', 'DESCRIPTION', 'IMEI', 'UC',
+                                                 compact=compact)
+        assert list(items[0]['imeis']) == ['353220000000000', '353220000000001']
+        assert total_imeis == 2
+
+
+def test_money_totals_are_exact():
+    # 3 * 0.1 is 0.30000000000000004 in float arithmetic
+    rows = [
+        {'PART NUMBER': 'P-1', 'DESCRIPTION': 'CASE', 'IMEI': f"35322000000000{i}", 'UC': 0.1}
+        for i in range(3)
+    ] + [
+        {'PART NUMBER': 'P-2', 'DESCRIPTION': 'CABLE', 'IMEI': f"35322000000010{i}", 'UC': 0.07}
+        for i in range(7)
+    ]
+    result = assert_modes_agree(parse_all_modes(report_from_rows(rows)))
+    
+    amounts = {item['part_number']: item['amount'] for item in result['line_items']}
+    assert amounts == {'P-1': 0.3, 'P-2': 0.49}
+    assert result['summary']['total_amount'] == 0.79
+
+
+def test_synthetic_report_same_in_every_mode():
+    needs_readers()
+    from synthetic_rr import write_report
+    
+    content = write_report(io.BytesIO(), rows=2000, parts=40, seed=3).getvalue()
+    result = assert_modes_agree(parse_all_modes(content))
+    
+    assert result['summary']['total_imeis'] > 0
+    for item in result['line_items']:
+        assert all(re.fullmatch(r'[0-9]{15}', imei) for imei in item['imeis']), item['part_number']
+        assert round(item['amount'], 2) == item['amount']
+
+
+if __name__ == '__main__':
+    test_empty_sheet_same_in_both_modes()
+    print("✓ An empty sheet parses the same with pandas and streaming")
+    test_numeric_imeis_with_blanks_stay_exact()
+    print("✓ Numeric IMEIs with blanks stay 15-digit strings")
+    test_float_imei_column_stays_exact()
+    print("✓ A float64 IMEI column gives 15-digit strings")
+    test_money_totals_are_exact()
+    print("✓ Money totals are exact")
+    test_synthetic_report_same_in_every_mode()
+    print("✓ A synthetic report parses the same in every mode")
@@ -0,0 +1,76 @@
+"""
+Invoice ledger checks (no QuickBooks needed).
+Runs against an in-memory ledger; run directly or with pytest.
+"""
+from ledger import InvoiceLedger
+
+
+def make_report(rr_number, imeis, order_number='N/A'):
+    """parsed_data shaped like parse_receiving_report() output."""
+    return {
+        'header': {'rr_number': rr_number, 'order_number': order_number},
+        'line_items': [{'part_number': 'P1', 'imeis': list(imeis)}],
+        'summary': {'total_imeis': len(imeis), 'total_amount': 0.0},
+    }
+
+
+def test_placeholder_rr_numbers_do_not_match():
+    ledger = InvoiceLedger(':memory:')
+    
+    for placeholder in ('N/A', 'nan', '', '   '):
+        ledger.record(make_report(placeholder, [f"{placeholder!r}-1"]), file_sha256=f"sha-{placeholder!r}")
+    
+    for placeholder in ('N/A', 'nan', '', '   '):
+        result = ledger.check(make_report(placeholder, ['other-imei']), file_sha256='other-sha')
+        assert not result['duplicate'], result['message']
+    
+    assert ledger.find('rr_number', 'N/A') == []
+    assert ledger.find('order_number', 'nan') == []
+    assert ledger.stats()['reports'] == 4
+
+
+def test_real_rr_number_matches():
+    ledger = InvoiceLedger(':memory:')
+    ledger.record(make_report('RR-1001', ['111']), file_sha256='sha-a')
+    
+    result = ledger.check(make_report(' RR-1001 ', ['222']), file_sha256='sha-b')
+    assert result['duplicate']
+    assert result['reports'][0]['matched_on'] == ['rr_number']
+
+
+def test_reserve_blocks_concurrent_upload():
+    ledger = InvoiceLedger(':memory:')
+    report = make_report('RR-2002', ['333', '444'])
+    
+    first, report_id = ledger.reserve(report, file_sha256='sha-c')
+    assert not first['duplicate'] and report_id is not None
+    
+    second, second_id = ledger.reserve(report, file_sha256='sha-c')
+    assert second['duplicate'] and second_id is None
+    assert 'being invoiced now' in second['message']
+    
+    ledger.complete(report_id, 'TXN-1', '1001')
+    assert ledger.find('txn_id', 'TXN-1')[0]['status'] == 'invoiced'
+
+
+def test_release_frees_report():
+    ledger = InvoiceLedger(':memory:')
+    report = make_report('RR-3003', ['555'])
+    
+    _, report_id = ledger.reserve(report, file_sha256='sha-d')
+    ledger.release(report_id)
+    
+    result, retry_id = ledger.reserve(report, file_sha256='sha-d')
+    assert not result['duplicate'] and retry_id is not None
+    assert ledger.stats() == {'reports': 1, 'imeis': 1}
+
+
+if __name__ == '__main__':
+    test_placeholder_rr_numbers_do_not_match()
+    print("✓ Reports without RR numbers are not flagged as duplicates")
+    test_real_rr_number_matches()
+    print("✓ A repeated RR number is flagged")
+    test_reserve_blocks_concurrent_upload()
+    print("✓ A report being invoiced blocks a second upload")
+    test_release_frees_report()
+    print("✓ A released reservation can be retried")
@@ -2,13 +2,12 @@
 Step 2: Query Customers from QuickBooks
 This confirms we can READ data, not just connect.
 """
+from quickbooks_desktop import qbxml_templates as templates
 from quickbooks_desktop.session_manager import SessionManager
 
 
-# qbXML request to get first 10 customers (just the request body, not full envelope)
-CUSTOMER_QUERY_XML = """<CustomerQueryRq>
-  <MaxReturned>10</MaxReturned>
-</CustomerQueryRq>"""
+# qbXML request to get first 10 customers
+CUSTOMER_QUERY_XML = templates.customer_query(max_returned=10)
 
 
 if __name__ == '__main__':
@@ -25,14 +24,7 @@ if __name__ == '__main__':
         # Query customers - send raw XML via the processor
         print("\nQuerying customers...")
         
-        # Build the full request envelope
-        full_request = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    {CUSTOMER_QUERY_XML}
-  </QBXMLMsgsRq>
-</QBXML>"""
+        full_request = CUSTOMER_QUERY_XML
         
         # Send directly via the processor
         response = qb.qbXMLRP.ProcessRequest(qb.ticket, full_request)
@@ -2,14 +2,12 @@
 Step 3: Query Invoices from QuickBooks
 This shows the invoice structure before we try creating one.
 """
+from quickbooks_desktop import qbxml_templates as templates
 from quickbooks_desktop.session_manager import SessionManager
 
 
-# qbXML request to get recent invoices (just the request body)
-INVOICE_QUERY_XML = """<InvoiceQueryRq>
-  <MaxReturned>5</MaxReturned>
-  <IncludeLineItems>true</IncludeLineItems>
-</InvoiceQueryRq>"""
+# qbXML request to get recent invoices
+INVOICE_QUERY_XML = templates.invoice_query(max_returned=5, include_line_items=True)
 
 
 if __name__ == '__main__':
@@ -26,14 +24,7 @@ if __name__ == '__main__':
         # Query invoices
         print("\nQuerying invoices...")
         
-        # Build the full request envelope
-        full_request = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    {INVOICE_QUERY_XML}
-  </QBXMLMsgsRq>
-</QBXML>"""
+        full_request = INVOICE_QUERY_XML
         
         # Send directly via the processor
         response = qb.qbXMLRP.ProcessRequest(qb.ticket, full_request)
@@ -0,0 +1,169 @@
+"""
+Multi-request qbXML envelopes.
+
+Builds one QBXMLMsgsRq holding many *Rq elements (each tagged with a
+requestID), splits oversized batches, and maps the *Rs elements of the
+response back to their requests. Used by SessionManager.send_batch().
+"""
+import re
+import xml.etree.ElementTree as ET
+
+from .qbxml_builder import wrap_envelope
+
+# QuickBooks handles large envelopes, but very big ones make a single
+# ProcessRequest slow and hold the company file lock for a long time
+DEFAULT_MAX_BATCH_SIZE = 100
+DEFAULT_MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+ON_ERROR_POLICIES = ('continueOnError', 'stopOnError')
+
+_START_TAG = re.compile(r'^\s*<([A-Za-z_][\w.-]*)([^>]*?)(/?)>')
+_REQUEST_ID = re.compile(r'\brequestID\s*=\s*"([^"]*)"')
+
+
+class BatchResult:
+    """
+    Outcome of one request in a batch.
+    
+    Attributes:
+        request_id: requestID the request was sent with
+        request_type: Response element name (e.g. 'ItemQueryRs'), or the
+            request element name for requests that were never processed
+        status_code: QuickBooks statusCode (int), None if not processed
+        status_severity: 'Info', 'Warn', 'Error', or None if not processed
+        status_message: QuickBooks statusMessage
+        element: The *Rs ElementTree element (None if not processed)
+    """
+    
+    __slots__ = ('request_id', 'request_type', 'status_code', 'status_severity',
+                 'status_message', 'element')
+    
+    def __init__(self, request_id, request_type, status_code=None, status_severity=None,
+                 status_message='', element=None):
+        self.request_id = request_id
+        self.request_type = request_type
+        self.status_code = status_code
+        self.status_severity = status_severity
+        self.status_message = status_message
+        self.element = element
+    
+    @classmethod
+    def skipped(cls, request_id, request_type):
+        """Result for a request QuickBooks never processed (stopOnError)."""
+        return cls(request_id, request_type, status_message='Not processed: an earlier request failed')
+    
+    @property
+    def processed(self):
+        return self.status_code is not None
+    
+    @property
+    def ok(self):
+        """True if processed without an error (Info/Warn statuses count as ok)."""
+        return self.processed and self.status_severity != 'Error'
+    
+    @property
+    def xml(self):
+        """The *Rs element as an XML string ('' if not processed)."""
+        if self.element is None:
+            return ''
+        return ET.tostring(self.element, encoding='unicode')
+    
+    def __repr__(self):
+        return (f"BatchResult({self.request_id!r}, {self.request_type!r}, "
+                f"status_code={self.status_code!r}, status_message={self.status_message!r})")
+
+
+def tag_requests(requests):
+    """
+    Give every request fragment a requestID.
+    
+    Fragments that already carry a requestID keep it; others get their
+    position in the list (as a string).
+    
+    Args:
+        requests: Iterable of *Rq XML fragments, e.g. '<ItemQueryRq>...</ItemQueryRq>'
+    
+    Returns:
+        list of (request_id, request_type, xml) tuples
+    
+    Raises:
+        ValueError: If a fragment is not an element or requestIDs repeat
+    """
+    tagged = []
+    seen = set()
+    for index, xml in enumerate(requests):
+        match = _START_TAG.match(xml)
+        if not match:
+            raise ValueError(f"Request {index} is not an XML element: {xml[:60]!r}")
+        
+        request_type, attrs, self_closing = match.groups()
+        existing = _REQUEST_ID.search(attrs)
+        if existing:
+            request_id = existing.group(1)
+        else:
+            request_id = str(index)
+            xml = (f'{xml[:match.start(1) - 1]}<{request_type}{attrs} requestID="{request_id}"'
+                   f'{self_closing}>{xml[match.end():]}')
+        
+        if request_id in seen:
+            raise ValueError(f"Duplicate requestID {request_id!r} in batch")
+        seen.add(request_id)
+        tagged.append((request_id, request_type, xml))
+    return tagged
+
+
+def chunk_requests(tagged, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                   max_batch_bytes=DEFAULT_MAX_BATCH_BYTES):
+    """
+    Split tagged requests into envelopes of at most max_batch_size requests
+    and (approximately) max_batch_bytes of request XML. A single request
+    larger than max_batch_bytes still gets its own envelope.
+    """
+    chunks = []
+    current = []
+    current_bytes = 0
+    for entry in tagged:
+        size = len(entry[2])
+        if current and (len(current) >= max_batch_size or current_bytes + size > max_batch_bytes):
+            chunks.append(current)
+            current = []
+            current_bytes = 0
+        current.append(entry)
+        current_bytes += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_envelope(fragments, on_error='stopOnError'):
+    """Wrap *Rq fragments in a single qbXML QBXMLMsgsRq envelope."""
+    if on_error not in ON_ERROR_POLICIES:
+        raise ValueError(f"on_error must be one of {ON_ERROR_POLICIES}, got {on_error!r}")
+    return wrap_envelope('\n'.join(fragments) + '\n', on_error)
+
+
+def parse_batch_response(response):
+    """
+    Map each *Rs element of a multi-request response to its requestID.
+    
+    Returns:
+        dict of request_id -> BatchResult
+    """
+    root = ET.fromstring(response)
+    msgs = root.find('QBXMLMsgsRs')
+    if msgs is None:
+        return {}
+    
+    results = {}
+    for index, rs in enumerate(msgs):
+        request_id = rs.get('requestID', str(index))
+        code = rs.get('statusCode')
+        results[request_id] = BatchResult(
+            request_id,
+            rs.tag,
+            status_code=int(code) if code is not None and code.lstrip('-').isdigit() else code,
+            status_severity=rs.get('statusSeverity'),
+            status_message=rs.get('statusMessage', ''),
+            element=rs,
+        )
+    return results
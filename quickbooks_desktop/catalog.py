@@ -0,0 +1,240 @@
+"""
+Local cache of QuickBooks customers and items.
+
+Loads the full customer and item lists once, then keeps them current with
+incremental queries (FromModifiedDate = newest TimeModified seen) when the
+refresh TTL expires, and reloads everything when the full TTL expires
+(incremental queries cannot see deletions). Existence checks and
+"first customer/item" lookups become dict lookups instead of COM calls;
+lookup() resolves a whole list of names with at most one query.
+
+QuickBooks names are case-insensitive, so lookups are too.
+"""
+import os
+import threading
+import time
+
+from . import qbxml_templates as templates
+from .progress import stage
+from .qbxml_parser import iter_records, parse_single_response
+
+
+# Incremental refresh when the cache is older than this (seconds)
+DEFAULT_REFRESH_TTL = float(os.getenv('QB_CATALOG_REFRESH_TTL', '60'))
+# Full reload when the last full load is older than this (seconds)
+DEFAULT_FULL_TTL = float(os.getenv('QB_CATALOG_FULL_TTL', '3600'))
+
+ENTITY_TYPES = ('customer', 'item')
+
+_QUERIES = {'customer': templates.customer_query, 'item': templates.item_query}
+_QUERY_RQ = {'customer': templates.customer_query_rq, 'item': templates.item_query_rq}
+_RET_ELEMENTS = ('ListID', 'Name', 'FullName', 'IsActive', 'TimeModified')
+
+
+def _build_query(entity_type, from_modified=None):
+    """Build a catalog query (all active and inactive entities, trimmed fields)."""
+    return _QUERIES[entity_type](active_status='All', from_modified=from_modified, include=_RET_ELEMENTS)
+
+
+def _to_entity(ret):
+    """Cache record for a *Ret record (None if it has no FullName)."""
+    full_name = ret.get('FullName')
+    if not full_name:
+        return None
+    return {
+        'list_id': ret.get('ListID'),
+        'name': ret.get('Name') or full_name,
+        'full_name': full_name,
+        'is_active': ret.get('IsActive', True),
+        'time_modified': ret.get('TimeModified'),
+        'type': ret.type,
+    }
+
+
+def _parse_entities(response):
+    """Yield a record dict for every *Ret element in a query response."""
+    for ret in iter_records(response):
+        record = _to_entity(ret)
+        if record is not None:
+            yield record
+
+
+class CatalogCache:
+    """
+    Customer and item lists kept in memory, keyed by casefolded full name.
+    
+    Methods that take qb (an open SessionManager) refresh the cache first
+    if its TTL has expired; lookups are otherwise served from memory.
+    """
+    
+    def __init__(self, refresh_ttl=DEFAULT_REFRESH_TTL, full_ttl=DEFAULT_FULL_TTL,
+                 clock=time.monotonic):
+        """
+        Args:
+            refresh_ttl: Seconds before an incremental refresh
+            full_ttl: Seconds before a full reload
+            clock: Time source (seconds), replaceable for testing
+        """
+        self.refresh_ttl = refresh_ttl
+        self.full_ttl = full_ttl
+        self.clock = clock
+        self.queries_sent = 0
+        self._entities = {t: {} for t in ENTITY_TYPES}
+        self._watermark = {t: None for t in ENTITY_TYPES}
+        self._loaded_at = None
+        self._refreshed_at = None
+        self._lock = threading.RLock()
+    
+    # -------------------------------------------------------------------------
+    # Refresh
+    # -------------------------------------------------------------------------
+    
+    def ensure_fresh(self, qb):
+        """Full-load or incrementally refresh the cache if its TTLs expired."""
+        with self._lock:
+            now = self.clock()
+            if self._loaded_at is None or now - self._loaded_at >= self.full_ttl:
+                self.full_load(qb)
+            elif now - self._refreshed_at >= self.refresh_ttl:
+                self.refresh(qb)
+    
+    def full_load(self, qb):
+        """Replace the cache with the complete customer and item lists."""
+        with self._lock, stage('catalog_refresh', mode='full') as info:
+            entities = {t: {} for t in ENTITY_TYPES}
+            watermark = {t: None for t in ENTITY_TYPES}
+            for entity_type in ENTITY_TYPES:
+                info[entity_type] = self._load_into(qb, entity_type, entities[entity_type], watermark, None)
+            self._entities = entities
+            self._watermark = watermark
+            self._loaded_at = self._refreshed_at = self.clock()
+    
+    def refresh(self, qb):
+        """Fetch only entities modified since the newest TimeModified seen."""
+        with self._lock:
+            if self._loaded_at is None:
+                return self.full_load(qb)
+            with stage('catalog_refresh', mode='incremental') as info:
+                for entity_type in ENTITY_TYPES:
+                    info[entity_type] = self._load_into(qb, entity_type, self._entities[entity_type],
+                                                        self._watermark, self._watermark[entity_type])
+            self._refreshed_at = self.clock()
+    
+    def _load_into(self, qb, entity_type, entities, watermark, from_modified):
+        """Query entity_type (modified since from_modified) into entities; returns the count."""
+        response = qb.send_request(_build_query(entity_type, from_modified))
+        self.queries_sent += 1
+        count = 0
+        for record in _parse_entities(response):
+            count += 1
+            entities[record['full_name'].casefold()] = record
+            modified = record['time_modified']
+            if modified and (watermark[entity_type] is None or modified > watermark[entity_type]):
+                watermark[entity_type] = modified
+        return count
+    
+    def invalidate(self):
+        """Force a full reload on next use."""
+        with self._lock:
+            self._loaded_at = None
+    
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+    
+    def get(self, qb, entity_type, name):
+        """Return the cached record for name (any active status), or None."""
+        self.ensure_fresh(qb)
+        return self._entities[entity_type].get(str(name).casefold())
+    
+    def lookup(self, qb, entity_type, names):
+        """
+        Resolve many names at once.
+        
+        Names in the cache are answered from memory. The rest are checked
+        in ONE *QueryRq with a FullName filter per name (the cache may be
+        up to refresh_ttl stale), and whatever QuickBooks returns is cached.
+        
+        Args:
+            qb: Open SessionManager
+            entity_type: 'customer' or 'item'
+            names: Full names to resolve
+        
+        Returns:
+            dict of name -> cached record, or None if it does not exist
+        
+        Raises:
+            QBXMLError: If QuickBooks rejects the query
+        """
+        self.ensure_fresh(qb)
+        entities = self._entities[entity_type]
+        found = {}
+        unknown = []
+        for name in dict.fromkeys(names):
+            record = entities.get(str(name).casefold())
+            if record is None:
+                unknown.append(name)
+            found[name] = record
+        
+        if unknown:
+            query = _QUERY_RQ[entity_type](full_names=unknown, include=_RET_ELEMENTS)
+            with stage('catalog_lookup', entity=entity_type, names=len(unknown)) as info:
+                # Names QuickBooks cannot find make this a Warn (500), not an error
+                rs = parse_single_response(qb.send_request(templates.request(query)))
+                self.queries_sent += 1
+                rs.raise_for_status()
+                info['found'] = len(rs.records)
+            with self._lock:
+                for ret in rs.records:
+                    record = _to_entity(ret)
+                    if record is not None:
+                        entities[record['full_name'].casefold()] = record
+            for name in unknown:
+                found[name] = entities.get(str(name).casefold())
+        return found
+    
+    def exists(self, qb, entity_type, name):
+        """True if a customer/item with this full name exists (active or not)."""
+        return self.get(qb, entity_type, name) is not None
+    
+    def first(self, qb, entity_type):
+        """Full name of the first active entity, in QuickBooks list order."""
+        self.ensure_fresh(qb)
+        with self._lock:
+            for record in self._entities[entity_type].values():
+                if record['is_active']:
+                    return record['full_name']
+        return None
+    
+    def first_customer(self, qb):
+        return self.first(qb, 'customer')
+    
+    def first_item(self, qb):
+        return self.first(qb, 'item')
+    
+    def add(self, entity_type, full_name, **fields):
+        """Record an entity this process just created, without a round trip."""
+        with self._lock:
+            record = {
+                'list_id': None,
+                'name': full_name.rsplit(':', 1)[-1],
+                'full_name': full_name,
+                'is_active': True,
+                'time_modified': None,
+                'type': None,
+            }
+            record.update(fields)
+            self._entities[entity_type][full_name.casefold()] = record
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> CatalogCache:
+    """Return the process-wide CatalogCache, creating it on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = CatalogCache()
+        return _catalog
@@ -0,0 +1,678 @@
+"""
+In-memory stand-in for the QBXMLRP2.RequestProcessor COM object.
+
+Lets SessionManager (and everything built on it: the executor, catalog,
+qb_helpers, create_qb_invoice and the Flask routes) run without Windows,
+win32com or QuickBooks - e.g. for load tests and benchmarks on Linux.
+
+FakeRequestProcessor keeps a FakeCompany (customers, items, invoices),
+parses incoming qbXML and answers the request types this project sends
+with realistic responses: status codes (1 = no matches, 3100 = duplicate
+name, 3140 = invalid reference, ...), requestIDs, onError handling,
+InvoiceQuery iterators and FromModifiedDate filters. Per-call latency
+and error rates can be injected.
+
+Usage:
+    from quickbooks_desktop.fake_processor import FakeRequestProcessor
+    from quickbooks_desktop.session_manager import SessionManager
+    
+    qb = SessionManager(processor_factory=lambda: FakeRequestProcessor(latency=0.05))
+
+Or set QB_REQUEST_PROCESSOR=fake to make every SessionManager use the
+shared fake company (see processor_from_env for the tuning variables).
+"""
+import os
+import random
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timedelta
+
+
+# Status codes QuickBooks returns for the situations the fake reproduces
+STATUS_OK = 0
+STATUS_NO_MATCH = 1
+STATUS_STRING_TOO_LONG = 3070
+STATUS_DUPLICATE_NAME = 3100
+STATUS_INVALID_REFERENCE = 3140
+STATUS_INVALID_ITERATOR = 3175
+STATUS_SAVE_FAILED = 3180
+STATUS_UNSUPPORTED = 3250
+
+# Max length of list element names (QuickBooks Name fields)
+MAX_NAME_LENGTH = 31
+
+_NO_MATCH_MESSAGE = "A query request did not find a matching object in QuickBooks"
+
+
+class FakeCOMError(Exception):
+    """Raised where the real COM object would raise (bad ticket, injected failures)."""
+
+
+class _StatusError(Exception):
+    """A request failed with a QuickBooks error status (becomes the *Rs status)."""
+    
+    def __init__(self, status_code, status_message):
+        self.status_code = status_code
+        self.status_message = status_message
+        super().__init__(status_message)
+
+
+def _text(elem, path, default=None):
+    child = elem.find(path)
+    if child is None or child.text is None:
+        return default
+    return child.text.strip()
+
+
+def _parse_time(text):
+    """Parse a qbXML date or datetime (naive values are taken as local time)."""
+    value = datetime.fromisoformat(text)
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value
+
+
+def _format_time(value):
+    return value.isoformat(timespec='seconds')
+
+
+def _append(parent, tag, value):
+    """Append <tag>value</tag>; dicts become aggregates, lists repeat the tag."""
+    if value is None:
+        return
+    if isinstance(value, list):
+        for entry in value:
+            _append(parent, tag, entry)
+        return
+    child = ET.SubElement(parent, tag)
+    if isinstance(value, dict):
+        for name, sub_value in value.items():
+            _append(child, name, sub_value)
+    elif isinstance(value, bool):
+        child.text = 'true' if value else 'false'
+    elif isinstance(value, float):
+        child.text = f"{value:.2f}"
+    elif isinstance(value, datetime):
+        child.text = _format_time(value)
+    else:
+        child.text = str(value)
+
+
+class FakeCompany:
+    """
+    Company file contents: customers, items and invoices.
+    
+    List elements and transactions are plain dicts keyed by qbXML field
+    names, so responses are produced by serializing them. TimeModified
+    values never go backwards, so incremental (FromModifiedDate) queries
+    behave like the real thing.
+    """
+    
+    def __init__(self, company_name="Fake Company", clock=None):
+        """
+        Args:
+            company_name: Returned by CompanyQuery/HostQuery
+            clock: Callable returning an aware datetime (default: now)
+        """
+        self.company_name = company_name
+        self.clock = clock or (lambda: datetime.now().astimezone())
+        self.customers = {}
+        self.items = {}
+        self.invoices = []
+        self.iterators = {}
+        self._next_id = 0x10000
+        self._next_ref = 1
+        self._last_time = None
+        self._lock = threading.RLock()
+    
+    @classmethod
+    def seeded(cls, customers=1, items=1, invoices=0, lines_per_invoice=3, seed=0, **kwargs):
+        """
+        Company pre-filled with generated data (for load tests).
+        
+        Args:
+            customers: Number of customers ("Customer 0001", ...)
+            items: Number of service items ("ITEM-0001", ...)
+            invoices: Number of invoices spread over the last 365 days
+            lines_per_invoice: Lines per generated invoice
+            seed: Random seed for quantities, rates and dates
+        """
+        company = cls(**kwargs)
+        rng = random.Random(seed)
+        for i in range(1, customers + 1):
+            company.add_customer(f"Customer {i:04d}")
+        for i in range(1, items + 1):
+            company.add_item(f"ITEM-{i:04d}", f"Generated item {i}", round(rng.uniform(20, 900), 2))
+        
+        customer_names = [c['FullName'] for c in company.customers.values()]
+        item_names = [item['FullName'] for item in company.items.values()]
+        today = date.today()
+        for _ in range(invoices):
+            lines = [
+                {'item': rng.choice(item_names), 'desc': f"Generated line {n}",
+                 'quantity': rng.randint(1, 250), 'rate': round(rng.uniform(20, 900), 2)}
+                for n in range(1, lines_per_invoice + 1)
+            ]
+            txn_date = today - timedelta(days=rng.randrange(365))
+            company.add_invoice(rng.choice(customer_names), lines, txn_date.isoformat())
+        return company
+    
+    # -------------------------------------------------------------------------
+    # Records
+    # -------------------------------------------------------------------------
+    
+    def _stamp(self):
+        """A TimeModified that never goes backwards (second resolution, like QB)."""
+        now = self.clock().replace(microsecond=0)
+        if self._last_time is not None and now < self._last_time:
+            now = self._last_time
+        self._last_time = now
+        return now
+    
+    def _new_id(self):
+        self._next_id += 1
+        return f"{self._next_id:X}-{int(time.time())}"
+    
+    def _check_name(self, name, entity):
+        if not name:
+            raise _StatusError(3000, f"The {entity} Name field is required.")
+        if len(name) > MAX_NAME_LENGTH:
+            raise _StatusError(STATUS_STRING_TOO_LONG,
+                               f'The string "{name}" in the field "Name" is too long.')
+    
+    def add_customer(self, name, company_name=None):
+        """Add a customer; raises _StatusError for duplicate or invalid names."""
+        with self._lock:
+            self._check_name(name, 'customer')
+            if name.casefold() in self.customers:
+                raise _StatusError(STATUS_DUPLICATE_NAME,
+                                   f'The name "{name}" of the list element is already in use.')
+            now = self._stamp()
+            customer = {
+                'ListID': self._new_id(),
+                'TimeCreated': now,
+                'TimeModified': now,
+                'EditSequence': str(int(time.time())),
+                'Name': name,
+                'FullName': name,
+                'IsActive': True,
+                'Sublevel': 0,
+                'CompanyName': company_name,
+                'Balance': 0.0,
+                'TotalBalance': 0.0,
+            }
+            self.customers[name.casefold()] = customer
+            return customer
+    
+    def add_item(self, name, description="", price=0.0, account="Sales"):
+        """Add a service item; raises _StatusError for duplicate or invalid names."""
+        with self._lock:
+            self._check_name(name, 'item')
+            if name.casefold() in self.items:
+                raise _StatusError(STATUS_DUPLICATE_NAME,
+                                   f'The name "{name}" of the list element is already in use.')
+            now = self._stamp()
+            item = {
+                'ListID': self._new_id(),
+                'TimeCreated': now,
+                'TimeModified': now,
+                'EditSequence': str(int(time.time())),
+                'Name': name,
+                'FullName': name,
+                'IsActive': True,
+                'Sublevel': 0,
+                'SalesOrPurchase': {
+                    'Desc': description or None,
+                    'Price': float(price),
+                    'AccountRef': {'FullName': account},
+                },
+            }
+            self.items[name.casefold()] = item
+            return item
+    
+    def add_invoice(self, customer, lines, txn_date=None, memo=None, ref_number=None):
+        """
+        Add an invoice.
+        
+        Args:
+            customer: Customer full name (must exist)
+            lines: dicts with item, desc, quantity, rate (and/or amount)
+            txn_date: YYYY-MM-DD (default today)
+            memo: Invoice memo
+            ref_number: Invoice number (default: next number)
+        
+        Raises:
+            _StatusError: On an unknown customer or item
+        """
+        with self._lock:
+            customer_rec = self.customers.get((customer or '').casefold())
+            if customer_rec is None:
+                raise _StatusError(STATUS_INVALID_REFERENCE,
+                                   f'There is an invalid reference to QuickBooks Customer "{customer}" in the Invoice.')
+            
+            txn_id = self._new_id()
+            line_rets = []
+            subtotal = 0.0
+            for line in lines:
+                item_rec = self.items.get((line.get('item') or '').casefold())
+                if item_rec is None:
+                    raise _StatusError(STATUS_INVALID_REFERENCE,
+                                       f'There is an invalid reference to QuickBooks Item "{line.get("item")}" in the Invoice.')
+                quantity = line.get('quantity')
+                rate = line.get('rate')
+                amount = line.get('amount')
+                if amount is None:
+                    amount = round((quantity or 1) * (rate or 0.0), 2)
+                subtotal += amount
+                line_rets.append({
+                    'TxnLineID': self._new_id(),
+                    'ItemRef': {'ListID': item_rec['ListID'], 'FullName': item_rec['FullName']},
+                    'Desc': line.get('desc'),
+                    'Quantity': quantity,
+                    'Rate': rate,
+                    'Amount': float(amount),
+                })
+            
+            if ref_number is None:
+                ref_number = str(self._next_ref)
+                self._next_ref += 1
+            now = self._stamp()
+            subtotal = round(subtotal, 2)
+            invoice = {
+                'TxnID': txn_id,
+                'TimeCreated': now,
+                'TimeModified': now,
+                'EditSequence': str(int(time.time())),
+                'TxnNumber': len(self.invoices) + 1,
+                'CustomerRef': {'ListID': customer_rec['ListID'], 'FullName': customer_rec['FullName']},
+                'TxnDate': txn_date or date.today().isoformat(),
+                'RefNumber': ref_number,
+                'IsPending': False,
+                'Subtotal': subtotal,
+                'BalanceRemaining': subtotal,
+                'Memo': memo,
+                'IsPaid': False,
+                'InvoiceLineRet': line_rets,
+            }
+            self.invoices.append(invoice)
+            customer_rec['Balance'] = round(customer_rec['Balance'] + subtotal, 2)
+            customer_rec['TotalBalance'] = customer_rec['Balance']
+            return invoice
+
+
+class FakeRequestProcessor:
+    """
+    Pure-Python QBXMLRP2.RequestProcessor.
+    
+    Same methods as the COM object (OpenConnection, BeginSession,
+    ProcessRequest, EndSession, CloseConnection); ProcessRequest answers
+    from a FakeCompany. Calls are serialized like the real (single
+    threaded apartment) processor.
+    """
+    
+    def __init__(self, company=None, latency=0.0, latency_jitter=0.0, latency_per_kb=0.0,
+                 error_rate=0.0, status_error_rate=0.0, connect_latency=0.0, seed=None):
+        """
+        Args:
+            company: FakeCompany to serve (default: a new one with one
+                customer and one item)
+            latency: Seconds added to every ProcessRequest
+            latency_jitter: Extra random 0..latency_jitter seconds per call
+            latency_per_kb: Seconds per KB of request + response XML
+            error_rate: Probability (0-1) that ProcessRequest raises
+                FakeCOMError instead of answering
+            status_error_rate: Probability (0-1) that an Add request fails
+                with an error status (3180)
+            connect_latency: Seconds added to OpenConnection + BeginSession
+            seed: Random seed for jitter and injected errors
+        """
+        self.company = company if company is not None else FakeCompany.seeded()
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.latency_per_kb = latency_per_kb
+        self.error_rate = error_rate
+        self.status_error_rate = status_error_rate
+        self.connect_latency = connect_latency
+        self.requests_processed = 0
+        self._rng = random.Random(seed)
+        self._connected = False
+        self._ticket = None
+        self._lock = threading.Lock()
+    
+    # -------------------------------------------------------------------------
+    # COM interface
+    # -------------------------------------------------------------------------
+    
+    def OpenConnection(self, app_id, app_name):
+        if self.connect_latency:
+            time.sleep(self.connect_latency / 2)
+        self._connected = True
+    
+    def OpenConnection2(self, app_id, app_name, conn_type):
+        self.OpenConnection(app_id, app_name)
+    
+    def BeginSession(self, qb_file_path, mode):
+        if not self._connected:
+            raise FakeCOMError("BeginSession called before OpenConnection")
+        if self.connect_latency:
+            time.sleep(self.connect_latency / 2)
+        self._ticket = f"{{{uuid.uuid4()}}}"
+        return self._ticket
+    
+    def ProcessRequest(self, ticket, xml_request):
+        with self._lock:
+            if ticket is None or ticket != self._ticket:
+                raise FakeCOMError("Invalid ticket parameter")
+            
+            start = time.perf_counter()
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self._sleep(start, len(xml_request))
+                raise FakeCOMError("Injected ProcessRequest failure")
+            
+            response = self._process(xml_request)
+            self.requests_processed += 1
+            self._sleep(start, len(xml_request) + len(response))
+            return response
+    
+    def EndSession(self, ticket):
+        if ticket != self._ticket:
+            raise FakeCOMError("Invalid ticket parameter")
+        self._ticket = None
+    
+    def CloseConnection(self):
+        self._connected = False
+        self._ticket = None
+    
+    def _sleep(self, start, size):
+        delay = self.latency + self.latency_per_kb * size / 1024
+        if self.latency_jitter:
+            delay += self._rng.uniform(0, self.latency_jitter)
+        remaining = delay - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+    
+    # -------------------------------------------------------------------------
+    # Request dispatch
+    # -------------------------------------------------------------------------
+    
+    def _process(self, xml_request):
+        try:
+            root = ET.fromstring(xml_request.encode('utf-8') if isinstance(xml_request, str) else xml_request)
+        except ET.ParseError as e:
+            # The real processor rejects unparseable requests with a COM error
+            raise FakeCOMError(f"QuickBooks found an error when parsing the provided XML text stream: {e}")
+        
+        msgs = root.find('QBXMLMsgsRq')
+        if msgs is None:
+            raise FakeCOMError("QuickBooks found an error when parsing the provided XML text stream: no QBXMLMsgsRq")
+        stop_on_error = msgs.get('onError', 'stopOnError') == 'stopOnError'
+        
+        out_root = ET.Element('QBXML')
+        out_msgs = ET.SubElement(out_root, 'QBXMLMsgsRs')
+        with self.company._lock:
+            for request in msgs:
+                failed = self._answer(request, out_msgs)
+                if failed and stop_on_error:
+                    break
+        
+        return ('<?xml version="1.0" ?>\n'
+                + ET.tostring(out_root, encoding='unicode'))
+    
+    def _answer(self, request, out_msgs):
+        """Append the *Rs for one *Rq; returns True if it has an Error status."""
+        tag = request.tag
+        rs_tag = tag[:-2] + 'Rs' if tag.endswith('Rq') else tag + 'Rs'
+        attrs = {}
+        if request.get('requestID') is not None:
+            attrs['requestID'] = request.get('requestID')
+        
+        records = []
+        try:
+            if (self.status_error_rate and 'Add' in tag
+                    and self._rng.random() < self.status_error_rate):
+                raise _StatusError(STATUS_SAVE_FAILED,
+                                   "There was an error when saving a transaction. (injected error)")
+            handler = getattr(self, f"_handle_{tag}", None)
+            if handler is None:
+                raise _StatusError(STATUS_UNSUPPORTED,
+                                   f"{tag} is not supported by the fake request processor.")
+            records, extra = handler(request)
+            attrs.update(extra)
+            if records or not tag.endswith('QueryRq') or request.get('iterator') == 'Stop':
+                attrs.update(statusCode=str(STATUS_OK), statusSeverity='Info', statusMessage='Status OK')
+            else:
+                attrs.update(statusCode=str(STATUS_NO_MATCH), statusSeverity='Info',
+                             statusMessage=_NO_MATCH_MESSAGE)
+            failed = False
+        except _StatusError as e:
+            records = []
+            attrs.update(statusCode=str(e.status_code), statusSeverity='Error',
+                         statusMessage=e.status_message)
+            failed = True
+        
+        rs = ET.SubElement(out_msgs, rs_tag, attrs)
+        for ret_tag, fields in records:
+            _append(rs, ret_tag, fields)
+        return failed
+    
+    # -------------------------------------------------------------------------
+    # Lists
+    # -------------------------------------------------------------------------
+    
+    def _query_list(self, request, entities, ret_tag):
+        list_ids = {e.text.strip() for e in request.findall('ListID') if e.text}
+        full_names = {e.text.strip().casefold() for e in request.findall('FullName') if e.text}
+        active = _text(request, 'ActiveStatus', 'ActiveOnly')
+        from_modified = _text(request, 'FromModifiedDate')
+        to_modified = _text(request, 'ToModifiedDate')
+        max_returned = _text(request, 'MaxReturned')
+        includes = [e.text.strip() for e in request.findall('IncludeRetElement') if e.text]
+        
+        if from_modified:
+            from_modified = _parse_time(from_modified)
+        if to_modified:
+            to_modified = _parse_time(to_modified)
+        
+        matches = []
+        for key, entity in entities.items():
+            if list_ids and entity['ListID'] not in list_ids:
+                continue
+            if full_names and key not in full_names:
+                continue
+            if not list_ids and not full_names:
+                # Filters other than ListID/FullName only apply to full-list queries
+                if active == 'ActiveOnly' and not entity['IsActive']:
+                    continue
+                if active == 'InactiveOnly' and entity['IsActive']:
+                    continue
+                if from_modified and entity['TimeModified'] < from_modified:
+                    continue
+                if to_modified and entity['TimeModified'] > to_modified:
+                    continue
+            matches.append(entity)
+        
+        if max_returned and not list_ids and not full_names:
+            matches = matches[:int(max_returned)]
+        if includes:
+            matches = [{k: v for k, v in entity.items() if k in includes} for entity in matches]
+        return [(ret_tag, entity) for entity in matches], {}
+    
+    def _handle_CustomerQueryRq(self, request):
+        return self._query_list(request, self.company.customers, 'CustomerRet')
+    
+    def _handle_ItemQueryRq(self, request):
+        return self._query_list(request, self.company.items, 'ItemServiceRet')
+    
+    def _handle_ItemServiceQueryRq(self, request):
+        return self._query_list(request, self.company.items, 'ItemServiceRet')
+    
+    def _handle_CustomerAddRq(self, request):
+        add = request.find('CustomerAdd')
+        customer = self.company.add_customer(_text(add, 'Name'), _text(add, 'CompanyName'))
+        return [('CustomerRet', customer)], {}
+    
+    def _handle_ItemServiceAddRq(self, request):
+        add = request.find('ItemServiceAdd')
+        sales = add.find('SalesOrPurchase')
+        description, price, account = "", 0.0, "Sales"
+        if sales is not None:
+            description = _text(sales, 'Desc', "")
+            price = float(_text(sales, 'Price', '0') or 0)
+            account = _text(sales, 'AccountRef/FullName', account)
+        item = self.company.add_item(_text(add, 'Name'), description, price, account)
+        return [('ItemServiceRet', item)], {}
+    
+    # -------------------------------------------------------------------------
+    # Invoices
+    # -------------------------------------------------------------------------
+    
+    def _handle_InvoiceAddRq(self, request):
+        add = request.find('InvoiceAdd')
+        lines = []
+        for line in add.findall('InvoiceLineAdd'):
+            quantity = _text(line, 'Quantity')
+            rate = _text(line, 'Rate')
+            amount = _text(line, 'Amount')
+            lines.append({
+                'item': _text(line, 'ItemRef/FullName'),
+                'desc': _text(line, 'Desc'),
+                'quantity': float(quantity) if quantity else None,
+                'rate': float(rate) if rate else None,
+                'amount': float(amount) if amount else None,
+            })
+        invoice = self.company.add_invoice(
+            _text(add, 'CustomerRef/FullName'), lines,
+            txn_date=_text(add, 'TxnDate'), memo=_text(add, 'Memo'),
+            ref_number=_text(add, 'RefNumber'),
+        )
+        return [('InvoiceRet', invoice)], {}
+    
+    def _handle_InvoiceQueryRq(self, request):
+        iterator = request.get('iterator')
+        iterators = self.company.iterators
+        
+        if iterator in ('Continue', 'Stop'):
+            iterator_id = request.get('iteratorID')
+            if iterator_id not in iterators:
+                raise _StatusError(STATUS_INVALID_ITERATOR,
+                                   f'The iteratorID "{iterator_id}" is not valid.')
+            if iterator == 'Stop':
+                del iterators[iterator_id]
+                return [], {}
+            pending, include_lines = iterators[iterator_id]
+        else:
+            pending = self._match_invoices(request)
+            include_lines = _text(request, 'IncludeLineItems') == 'true'
+            iterator_id = None
+        
+        max_returned = _text(request, 'MaxReturned')
+        count = int(max_returned) if max_returned else len(pending)
+        page, rest = pending[:count], pending[count:]
+        
+        extra = {}
+        if iterator:
+            iterator_id = iterator_id or f"{{{uuid.uuid4()}}}"
+            if rest:
+                iterators[iterator_id] = (rest, include_lines)
+            else:
+                iterators.pop(iterator_id, None)
+            extra = {'iteratorRemainingCount': str(len(rest)), 'iteratorID': iterator_id}
+        
+        records = []
+        for invoice in page:
+            if not include_lines:
+                invoice = {k: v for k, v in invoice.items() if k != 'InvoiceLineRet'}
+            records.append(('InvoiceRet', invoice))
+        return records, extra
+    
+    def _match_invoices(self, request):
+        txn_ids = {e.text.strip() for e in request.findall('TxnID') if e.text}
+        ref_numbers = {e.text.strip() for e in request.findall('RefNumber') if e.text}
+        if txn_ids or ref_numbers:
+            return [inv for inv in self.company.invoices
+                    if inv['TxnID'] in txn_ids or inv['RefNumber'] in ref_numbers]
+        
+        matches = list(self.company.invoices)
+        modified = request.find('ModifiedDateRangeFilter')
+        if modified is not None:
+            from_modified = _text(modified, 'FromModifiedDate')
+            to_modified = _text(modified, 'ToModifiedDate')
+            if from_modified:
+                start = _parse_time(from_modified)
+                matches = [inv for inv in matches if inv['TimeModified'] >= start]
+            if to_modified:
+                end = _parse_time(to_modified)
+                matches = [inv for inv in matches if inv['TimeModified'] <= end]
+        
+        txn_dates = request.find('TxnDateRangeFilter')
+        if txn_dates is not None:
+            from_date = _text(txn_dates, 'FromTxnDate')
+            to_date = _text(txn_dates, 'ToTxnDate')
+            if from_date:
+                matches = [inv for inv in matches if inv['TxnDate'] >= from_date]
+            if to_date:
+                matches = [inv for inv in matches if inv['TxnDate'] <= to_date]
+        return matches
+    
+    # -------------------------------------------------------------------------
+    # Host / company
+    # -------------------------------------------------------------------------
+    
+    def _handle_HostQueryRq(self, request):
+        return [('HostRet', {
+            'ProductName': 'QuickBooks Enterprise Solutions (fake request processor)',
+            'MajorVersion': 33,
+            'MinorVersion': 0,
+            'SupportedQBXMLVersion': ['13.0', '14.0', '15.0', '16.0'],
+            'IsAutomaticLogin': False,
+            'QBFileMode': 'SingleUser',
+        })], {}
+    
+    def _handle_CompanyQueryRq(self, request):
+        return [('CompanyRet', {'CompanyName': self.company.company_name})], {}
+
+
+_shared_company = None
+_shared_company_lock = threading.Lock()
+
+
+def get_shared_company():
+    """
+    Company shared by every processor from processor_from_env, so data
+    survives session reconnects (like a real company file).
+    
+    Seeded from QB_FAKE_CUSTOMERS, QB_FAKE_ITEMS and QB_FAKE_INVOICES
+    (default 1, 1 and 0).
+    """
+    global _shared_company
+    with _shared_company_lock:
+        if _shared_company is None:
+            _shared_company = FakeCompany.seeded(
+                customers=int(os.getenv('QB_FAKE_CUSTOMERS', '1')),
+                items=int(os.getenv('QB_FAKE_ITEMS', '1')),
+                invoices=int(os.getenv('QB_FAKE_INVOICES', '0')),
+            )
+        return _shared_company
+
+
+def processor_from_env():
+    """
+    FakeRequestProcessor configured from environment variables.
+    
+    QB_FAKE_LATENCY_MS, QB_FAKE_JITTER_MS, QB_FAKE_MS_PER_KB,
+    QB_FAKE_CONNECT_MS, QB_FAKE_ERROR_RATE, QB_FAKE_STATUS_ERROR_RATE and
+    QB_FAKE_SEED map to the constructor arguments (all default to 0 / off).
+    """
+    seed = os.getenv('QB_FAKE_SEED')
+    return FakeRequestProcessor(
+        company=get_shared_company(),
+        latency=float(os.getenv('QB_FAKE_LATENCY_MS', '0')) / 1000,
+        latency_jitter=float(os.getenv('QB_FAKE_JITTER_MS', '0')) / 1000,
+        latency_per_kb=float(os.getenv('QB_FAKE_MS_PER_KB', '0')) / 1000,
+        error_rate=float(os.getenv('QB_FAKE_ERROR_RATE', '0')),
+        status_error_rate=float(os.getenv('QB_FAKE_STATUS_ERROR_RATE', '0')),
+        connect_latency=float(os.getenv('QB_FAKE_CONNECT_MS', '0')) / 1000,
+        seed=int(seed) if seed else None,
+    )
@@ -0,0 +1,368 @@
+"""
+Local mirror of QuickBooks invoices.
+
+The first sync pages through every invoice (qbXML iterator) into a SQLite
+file; after that each sync only asks for invoices modified since the
+newest TimeModified seen (ModifiedDateRangeFilter), so listing invoices
+costs one small query instead of pulling the whole company file. The
+watermark is stored in the same file, so deltas continue across restarts.
+
+Syncs take a send(xml) callable and make one call per iterator page, so
+with send = run_in_session(...) per request, other QuickBooks work (e.g.
+uploads) runs between pages. Pages are staged in a temporary table and
+applied, with the watermark, in one transaction after the last page.
+
+Delta syncs cannot see deleted invoices, so a full resync runs when the
+last one is older than full_ttl: every invoice it returns is stamped with
+the sync's generation and rows from older generations are dropped.
+
+Usage:
+    from quickbooks_desktop.invoice_mirror import get_invoice_mirror
+    
+    mirror = get_invoice_mirror()
+    mirror.ensure_fresh(send)   # Delta (or full) sync if stale; send(xml) -> response
+    for page in mirror.iter_pages():
+        ...
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from . import qbxml_templates as templates
+from .progress import stage
+from .qbxml_parser import parse_single_response
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'invoice_mirror.sqlite3')
+
+# Delta sync when the last sync is older than this (seconds)
+DEFAULT_REFRESH_TTL = float(os.getenv('QB_INVOICE_MIRROR_TTL', '30'))
+# Full resync (picks up deletions) when the last one is older than this (seconds)
+DEFAULT_FULL_TTL = float(os.getenv('QB_INVOICE_MIRROR_FULL_TTL', '86400'))
+
+# Invoices per iterator page while syncing
+SYNC_PAGE_SIZE = 500
+
+_RET_ELEMENTS = ('TxnID', 'TimeModified', 'RefNumber', 'TxnDate', 'CustomerRef', 'Subtotal', 'Memo')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    txn_id TEXT PRIMARY KEY,
+    ref_number TEXT,
+    txn_date TEXT,
+    time_modified TEXT,
+    customer TEXT,
+    subtotal REAL,
+    memo TEXT,
+    generation INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS invoices_ref_number ON invoices (ref_number);
+CREATE INDEX IF NOT EXISTS invoices_txn_date ON invoices (txn_date);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Pages of a running sync; per connection, so readers never see them
+_STAGING_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS invoices_staging (
+    txn_id TEXT PRIMARY KEY,
+    ref_number TEXT,
+    txn_date TEXT,
+    time_modified TEXT,
+    customer TEXT,
+    subtotal REAL,
+    memo TEXT,
+    generation INTEGER NOT NULL
+);
+"""
+
+_STAGE = """
+INSERT OR REPLACE INTO invoices_staging
+    (txn_id, ref_number, txn_date, time_modified, customer, subtotal, memo, generation)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Staged rows in the order QuickBooks returned them ("WHERE true" keeps
+# SQLite from parsing ON CONFLICT as a join constraint)
+_UPSERT = """
+INSERT INTO invoices (txn_id, ref_number, txn_date, time_modified, customer, subtotal, memo, generation)
+SELECT txn_id, ref_number, txn_date, time_modified, customer, subtotal, memo, generation
+FROM invoices_staging WHERE true ORDER BY rowid
+ON CONFLICT (txn_id) DO UPDATE SET
+    ref_number = excluded.ref_number,
+    txn_date = excluded.txn_date,
+    time_modified = excluded.time_modified,
+    customer = excluded.customer,
+    subtotal = excluded.subtotal,
+    memo = excluded.memo,
+    generation = excluded.generation
+"""
+
+
+def _row(record, generation):
+    customer = record.get('CustomerRef')
+    return (
+        record.get('TxnID'),
+        record.get('RefNumber'),
+        record.get('TxnDate'),
+        record.get('TimeModified'),
+        customer.get('FullName') if isinstance(customer, dict) else None,
+        record.get('Subtotal'),
+        record.get('Memo'),
+        generation,
+    )
+
+
+def _summary(row):
+    """Invoice dict in the shape query_invoices returns (plus the mirrored fields)."""
+    txn_id, ref_number, txn_date, time_modified, customer, subtotal, memo = row
+    return {
+        'txn_id': txn_id or 'N/A',
+        'ref_number': ref_number or 'N/A',
+        'date': txn_date or 'N/A',
+        'time_modified': time_modified,
+        'customer': customer,
+        'subtotal': subtotal,
+        'memo': memo,
+    }
+
+
+class InvoiceMirror:
+    """
+    SQLite copy of the company file's invoices, kept current by delta syncs.
+    
+    sync()/ensure_fresh() take send, a callable that sends one qbXML request
+    and returns the response; they run on the caller's thread and only the
+    send() calls touch QuickBooks. Reads never touch QuickBooks and can run
+    on any thread.
+    """
+    
+    def __init__(self, path=DEFAULT_PATH, refresh_ttl=DEFAULT_REFRESH_TTL, full_ttl=DEFAULT_FULL_TTL,
+                 page_size=SYNC_PAGE_SIZE, clock=time.time):
+        """
+        Args:
+            path: Database file (created if missing), or ':memory:'
+            refresh_ttl: Seconds before ensure_fresh() runs a delta sync
+            full_ttl: Seconds before ensure_fresh() runs a full resync
+            page_size: Invoices per iterator page while syncing
+            clock: Wall-clock time source (persisted, so not monotonic)
+        """
+        self.path = path
+        self.refresh_ttl = refresh_ttl
+        self.full_ttl = full_ttl
+        self.page_size = page_size
+        self.clock = clock
+        self.queries_sent = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()       # The connection
+        self._sync_lock = threading.Lock()  # One sync at a time
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            self._conn.executescript(_STAGING_SCHEMA)
+    
+    # -------------------------------------------------------------------------
+    # Sync state
+    # -------------------------------------------------------------------------
+    
+    def _get_state(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_state(self, **values):
+        """Write sync state (call inside a transaction on the connection)."""
+        self._conn.executemany(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            [(key, None if value is None else str(value)) for key, value in values.items()]
+        )
+    
+    def state(self):
+        """Watermark, last sync times (epoch seconds) and invoice count."""
+        with self._lock:
+            state = dict(self._conn.execute("SELECT key, value FROM sync_state"))
+            count = self._conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+        return {
+            'watermark': state.get('watermark'),
+            'last_sync': float(state['last_sync']) if state.get('last_sync') else None,
+            'last_full_sync': float(state['last_full_sync']) if state.get('last_full_sync') else None,
+            'invoices': count,
+        }
+    
+    # -------------------------------------------------------------------------
+    # Sync
+    # -------------------------------------------------------------------------
+    
+    def ensure_fresh(self, send):
+        """Full or delta sync if the last one is older than the TTLs; returns sync() info or None."""
+        now = self.clock()
+        state = self.state()
+        if state['last_full_sync'] is None or now - state['last_full_sync'] >= self.full_ttl:
+            return self.sync(send, full=True)
+        if now - state['last_sync'] >= self.refresh_ttl:
+            return self.sync(send)
+        return None
+    
+    def sync(self, send, full=False):
+        """
+        Bring the mirror up to date.
+        
+        Args:
+            send: Callable sending one qbXML request, returning the response
+                (called once per iterator page)
+            full: Fetch every invoice and drop the ones QuickBooks no longer
+                has (otherwise only invoices modified since the watermark)
+        
+        Returns:
+            dict with mode ('full' or 'delta'), fetched, removed and duration_ms
+        
+        Raises:
+            QBXMLError: If QuickBooks rejects a page. Nothing is applied:
+                pages are collected in a temporary staging table and moved
+                into the mirror, with the watermark, in one transaction
+                after the last page, so readers only ever see whole syncs.
+        """
+        with self._sync_lock:
+            watermark = None if full else self._get_state('watermark')
+            mode = 'delta' if watermark else 'full'
+            generation = int(self._get_state('generation') or 0) + (mode == 'full')
+            started = self.clock()
+            
+            with stage('invoice_mirror_sync', mode=mode) as info:
+                fetched = 0
+                newest = watermark
+                removed = 0
+                try:
+                    for records in self._pages(send, watermark):
+                        rows = [_row(record, generation) for record in records if record.get('TxnID')]
+                        # Temp table: committing it does not touch the invoices table
+                        with self._lock, self._conn:
+                            self._conn.executemany(_STAGE, rows)
+                        fetched += len(rows)
+                        for row in rows:
+                            if row[3] and (newest is None or row[3] > newest):
+                                newest = row[3]
+                    
+                    # The one write to the mirror: staged pages, deletions and state
+                    with self._lock, self._conn:
+                        self._conn.execute(_UPSERT)
+                        if mode == 'full':
+                            removed = self._conn.execute(
+                                "DELETE FROM invoices WHERE generation < ?", (generation,)
+                            ).rowcount
+                            self._set_state(generation=generation, last_full_sync=started)
+                        self._set_state(watermark=newest, last_sync=started)
+                finally:
+                    with self._lock, self._conn:
+                        self._conn.execute("DELETE FROM invoices_staging")
+                info['fetched'] = fetched
+                info['removed'] = removed
+            
+            return {'mode': mode, 'fetched': fetched, 'removed': removed,
+                    'duration_ms': round((self.clock() - started) * 1000, 1)}
+    
+    def _pages(self, send, from_modified):
+        """Yield the InvoiceRet records of each iterator page (modified since from_modified)."""
+        iterator_id = None
+        remaining = 0
+        try:
+            while True:
+                if iterator_id:
+                    xml = templates.invoice_query(max_returned=self.page_size, iterator='Continue',
+                                                  iterator_id=iterator_id)
+                else:
+                    xml = templates.request(templates.invoice_query_rq(
+                        max_returned=self.page_size, iterator='Start', from_modified=from_modified,
+                        include=_RET_ELEMENTS))
+                rs = parse_single_response(send(xml))
+                self.queries_sent += 1
+                if rs.status_code == 1:  # No matching invoices
+                    return
+                rs.raise_for_status()
+                
+                iterator_id = rs.iterator_id
+                remaining = rs.iterator_remaining or 0
+                yield rs.records
+                
+                if not remaining or not iterator_id:
+                    return
+        finally:
+            if iterator_id and remaining:
+                try:
+                    send(templates.invoice_query(iterator='Stop', iterator_id=iterator_id))
+                except Exception:
+                    pass  # QuickBooks drops the iterator with the session anyway
+    
+    def reset(self):
+        """Forget everything (next sync is a full one)."""
+        with self._sync_lock, self._lock, self._conn:
+            self._conn.execute("DELETE FROM invoices")
+            self._conn.execute("DELETE FROM sync_state")
+    
+    # -------------------------------------------------------------------------
+    # Reads (never touch QuickBooks)
+    # -------------------------------------------------------------------------
+    
+    def iter_pages(self, page_size=100, max_returned=None):
+        """
+        Yield mirrored invoices in pages, in the order QuickBooks returned them.
+        
+        Each page is a separate keyset query, so a sync can commit between pages.
+        
+        Yields:
+            list of invoice dicts (txn_id, ref_number, date, time_modified,
+            customer, subtotal, memo)
+        """
+        after = 0
+        returned = 0
+        while max_returned is None or returned < max_returned:
+            limit = page_size if max_returned is None else min(page_size, max_returned - returned)
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, txn_id, ref_number, txn_date, time_modified, customer, subtotal, memo "
+                    "FROM invoices WHERE rowid > ? ORDER BY rowid LIMIT ?", (after, limit)
+                ).fetchall()
+            if not rows:
+                return
+            after = rows[-1][0]
+            returned += len(rows)
+            yield [_summary(row[1:]) for row in rows]
+    
+    def find(self, ref_number):
+        """Mirrored invoices with this RefNumber (invoice number)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT txn_id, ref_number, txn_date, time_modified, customer, subtotal, memo "
+                "FROM invoices WHERE ref_number = ? ORDER BY rowid", (ref_number,)
+            ).fetchall()
+        return [_summary(row) for row in rows]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def format_sync_time(epoch):
+    """Human-readable local time of a sync (None -> 'never')."""
+    return datetime.fromtimestamp(epoch).isoformat(timespec='seconds') if epoch else 'never'
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_invoice_mirror() -> InvoiceMirror:
+    """Return the process-wide InvoiceMirror (QB_INVOICE_MIRROR_PATH), opened on first use."""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = InvoiceMirror(os.getenv('QB_INVOICE_MIRROR_PATH') or DEFAULT_PATH)
+        return _mirror
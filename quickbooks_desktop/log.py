@@ -0,0 +1,146 @@
+"""
+Non-blocking logging for the app and the QuickBooks layer.
+
+Loggers under 'qb' hand records to a bounded in-memory queue; a background
+listener thread does the console/file I/O. Request and job threads never
+wait on stdout, and when the queue is full records are dropped (and
+counted) instead of blocking.
+
+Payloads (qbXML requests/responses) go through payload(), which caps them
+at QB_LOG_PAYLOAD_MAX characters. Full request XML is only logged at DEBUG.
+
+Environment:
+    QB_LOG_LEVEL        DEBUG, INFO (default), WARNING, ...
+    QB_LOG_FILE         Also append to this file
+    QB_LOG_PAYLOAD_MAX  Max characters of a logged payload (default 2000)
+    QB_LOG_QUEUE_SIZE   Records buffered before dropping (default 10000)
+
+Usage:
+    from quickbooks_desktop.log import configure_logging, get_logger, payload
+
+    configure_logging()
+    logger = get_logger(__name__)
+    logger.info("Invoice %s created", ref_number)
+    logger.debug("Response: %s", payload(response))
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+
+ROOT_LOGGER = 'qb'
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(name)s [%(threadName)s] %(message)s'
+
+DEFAULT_PAYLOAD_MAX = int(os.getenv('QB_LOG_PAYLOAD_MAX', '2000'))
+
+
+class Payload:
+    """Lazily truncated log argument: only formatted if the record is emitted."""
+
+    __slots__ = ('text', 'limit')
+
+    def __init__(self, text, limit=None):
+        self.text = text
+        self.limit = DEFAULT_PAYLOAD_MAX if limit is None else limit
+
+    def __str__(self):
+        text = self.text if isinstance(self.text, str) else str(self.text)
+        if self.limit and len(text) > self.limit:
+            return f"{text[:self.limit]}... [{len(text) - self.limit} more chars]"
+        return text
+
+
+def payload(text, limit=None):
+    """
+    Wrap a payload for logging, capped at limit (default QB_LOG_PAYLOAD_MAX) chars.
+
+    logger.debug("XML: %s", payload(xml)) costs nothing when DEBUG is off.
+    """
+    return Payload(text, limit)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of raising."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+def get_logger(name):
+    """Logger under the 'qb' hierarchy (e.g. 'invoice_generator_qb' -> 'qb.invoice_generator_qb')."""
+    if name == ROOT_LOGGER or name.startswith(ROOT_LOGGER + '.'):
+        return logging.getLogger(name)
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def configure_logging(level=None, log_file=None, queue_size=None):
+    """
+    Route 'qb' loggers through the background queue (idempotent).
+
+    Args:
+        level: Log level name or number (default QB_LOG_LEVEL or INFO)
+        log_file: Extra file to append to (default QB_LOG_FILE)
+        queue_size: Records buffered before dropping (default QB_LOG_QUEUE_SIZE)
+
+    Returns:
+        The 'qb' logger
+    """
+    global _listener, _handler
+    root = logging.getLogger(ROOT_LOGGER)
+    level = level or os.getenv('QB_LOG_LEVEL', 'INFO')
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    with _lock:
+        if _listener is not None:
+            return root
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        targets = [logging.StreamHandler(sys.stdout)]
+        log_file = log_file or os.getenv('QB_LOG_FILE')
+        if log_file:
+            targets.append(logging.FileHandler(log_file, encoding='utf-8'))
+        for target in targets:
+            target.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=queue_size or int(os.getenv('QB_LOG_QUEUE_SIZE', '10000')))
+        _handler = DroppingQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, *targets, respect_handler_level=True)
+        _listener.start()
+
+        root.addHandler(_handler)
+        root.propagate = False
+        atexit.register(shutdown_logging)
+    return root
+
+
+def dropped_records():
+    """Records dropped because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger(ROOT_LOGGER).removeHandler(_handler)
+        _listener = None
+        _handler = None
@@ -0,0 +1,219 @@
+"""
+Stage timing metrics in Prometheus text format.
+
+Every timed stage already reports an 'end' progress event with
+duration_ms (parse, qb_open_connection, qb_begin_session, qb_request,
+build_xml, qb_cleanup, catalog_*, ...). Metrics subscribes to all progress
+events in the process and turns each end event into a span observation:
+
+- qb_stage_duration_seconds: histogram per stage and request type
+- qb_stage_errors_total: stages that ended with an error
+- qb_stage_payload_bytes: histogram of request/response/XML sizes
+- qb_stage_lines: histogram of invoice line counts (build_xml)
+- qb_stage_recent_duration_seconds: p50/p95/p99 over the last
+  window_seconds, for dashboards that want current latency without
+  computing rate() over the histogram
+
+Usage:
+    from quickbooks_desktop.metrics import get_metrics
+
+    metrics = get_metrics()    # Subscribes on first call
+    text = metrics.render()    # Serve as text/plain; version=0.0.4
+"""
+import bisect
+import os
+import threading
+import time
+from collections import deque
+
+from . import progress
+
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Upper bounds (bytes) of the payload histogram buckets
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Upper bounds of the line count histogram buckets
+LINE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+RECENT_QUANTILES = (0.5, 0.95, 0.99)
+
+# Event fields recorded as payload sizes, and their direction label
+_BYTE_FIELDS = {'bytes_sent': 'sent', 'bytes_received': 'received', 'bytes': 'built'}
+
+
+class Histogram:
+    """Cumulative Prometheus histogram (bucket counts, sum and count)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        """Prometheus exposition lines for this series."""
+        out = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _format_value(bound)
+            out.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+        out.append(f"{name}_sum{_format_labels(labels)} {_format_value(self.sum)}")
+        out.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return out
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def _quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Metrics:
+    """
+    Process-wide stage metrics built from progress events.
+
+    Thread-safe; observe() is cheap (a few dict lookups and list increments)
+    so it can run inline in emit() on the hot path.
+    """
+
+    def __init__(self, window_seconds=300, max_recent=2048):
+        """
+        Args:
+            window_seconds: Span of the rolling recent-duration quantiles
+            max_recent: Cap on recent observations kept per series
+        """
+        self.window_seconds = window_seconds
+        self.max_recent = max_recent
+        self._durations = {}
+        self._recent = {}
+        self._errors = {}
+        self._bytes = {}
+        self._lines = {}
+        self._lock = threading.Lock()
+
+    def observe(self, event):
+        """Record a progress event (only 'end' events with duration_ms are spans)."""
+        if event.get('status') != 'end' or 'duration_ms' not in event:
+            return
+        stage = event['stage']
+        seconds = event['duration_ms'] / 1000
+        labels = (('stage', stage), ('request', event.get('request') or ''))
+        now = event.get('time', time.time())
+
+        with self._lock:
+            histogram = self._durations.get(labels)
+            if histogram is None:
+                histogram = self._durations[labels] = Histogram(DURATION_BUCKETS)
+                self._recent[labels] = deque(maxlen=self.max_recent)
+            histogram.observe(seconds)
+            self._recent[labels].append((now, seconds))
+
+            if event.get('error'):
+                self._errors[labels] = self._errors.get(labels, 0) + 1
+
+            for field, direction in _BYTE_FIELDS.items():
+                size = event.get(field)
+                if isinstance(size, int):
+                    key = labels + (('direction', direction),)
+                    series = self._bytes.get(key)
+                    if series is None:
+                        series = self._bytes[key] = Histogram(BYTES_BUCKETS)
+                    series.observe(size)
+
+            lines = event.get('lines')
+            if isinstance(lines, int):
+                key = (('stage', stage),)
+                series = self._lines.get(key)
+                if series is None:
+                    series = self._lines[key] = Histogram(LINE_BUCKETS)
+                series.observe(lines)
+
+    def reset(self):
+        """Drop every series (e.g. between benchmark runs)."""
+        with self._lock:
+            self._durations.clear()
+            self._recent.clear()
+            self._errors.clear()
+            self._bytes.clear()
+            self._lines.clear()
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format (version 0.0.4)."""
+        cutoff = time.time() - self.window_seconds
+        out = []
+        with self._lock:
+            out.append("# HELP qb_stage_duration_seconds Time spent in each stage.")
+            out.append("# TYPE qb_stage_duration_seconds histogram")
+            for labels, histogram in sorted(self._durations.items()):
+                out.extend(histogram.lines('qb_stage_duration_seconds', labels))
+
+            out.append("# HELP qb_stage_errors_total Stages that ended with an error.")
+            out.append("# TYPE qb_stage_errors_total counter")
+            for labels, count in sorted(self._errors.items()):
+                out.append(f"qb_stage_errors_total{_format_labels(labels)} {count}")
+
+            out.append("# HELP qb_stage_payload_bytes Request, response and built XML sizes.")
+            out.append("# TYPE qb_stage_payload_bytes histogram")
+            for labels, histogram in sorted(self._bytes.items()):
+                out.extend(histogram.lines('qb_stage_payload_bytes', labels))
+
+            out.append("# HELP qb_stage_lines Invoice lines per stage run.")
+            out.append("# TYPE qb_stage_lines histogram")
+            for labels, histogram in sorted(self._lines.items()):
+                out.extend(histogram.lines('qb_stage_lines', labels))
+
+            out.append(f"# HELP qb_stage_recent_duration_seconds Stage time over the last "
+                       f"{self.window_seconds:g} seconds.")
+            out.append("# TYPE qb_stage_recent_duration_seconds summary")
+            for labels, recent in sorted(self._recent.items()):
+                while recent and recent[0][0] < cutoff:
+                    recent.popleft()
+                if not recent:
+                    continue
+                values = sorted(seconds for _, seconds in recent)
+                for q in RECENT_QUANTILES:
+                    out.append(f"qb_stage_recent_duration_seconds"
+                               f"{_format_labels(labels + (('quantile', str(q)),))} "
+                               f"{_format_value(_quantile(values, q))}")
+                out.append(f"qb_stage_recent_duration_seconds_sum{_format_labels(labels)} "
+                           f"{_format_value(sum(values))}")
+                out.append(f"qb_stage_recent_duration_seconds_count{_format_labels(labels)} {len(values)}")
+        return '\n'.join(out) + '\n'
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """
+    Return the process-wide Metrics, subscribed to progress events on first use.
+
+    The rolling window is QB_METRICS_WINDOW_SECONDS (default 300).
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics(window_seconds=float(os.getenv('QB_METRICS_WINDOW_SECONDS', '300')))
+            progress.subscribe(_metrics.observe)
+        return _metrics
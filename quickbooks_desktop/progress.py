@@ -0,0 +1,111 @@
+"""
+Structured progress events.
+
+Code anywhere in an operation (parser, catalog, XML builder, COM round
+trips) calls emit(); whoever started the operation installs a listener
+with listening(). The listener lives in a context variable, so concurrent
+operations each see only their own events, and QBExecutor carries the
+caller's context onto the QuickBooks worker thread. Process-wide
+observers added with subscribe() (e.g. quickbooks_desktop.metrics) see
+every event, whoever started the operation.
+
+Usage:
+    from quickbooks_desktop.progress import emit, listening, stage
+    
+    with listening(lambda event: print(event)):
+        with stage('parse') as info:
+            emit('parse', 'progress', rows=5000)
+            info['line_items'] = 61
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+_listener = contextvars.ContextVar('qb_progress_listener', default=None)
+
+# Process-wide observers (replaced, never mutated, so emit() needs no lock)
+_observers = ()
+_observers_lock = threading.Lock()
+
+
+def emit(stage, status, **data):
+    """
+    Report progress to the current listener (no-op when nobody listens).
+    
+    Args:
+        stage: What is running, e.g. 'parse', 'catalog', 'qb_request'
+        status: 'start', 'progress' or 'end'
+        **data: JSON-serializable details (rows, bytes, duration_ms, ...)
+    """
+    listener = _listener.get()
+    observers = _observers
+    if listener is None and not observers:
+        return
+    event = {'stage': stage, 'status': status, 'time': time.time()}
+    event.update(data)
+    for callback in observers:
+        try:
+            callback(dict(event))
+        except Exception:
+            pass  # Progress reporting must never break the operation
+    if listener is not None:
+        try:
+            listener(event)
+        except Exception:
+            pass
+
+
+def active():
+    """True if anyone is listening (skip building expensive event data otherwise)."""
+    return _listener.get() is not None or bool(_observers)
+
+
+def subscribe(callback):
+    """Send every event in the process to callback(event), in addition to the context listener."""
+    global _observers
+    with _observers_lock:
+        if callback not in _observers:
+            _observers = _observers + (callback,)
+
+
+def unsubscribe(callback):
+    """Stop sending events to a callback added with subscribe()."""
+    global _observers
+    with _observers_lock:
+        _observers = tuple(c for c in _observers if c is not callback)
+
+
+@contextmanager
+def listening(callback):
+    """Send events emitted in this context (and its QB executor calls) to callback(event)."""
+    token = _listener.set(callback)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+
+@contextmanager
+def stage(name, **data):
+    """
+    Emit start/end events around a block.
+    
+    Yields a dict; anything the block puts in it is added to the end event,
+    along with duration_ms (and error if the block raised). The end event
+    repeats the start event's data so it is complete on its own.
+    """
+    emit(name, 'start', **data)
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    except Exception as e:
+        result['error'] = str(e)
+        raise
+    finally:
+        end = dict(data)
+        end.update(result)
+        end['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        emit(name, 'end', **end)
@@ -0,0 +1,215 @@
+"""
+Persistent QuickBooks executor.
+
+Opening a QuickBooks connection (CoInitialize, Dispatch, OpenConnection,
+BeginSession) costs seconds, so instead of one SessionManager per call a
+single worker thread owns the COM apartment and one open session, and
+every qbXML operation is queued to it. Callers on any thread (e.g. a
+multi-threaded Flask server) submit functions that receive the open
+SessionManager.
+
+Usage:
+    from quickbooks_desktop.qb_executor import run_in_session
+    
+    def query(qb):
+        return qb.send_request(xml)
+    
+    response = run_in_session(query)
+"""
+import atexit
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from .progress import stage
+from .session_manager import SessionManager, QBConnectionError, load_pythoncom
+
+
+# Close the QB session after this many idle seconds (it is reopened on demand)
+DEFAULT_IDLE_TIMEOUT = float(os.getenv('QB_SESSION_IDLE_TIMEOUT', '300'))
+
+_STOP = object()
+_RESET = object()
+
+
+def _is_connection_error(exc):
+    """True if exc (or anything in its cause/context chain) is a QBConnectionError."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, QBConnectionError):
+            return True
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class QBExecutor:
+    """
+    Single worker thread that owns one long-lived QuickBooks session.
+    
+    Jobs run one at a time, in submission order, on the worker thread.
+    The session is opened lazily on the first job, reused by later jobs,
+    closed after idle_timeout seconds without work, and reopened after any
+    connection-level failure (QBConnectionError).
+    """
+    
+    def __init__(self, application_name="UniversalCellularInvoiceAutomation",
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, session_factory=SessionManager):
+        """
+        Args:
+            application_name: Name that appears in QB authorization dialog
+            idle_timeout: Seconds without work before the session is closed
+                (None keeps it open until shutdown)
+            session_factory: Callable returning a SessionManager-like object
+        """
+        self.application_name = application_name
+        self.idle_timeout = idle_timeout
+        self.session_factory = session_factory
+        self.sessions_opened = 0
+        self._qb = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    @property
+    def session_open(self):
+        """True if the worker currently holds an open QB session."""
+        qb = self._qb
+        return qb is not None and qb.session_begun
+    
+    def start(self):
+        """Start the worker thread (called automatically by submit)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="qb-executor", daemon=True
+                )
+                self._thread.start()
+    
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Queue fn(qb, *args, **kwargs) to run on the worker thread.
+        
+        fn runs in a copy of the caller's context (contextvars), so e.g.
+        progress listeners follow the work onto the worker thread.
+        
+        Returns:
+            concurrent.futures.Future with fn's result or exception
+        """
+        self.start()
+        future = Future()
+        self._queue.put((future, contextvars.copy_context(), fn, args, kwargs))
+        return future
+    
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """Run fn(qb, *args, **kwargs) on the worker thread and wait for the result."""
+        if threading.current_thread() is self._thread:
+            # Already on the worker (nested helper call) - run inline
+            return fn(self._ensure_session(), *args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout)
+    
+    def reset_session(self):
+        """Close the session after queued jobs finish; the next job opens a fresh one."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_RESET)
+    
+    def shutdown(self, wait=True):
+        """Stop the worker after queued jobs finish and close the session."""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        if wait:
+            thread.join()
+    
+    # -------------------------------------------------------------------------
+    # Worker thread
+    # -------------------------------------------------------------------------
+    
+    def _ensure_session(self):
+        if self._qb is None:
+            self._qb = self.session_factory(application_name=self.application_name)
+        if not self._qb.session_begun:
+            with stage('qb_session'):
+                self._qb.open_connection()
+                self._qb.begin_session()
+            self.sessions_opened += 1
+        return self._qb
+    
+    def _call(self, fn, args, kwargs):
+        return fn(self._ensure_session(), *args, **kwargs)
+    
+    def _close_session(self):
+        qb, self._qb = self._qb, None
+        if qb is None:
+            return
+        try:
+            qb.close_connection()
+        except Exception:
+            pass  # Ignore errors on cleanup
+        qb.qbXMLRP = None
+    
+    def _run(self):
+        pythoncom = load_pythoncom()
+        if pythoncom is not None:
+            try:
+                pythoncom.CoInitialize()
+            except Exception:
+                pass  # Already initialized on this thread
+        
+        try:
+            while True:
+                try:
+                    job = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    self._close_session()
+                    continue
+                
+                if job is _STOP:
+                    break
+                if job is _RESET:
+                    self._close_session()
+                    continue
+                
+                future, context, fn, args, kwargs = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                
+                try:
+                    result = context.run(self._call, fn, args, kwargs)
+                except BaseException as e:
+                    if _is_connection_error(e):
+                        self._close_session()
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            self._close_session()
+            if pythoncom is not None:
+                try:
+                    pythoncom.CoUninitialize()
+                except Exception:
+                    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> QBExecutor:
+    """Return the process-wide QBExecutor, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = QBExecutor()
+            atexit.register(_executor.shutdown)
+        return _executor
+
+
+def run_in_session(fn, *args, **kwargs):
+    """Run fn(qb, *args, **kwargs) on the shared QuickBooks session and return its result."""
+    return get_executor().call(fn, *args, **kwargs)
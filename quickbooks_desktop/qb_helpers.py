@@ -2,39 +2,52 @@
 QuickBooks Desktop helper functions.
 High-level operations built on top of SessionManager.
 """
-import re
-from .session_manager import SessionManager
+from . import qbxml_templates as templates
+from .catalog import get_catalog
+from .invoice_mirror import format_sync_time, get_invoice_mirror
+from .progress import stage
+from .qb_executor import get_executor, run_in_session
+from .qbxml_parser import iter_records, parse_single_response
+
+
+# Invoices per page when iterating (one QuickBooks round trip per page)
+INVOICE_PAGE_SIZE = 100
+
+# "The name is already in use" - the cache was stale, the entity exists
+DUPLICATE_NAME_STATUS = 3100
+
+# Longest Name QuickBooks accepts per list
+MAX_NAME_LENGTH = {'customer': 41, 'item': 31}
 
 
 def test_connection():
     """
-    Test basic QB connection (open, begin session, close).
+    Test the QB connection (open + begin session, or reuse the open one).
     
     Returns:
         dict with success, message, and details
     """
-    qb = SessionManager()
+    executor = get_executor()
     steps = []
     
     try:
-        # Step 1: Open connection
-        qb.open_connection()
-        steps.append("✓ Connection opened")
+        reused = executor.session_open
         
-        # Step 2: Begin session
-        qb.begin_session()
-        steps.append("✓ Session started")
+        # Runs on the shared session, opening it (connection + session) if needed
+        run_in_session(lambda qb: None)
         
-        # Step 3: Close
-        qb.close_qb()
-        steps.append("✓ Connection closed")
+        if reused:
+            steps.append("✓ Reusing open QuickBooks session")
+        else:
+            steps.append("✓ Connection opened")
+            steps.append("✓ Session started")
         
         return {
             'success': True,
             'message': 'QuickBooks connection successful!',
             'steps': steps
         }
-        
+    
     except Exception as e:
         steps.append(f"✗ Error: {str(e)}")
         return {
@@ -42,9 +55,6 @@ def test_connection():
             'message': str(e),
             'steps': steps
         }
-    finally:
-        if qb.connection_open:
-            qb.close_qb()
 
 
 def query_customers(max_returned=10):
@@ -53,30 +63,17 @@ def query_customers(max_returned=10):
     
     Args:
         max_returned: Maximum number of customers to return
-        
+    
     Returns:
         dict with success, customers list, and raw response
     """
-    qb = SessionManager()
+    xml = templates.customer_query(max_returned=max_returned)
     
     try:
-        qb.open_connection()
-        qb.begin_session()
-        
-        xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <CustomerQueryRq>
-      <MaxReturned>{max_returned}</MaxReturned>
-    </CustomerQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-        
-        response = qb.send_request(xml)
+        response = run_in_session(lambda qb: qb.send_request(xml))
         
         # Parse customer names from response
-        customers = re.findall(r'<FullName>([^<]+)</FullName>', response)
+        customers = [record['FullName'] for record in iter_records(response) if 'FullName' in record]
         
         return {
             'success': True,
@@ -84,7 +81,7 @@ def query_customers(max_returned=10):
             'customers': customers,
             'raw_response': response[:2000] if len(response) > 2000 else response
         }
-        
+    
     except Exception as e:
         return {
             'success': False,
@@ -92,63 +89,123 @@ def query_customers(max_returned=10):
             'customers': [],
             'raw_response': ''
         }
+
+
+def _send(qb, xml):
+    return qb.send_request(xml)
+
+
+def _invoice_iterator_xml(iterator, iterator_id=None, page_size=INVOICE_PAGE_SIZE):
+    """Build an InvoiceQueryRq for one step of a qbXML iterator (Start/Continue/Stop)."""
+    if iterator == 'Stop':
+        return templates.invoice_query(iterator=iterator, iterator_id=iterator_id)
+    return templates.invoice_query(max_returned=page_size, iterator=iterator, iterator_id=iterator_id)
+
+
+def _invoice_summary(record):
+    """txn_id / ref_number / date of an InvoiceRet record."""
+    return {
+        'txn_id': record.get('TxnID', 'N/A'),
+        'ref_number': record.get('RefNumber', 'N/A'),
+        'date': record.get('TxnDate', 'N/A')
+    }
+
+
+def _iter_invoice_responses(page_size=INVOICE_PAGE_SIZE, max_returned=None):
+    """
+    Walk an InvoiceQuery iterator, yielding (invoices, raw_response) per page.
+    
+    Each page is a separate call on the shared QuickBooks session, so other
+    work (e.g. uploads) can run between pages. If the caller stops early the
+    iterator is closed with iterator="Stop".
+    """
+    iterator_id = None
+    remaining = 0
+    returned = 0
+    
+    try:
+        while max_returned is None or returned < max_returned:
+            size = page_size if max_returned is None else min(page_size, max_returned - returned)
+            iterator = 'Continue' if iterator_id else 'Start'
+            response = run_in_session(_send, _invoice_iterator_xml(iterator, iterator_id, size))
+            
+            rs = parse_single_response(response)
+            if rs.status_code == 1:  # No matching invoices
+                break
+            rs.raise_for_status()
+            
+            iterator_id = rs.iterator_id
+            remaining = rs.iterator_remaining or 0
+            
+            invoices = [_invoice_summary(record) for record in rs.records]
+            returned += len(invoices)
+            yield invoices, response
+            
+            if not remaining or not iterator_id:
+                break
     finally:
-        if qb.connection_open:
-            qb.close_qb()
+        if iterator_id and remaining:
+            try:
+                run_in_session(_send, _invoice_iterator_xml('Stop', iterator_id))
+            except Exception:
+                pass  # QuickBooks drops the iterator with the session anyway
+
+
+def query_invoices_pages(page_size=INVOICE_PAGE_SIZE, max_returned=None):
+    """
+    Stream invoices from QuickBooks in fixed-size pages (qbXML iterator).
+    
+    Only one page is held in memory at a time, however many invoices the
+    company file contains.
+    
+    Args:
+        page_size: Invoices per QuickBooks request
+        max_returned: Stop after this many invoices (None = all)
+    
+    Yields:
+        list of invoice dicts (txn_id, ref_number, date) per page
+    
+    Raises:
+        Exception: If QuickBooks rejects a page request
+    """
+    for invoices, _ in _iter_invoice_responses(page_size, max_returned):
+        yield invoices
+
+
+def query_invoices_iter(page_size=INVOICE_PAGE_SIZE, max_returned=None):
+    """Yield invoice dicts one at a time (see query_invoices_pages)."""
+    for page in query_invoices_pages(page_size, max_returned):
+        yield from page
 
 
 def query_invoices(max_returned=None):
     """
     Query invoices from QuickBooks.
     
+    Fetches page by page (see query_invoices_pages) but returns them as
+    one list; prefer query_invoices_iter for large company files.
+    
     Args:
         max_returned: Maximum number of invoices to return. If None, returns all invoices.
-        
+    
     Returns:
-        dict with success, invoices list, and raw response
+        dict with success, invoices list, and raw response (first page)
     """
-    qb = SessionManager()
-    
     try:
-        qb.open_connection()
-        qb.begin_session()
-        
-        # Conditionally include MaxReturned - omit it to get all invoices
-        max_returned_tag = f"      <MaxReturned>{max_returned}</MaxReturned>\n" if max_returned is not None else ""
-        
-        xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <InvoiceQueryRq>
-{max_returned_tag}    </InvoiceQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-        
-        response = qb.send_request(xml)
-        
-        # Parse invoice details from response
         invoices = []
-        
-        # Find all TxnID and RefNumber pairs
-        txn_ids = re.findall(r'<TxnID>([^<]+)</TxnID>', response)
-        ref_numbers = re.findall(r'<RefNumber>([^<]+)</RefNumber>', response)
-        txn_dates = re.findall(r'<TxnDate>([^<]+)</TxnDate>', response)
-        
-        for i in range(min(len(txn_ids), len(ref_numbers))):
-            invoices.append({
-                'txn_id': txn_ids[i] if i < len(txn_ids) else 'N/A',
-                'ref_number': ref_numbers[i] if i < len(ref_numbers) else 'N/A',
-                'date': txn_dates[i] if i < len(txn_dates) else 'N/A'
-            })
+        raw_response = ''
+        for page, response in _iter_invoice_responses(max_returned=max_returned):
+            if not raw_response:
+                raw_response = response[:2000] if len(response) > 2000 else response
+            invoices.extend(page)
         
         return {
             'success': True,
             'message': f'Found {len(invoices)} invoice(s)',
             'invoices': invoices,
-            'raw_response': response[:2000] if len(response) > 2000 else response
+            'raw_response': raw_response
         }
-        
+    
     except Exception as e:
         return {
             'success': False,
@@ -156,46 +213,63 @@ def query_invoices(max_returned=None):
             'invoices': [],
             'raw_response': ''
         }
-    finally:
-        if qb.connection_open:
-            qb.close_qb()
+
+
+def sync_invoice_mirror(full=False):
+    """
+    Bring the local invoice mirror up to date.
+    
+    Runs a delta sync (invoices modified since the last one) if the mirror
+    is older than its TTL, and a full resync if the last full one is older
+    than its full TTL or full is set.
+    
+    Args:
+        full: Force a full resync (also drops deleted invoices)
+    
+    Returns:
+        dict with success, message, sync (sync info, or None if the mirror
+        was fresh) and state (watermark, last sync times, invoice count)
+    """
+    mirror = get_invoice_mirror()
+    
+    # One executor job per page (not per sync), so uploads are not queued
+    # behind a long full sync; SQLite work stays on this thread
+    def send(xml):
+        return run_in_session(_send, xml)
+    
+    try:
+        if full:
+            sync = mirror.sync(send, full=True)
+        else:
+            sync = mirror.ensure_fresh(send)
+    except Exception as e:
+        return {'success': False, 'message': str(e), 'sync': None, 'state': mirror.state()}
+    
+    state = mirror.state()
+    if sync is None:
+        message = f"Invoice mirror is current (synced {format_sync_time(state['last_sync'])})"
+    else:
+        message = (f"Invoice mirror {sync['mode']} sync: {sync['fetched']} fetched, "
+                   f"{sync['removed']} removed in {sync['duration_ms']:.0f} ms")
+    return {'success': True, 'message': message, 'sync': sync, 'state': state}
 
 
 def check_entity_exists(qb, entity_type, name):
     """
     Check if a customer or item exists in QuickBooks.
     
+    Served from the local catalog cache, which is refreshed from QuickBooks
+    only when its TTL has expired.
+    
     Args:
         qb: Active SessionManager instance
         entity_type: 'customer' or 'item'
         name: Entity name to check
-        
+    
     Returns:
         bool indicating if entity exists
     """
-    if entity_type == "customer":
-        xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <CustomerQueryRq>
-      <FullName>{name}</FullName>
-    </CustomerQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-    else:  # item
-        xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <ItemQueryRq>
-      <FullName>{name}</FullName>
-    </ItemQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-    
-    response = qb.send_request(xml)
-    return '<FullName>' in response
+    return get_catalog().exists(qb, entity_type, name)
 
 
 def create_customer(qb, name):
@@ -205,34 +279,25 @@ def create_customer(qb, name):
     Args:
         qb: Active SessionManager instance
         name: Customer name
-        
+    
     Returns:
         dict with success and message
     """
     if check_entity_exists(qb, "customer", name):
         return {'success': True, 'message': f"Customer '{name}' already exists", 'created': False}
     
-    xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <CustomerAddRq>
-      <CustomerAdd>
-        <Name>{name}</Name>
-        <CompanyName>{name}</CompanyName>
-      </CustomerAdd>
-    </CustomerAddRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-    
-    response = qb.send_request(xml)
-    
-    if 'statusCode="0"' in response:
+    xml = templates.customer_add(name)
+    
+    rs = parse_single_response(qb.send_request(xml))
+    
+    if rs.status_code == 0:
+        get_catalog().add("customer", name)
         return {'success': True, 'message': f"Created customer: {name}", 'created': True}
+    elif rs.status_code == DUPLICATE_NAME_STATUS:
+        get_catalog().add("customer", name)
+        return {'success': True, 'message': f"Customer '{name}' already exists", 'created': False}
     else:
-        # Extract error message
-        error_match = re.search(r'statusMessage="([^"]+)"', response)
-        error_msg = error_match.group(1) if error_match else "Unknown error"
+        error_msg = rs.status_message or "Unknown error"
         return {'success': False, 'message': f"Failed to create customer: {error_msg}", 'created': False}
 
 
@@ -245,7 +310,7 @@ def create_service_item(qb, name, description="", price=100.00):
         name: Item name
         description: Item description
         price: Default price
-        
+    
     Returns:
         dict with success and message
     """
@@ -253,36 +318,125 @@ def create_service_item(qb, name, description="", price=100.00):
         return {'success': True, 'message': f"Item '{name}' already exists", 'created': False}
     
     # Note: Account name might need to be adjusted based on actual QB chart of accounts
-    xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <ItemServiceAddRq>
-      <ItemServiceAdd>
-        <Name>{name}</Name>
-        <SalesOrPurchase>
-          <Desc>{description or name}</Desc>
-          <Price>{price:.2f}</Price>
-          <AccountRef>
-            <FullName>Sales</FullName>
-          </AccountRef>
-        </SalesOrPurchase>
-      </ItemServiceAdd>
-    </ItemServiceAddRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-    
-    response = qb.send_request(xml)
-    
-    if 'statusCode="0"' in response:
+    xml = templates.item_service_add(name, description, price, account="Sales")
+    
+    rs = parse_single_response(qb.send_request(xml))
+    
+    if rs.status_code == 0:
+        get_catalog().add("item", name)
         return {'success': True, 'message': f"Created item: {name}", 'created': True}
+    elif rs.status_code == DUPLICATE_NAME_STATUS:
+        get_catalog().add("item", name)
+        return {'success': True, 'message': f"Item '{name}' already exists", 'created': False}
     else:
-        # Extract error message
-        error_match = re.search(r'statusMessage="([^"]+)"', response)
-        error_msg = error_match.group(1) if error_match else "Unknown error"
+        error_msg = rs.status_message or "Unknown error"
         return {'success': False, 'message': f"Failed to create item: {error_msg}", 'created': False}
 
 
+def _provision(qb, entity_type, specs, add_rq):
+    """
+    Create the entities in specs that do not exist yet, in bulk.
+    
+    One lookup query for every name (see CatalogCache.lookup), then one
+    multi-request envelope with an add per missing name (continueOnError,
+    so one bad name does not stop the rest).
+    
+    Args:
+        qb: Active SessionManager instance
+        entity_type: 'customer' or 'item'
+        specs: dict of name -> add_rq keyword arguments
+        add_rq: Template function building the *AddRq element
+    
+    Returns:
+        dict with success, message, and created/existed name lists and
+        failed (name -> message)
+    """
+    catalog = get_catalog()
+    created, existed, failed = [], [], {}
+    missing = []
+    
+    for name, record in catalog.lookup(qb, entity_type, list(specs)).items():
+        if record is not None:
+            existed.append(name)
+        elif len(name) > MAX_NAME_LENGTH[entity_type]:
+            failed[name] = f"Name is longer than {MAX_NAME_LENGTH[entity_type]} characters"
+        else:
+            missing.append(name)
+    
+    if missing:
+        with stage('provision', entity=entity_type, names=len(missing)) as info:
+            results = qb.send_batch([add_rq(name, **specs[name]) for name in missing])
+            for name, result in zip(missing, results):
+                if result.ok or result.status_code == DUPLICATE_NAME_STATUS:
+                    catalog.add(entity_type, name)
+                    (created if result.ok else existed).append(name)
+                else:
+                    failed[name] = result.status_message or "Unknown error"
+            info['created'] = len(created)
+            info['failed'] = len(failed)
+    
+    return {
+        'success': not failed,
+        'message': f"{len(created)} created, {len(existed)} already existed, {len(failed)} failed",
+        'created': created,
+        'existed': existed,
+        'failed': failed
+    }
+
+
+def ensure_customers(qb, names):
+    """
+    Make sure every customer in names exists, creating the missing ones in one batch.
+    
+    Args:
+        qb: Active SessionManager instance
+        names: Customer names
+    
+    Returns:
+        dict with success, message, created, existed and failed (see _provision)
+    """
+    return _provision(qb, 'customer', {name: {} for name in names}, templates.customer_add_rq)
+
+
+def ensure_service_items(qb, items, account="Sales"):
+    """
+    Make sure every service item exists, creating the missing ones in one batch.
+    
+    Args:
+        qb: Active SessionManager instance
+        items: Iterable of (name, description, price); the first entry wins
+            for repeated names
+        account: Income account for new items
+    
+    Returns:
+        dict with success, message, created, existed and failed (see _provision)
+    """
+    specs = {}
+    for name, description, price in items:
+        specs.setdefault(name, {'description': description, 'price': price, 'account': account})
+    return _provision(qb, 'item', specs, templates.item_service_add_rq)
+
+
+def provision_report_items(qb, parsed_data, account="Sales"):
+    """
+    Create a service item for every part number in a parsed receiving report.
+    
+    Args:
+        qb: Active SessionManager instance
+        parsed_data: Output from excel_parser.parse_receiving_report()
+        account: Income account for new items
+    
+    Returns:
+        dict with success, message, created, existed and failed (see _provision)
+    """
+    return ensure_service_items(
+        qb,
+        ((str(item['part_number']), str(item['description'] or ''), item['unit_cost'] or 0.0)
+         for item in parsed_data['line_items'] if item['part_number']),
+        account=account
+    )
+
+
 def setup_sample_data():
     """
     Setup sample customers and items for testing.
@@ -291,15 +445,10 @@ def setup_sample_data():
     Returns:
         dict with success, results for each entity, and summary
     """
-    qb = SessionManager()
     results = []
     
-    try:
-        qb.open_connection()
-        results.append("✓ Connected to QuickBooks")
-        
-        qb.begin_session()
-        results.append("✓ Session started\n")
+    def _setup(qb):
+        results.append("✓ QuickBooks session ready\n")
         
         # Create customer
         results.append("Creating customer...")
@@ -318,31 +467,26 @@ def setup_sample_data():
             ("TEST-DEVICE", "Test Device for Automation", 100.00),
         ]
         
-        items_created = 0
-        items_existed = 0
-        items_failed = 0
-        
-        for item_name, desc, price in sample_items:
-            item_result = create_service_item(qb, item_name, desc, price)
-            if item_result['success']:
-                if item_result['created']:
-                    items_created += 1
-                    results.append(f"  ✓ Created: {item_name}")
-                else:
-                    items_existed += 1
-                    results.append(f"  ○ Already exists: {item_name}")
-            else:
-                items_failed += 1
-                results.append(f"  ✗ Failed: {item_name} - {item_result['message']}")
+        # One lookup and one batched add for all items (not 2 round trips each)
+        item_result = ensure_service_items(qb, sample_items)
+        for item_name in item_result['created']:
+            results.append(f"  ✓ Created: {item_name}")
+        for item_name in item_result['existed']:
+            results.append(f"  ○ Already exists: {item_name}")
+        for item_name, message in item_result['failed'].items():
+            results.append(f"  ✗ Failed: {item_name} - {message}")
         
-        results.append(f"\nSummary: {items_created} created, {items_existed} already existed, {items_failed} failed")
+        results.append(f"\nSummary: {item_result['message']}")
         
         return {
-            'success': items_failed == 0,
+            'success': item_result['success'],
             'message': 'Sample data setup complete',
             'results': results
         }
-        
+    
+    try:
+        return run_in_session(_setup)
+    
     except Exception as e:
         results.append(f"\n✗ Error: {str(e)}")
         return {
@@ -350,10 +494,6 @@ def setup_sample_data():
             'message': str(e),
             'results': results
         }
-    finally:
-        if qb.connection_open:
-            qb.close_qb()
-            results.append("\n✓ Connection closed")
 
 
 def create_test_invoice():
@@ -364,58 +504,35 @@ def create_test_invoice():
     Returns:
         dict with success, invoice details, and raw response
     """
-    qb = SessionManager()
     steps = []
     
-    try:
-        qb.open_connection()
-        steps.append("✓ Connected")
-        
-        qb.begin_session()
-        steps.append("✓ Session started")
+    def _create(qb):
+        steps.append("✓ QuickBooks session ready")
         
         # Find first customer
         steps.append("\nFinding customer...")
-        cust_xml = """<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <CustomerQueryRq><MaxReturned>1</MaxReturned></CustomerQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-        cust_response = qb.send_request(cust_xml)
-        cust_match = re.search(r'<FullName>([^<]+)</FullName>', cust_response)
+        customer_name = get_catalog().first_customer(qb)
         
-        if not cust_match:
+        if not customer_name:
             return {
                 'success': False,
                 'message': 'No customers found in QuickBooks. Run "Setup Sample Data" first.',
                 'steps': steps
             }
         
-        customer_name = cust_match.group(1)
         steps.append(f"  Using customer: {customer_name}")
         
         # Find first item
         steps.append("\nFinding item...")
-        item_xml = """<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <ItemQueryRq><MaxReturned>5</MaxReturned></ItemQueryRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
-        item_response = qb.send_request(item_xml)
-        item_matches = re.findall(r'<FullName>([^<]+)</FullName>', item_response)
+        item_name = get_catalog().first_item(qb)
         
-        if not item_matches:
+        if not item_name:
             return {
                 'success': False,
                 'message': 'No items found in QuickBooks. Run "Setup Sample Data" first.',
                 'steps': steps
             }
         
-        item_name = item_matches[0]
         steps.append(f"  Using item: {item_name}")
         
         # Create invoice
@@ -423,39 +540,19 @@ def create_test_invoice():
         today = date.today().isoformat()
         
         steps.append(f"\nCreating invoice...")
-        invoice_xml = f"""<?xml version="1.0" encoding="utf-8"?>
-<?qbxml version="13.0"?>
-<QBXML>
-  <QBXMLMsgsRq onError="stopOnError">
-    <InvoiceAddRq>
-      <InvoiceAdd>
-        <CustomerRef>
-          <FullName>{customer_name}</FullName>
-        </CustomerRef>
-        <TxnDate>{today}</TxnDate>
-        <Memo>AUTOMATION-TEST</Memo>
-        <InvoiceLineAdd>
-          <ItemRef>
-            <FullName>{item_name}</FullName>
-          </ItemRef>
-          <Desc>Test line item from automation</Desc>
-          <Quantity>1</Quantity>
-          <Rate>10.00</Rate>
-        </InvoiceLineAdd>
-      </InvoiceAdd>
-    </InvoiceAddRq>
-  </QBXMLMsgsRq>
-</QBXML>"""
+        invoice_xml = templates.invoice_add(
+            customer_name, today, 'AUTOMATION-TEST',
+            [(item_name, 'Test line item from automation', 1, 10.0)]
+        )
         
         response = qb.send_request(invoice_xml)
+        rs = parse_single_response(response)
         
-        if 'statusCode="0"' in response:
+        if rs.status_code == 0:
             # Extract invoice details
-            txn_match = re.search(r'<TxnID>([^<]+)</TxnID>', response)
-            ref_match = re.search(r'<RefNumber>([^<]+)</RefNumber>', response)
-            
-            txn_id = txn_match.group(1) if txn_match else "Unknown"
-            ref_number = ref_match.group(1) if ref_match else "Unknown"
+            invoice = rs.records[0] if rs.records else {}
+            txn_id = invoice.get('TxnID', "Unknown")
+            ref_number = invoice.get('RefNumber', "Unknown")
             
             steps.append(f"  ✓ Invoice #{ref_number} created!")
             steps.append(f"  TxnID: {txn_id}")
@@ -473,9 +570,7 @@ def create_test_invoice():
                 'steps': steps
             }
         else:
-            # Extract error
-            error_match = re.search(r'statusMessage="([^"]+)"', response)
-            error_msg = error_match.group(1) if error_match else "Unknown error"
+            error_msg = rs.status_message or "Unknown error"
             steps.append(f"  ✗ Error: {error_msg}")
             
             return {
@@ -484,7 +579,10 @@ def create_test_invoice():
                 'steps': steps,
                 'raw_response': response[:1000]
             }
-        
+    
+    try:
+        return run_in_session(_create)
+    
     except Exception as e:
         steps.append(f"\n✗ Error: {str(e)}")
         return {
@@ -492,7 +590,3 @@ def create_test_invoice():
             'message': str(e),
             'steps': steps
         }
-    finally:
-        if qb.connection_open:
-            qb.close_qb()
-            steps.append("\n✓ Connection closed")
@@ -0,0 +1,213 @@
+"""
+Single-pass qbXML response parser.
+
+Walks a response once with an incremental (pull) XML parser and turns
+every *Ret element into a typed record as soon as it is complete; the
+element is then discarded, so the parsed tree never holds more than one
+record at a time. Only direct children of a *Rs element are records, so
+nested elements (e.g. the TxnID of a LinkedTxn or the TxnLineID of a
+line) never get mixed up with the record's own fields.
+
+Usage:
+    from quickbooks_desktop.qbxml_parser import parse_response, iter_records
+    
+    status = parse_response(response)[0]
+    status.raise_for_status()
+    for invoice in status.records:
+        print(invoice['RefNumber'], invoice['TxnDate'])
+"""
+import xml.etree.ElementTree as ET
+
+
+# Leaf elements converted to float (money, rates, quantities)
+_FLOAT_SUFFIXES = ('Amount', 'Balance', 'Total', 'Subtotal', 'Price', 'Cost', 'Rate', 'Quantity', 'Percentage', 'Percent')
+# Leaf elements converted to int
+_INT_FIELDS = frozenset({'Sublevel', 'LineNumber'})
+# Aggregates that may repeat inside a record; always returned as lists
+_REPEATED_SUFFIXES = ('LineRet', 'LineGroupRet', 'LinkedTxn', 'DataExtRet')
+
+_FEED_CHUNK = 64 * 1024
+
+
+class QBXMLError(Exception):
+    """QuickBooks returned an error status for a request."""
+    
+    def __init__(self, status_code, status_message, request_type=None):
+        self.status_code = status_code
+        self.status_message = status_message
+        self.request_type = request_type
+        super().__init__(f"QuickBooks error ({status_code}): {status_message}")
+
+
+class QBRecord(dict):
+    """One *Ret element as a dict of typed fields; .type is the element name (e.g. 'InvoiceRet')."""
+    
+    __slots__ = ('type',)
+    
+    def __init__(self, record_type, fields=()):
+        super().__init__(fields)
+        self.type = record_type
+
+
+class QBResponse:
+    """
+    Status (and, from parse_response, records) of one *Rs element.
+    
+    Attributes:
+        request_type: Element name, e.g. 'InvoiceQueryRs'
+        request_id: requestID attribute, or None
+        status_code: statusCode as int (0 = OK, 1 = no matches)
+        status_severity: 'Info', 'Warn', 'Error' (None if not given)
+        status_message: statusMessage text
+        iterator_id: iteratorID for iterator queries, else None
+        iterator_remaining: iteratorRemainingCount as int, else None
+        records: list of QBRecord (empty for iter_records)
+    """
+    
+    __slots__ = ('request_type', 'request_id', 'status_code', 'status_severity', 'status_message',
+                 'iterator_id', 'iterator_remaining', 'records')
+    
+    def __init__(self, request_type, attrib):
+        code = attrib.get('statusCode', '0')
+        remaining = attrib.get('iteratorRemainingCount')
+        self.request_type = request_type
+        self.request_id = attrib.get('requestID')
+        self.status_code = int(code) if code.lstrip('-').isdigit() else code
+        self.status_severity = attrib.get('statusSeverity')
+        self.status_message = attrib.get('statusMessage', '')
+        self.iterator_id = attrib.get('iteratorID')
+        self.iterator_remaining = int(remaining) if remaining and remaining.isdigit() else None
+        self.records = []
+    
+    @property
+    def ok(self):
+        """True unless QuickBooks reported an error (1 = no matches counts as ok)."""
+        if self.status_severity:
+            return self.status_severity != 'Error'
+        return self.status_code in (0, 1)
+    
+    def raise_for_status(self):
+        """Raise QBXMLError if this response is an error."""
+        if not self.ok:
+            raise QBXMLError(self.status_code, self.status_message or 'Unknown error', self.request_type)
+    
+    def __repr__(self):
+        return (f"QBResponse({self.request_type!r}, status_code={self.status_code!r}, "
+                f"records={len(self.records)})")
+
+
+def _convert(tag, text):
+    if tag.startswith('Is') and text in ('true', 'false'):
+        return text == 'true'
+    try:
+        if tag in _INT_FIELDS:
+            return int(text)
+        if tag.endswith(_FLOAT_SUFFIXES):
+            return float(text)
+    except ValueError:
+        pass
+    return text
+
+
+def _to_fields(elem):
+    """Convert an element's children to a dict (nested aggregates become dicts/lists)."""
+    fields = {}
+    for child in elem:
+        if len(child):
+            value = _to_fields(child)
+        else:
+            value = _convert(child.tag, (child.text or '').strip())
+        
+        if child.tag.endswith(_REPEATED_SUFFIXES):
+            fields.setdefault(child.tag, []).append(value)
+        elif child.tag in fields:
+            # Unexpected repeat - keep every value rather than overwrite
+            existing = fields[child.tag]
+            fields[child.tag] = (existing if isinstance(existing, list) else [existing]) + [value]
+        else:
+            fields[child.tag] = value
+    return fields
+
+
+def _events(response):
+    """Yield ('status', QBResponse) at each *Rs start and ('record', QBRecord) per *Ret."""
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    if isinstance(response, str):
+        response = response.encode('utf-8')
+    
+    depth = 0
+    rs_depth = None
+    rs_elem = None
+    for offset in range(0, len(response) or 1, _FEED_CHUNK):
+        parser.feed(response[offset:offset + _FEED_CHUNK])
+        for event, elem in parser.read_events():
+            if event == 'start':
+                depth += 1
+                if rs_depth is None and elem.tag.endswith('Rs') and not elem.tag.endswith('MsgsRs'):
+                    rs_depth, rs_elem = depth, elem
+                    yield 'status', QBResponse(elem.tag, elem.attrib)
+                continue
+            
+            if rs_depth is not None and depth == rs_depth + 1:
+                # Direct child of the *Rs: a complete record
+                yield 'record', QBRecord(elem.tag, _to_fields(elem))
+                rs_elem.remove(elem)
+            elif depth == rs_depth:
+                rs_depth = rs_elem = None
+                elem.clear()
+            depth -= 1
+    parser.close()
+
+
+def parse_response(response):
+    """
+    Parse a qbXML response into one QBResponse (with records) per *Rs element.
+    
+    Args:
+        response: qbXML response string (or bytes)
+    
+    Returns:
+        list of QBResponse, in document order
+    """
+    responses = []
+    for kind, value in _events(response):
+        if kind == 'status':
+            responses.append(value)
+        else:
+            responses[-1].records.append(value)
+    return responses
+
+
+def iter_records(response, raise_errors=True):
+    """
+    Yield the records of a response one at a time.
+    
+    Args:
+        response: qbXML response string (or bytes)
+        raise_errors: Raise QBXMLError when a *Rs has an error status
+    
+    Yields:
+        QBRecord for each *Ret element
+    """
+    for kind, value in _events(response):
+        if kind == 'status':
+            if raise_errors:
+                value.raise_for_status()
+        else:
+            yield value
+
+
+def parse_single_response(response) -> QBResponse:
+    """
+    Parse a response to a single request.
+    
+    Returns:
+        The QBResponse (with records) of the first *Rs element
+    
+    Raises:
+        QBXMLError: If the reply has no *Rs element
+    """
+    responses = parse_response(response)
+    if not responses:
+        raise QBXMLError('Unknown', 'No response element in QuickBooks reply')
+    return responses[0]
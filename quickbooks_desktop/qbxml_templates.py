@@ -0,0 +1,232 @@
+"""
+qbXML request templates.
+
+One place for every request type this project sends. The *_rq functions
+return an escaped *Rq element (suitable for SessionManager.send_batch);
+request() wraps one or more of them in the shared envelope. Query requests
+depend only on their (hashable) arguments, so the full documents are
+cached: catalog refreshes, customer lists and the first page of invoice
+iterators are built once and reused (Continue/Stop pages carry a one-off
+iteratorID and are built each time).
+
+Usage:
+    from quickbooks_desktop import qbxml_templates as templates
+
+    xml = templates.customer_query(max_returned=10)
+    xml = templates.request(templates.customer_add_rq("O'Brien & Sons"))
+    results = qb.send_batch([templates.item_query_rq(full_names=names)])
+"""
+from functools import lru_cache
+
+from .qbxml_builder import QBXMLBuilder, wrap_envelope
+
+
+# Cached documents per query type
+QUERY_CACHE_SIZE = 256
+
+
+def request(*fragments, on_error='stopOnError'):
+    """Wrap *Rq fragments in a complete qbXML document."""
+    return wrap_envelope(''.join(fragments), on_error)
+
+
+# =============================================================================
+# List queries
+# =============================================================================
+
+def _list_query_rq(tag, full_names, max_returned, active_status, from_modified, include):
+    if full_names and (max_returned is not None or active_status or from_modified):
+        raise ValueError(f"{tag}: full_names cannot be combined with other filters")
+    b = QBXMLBuilder()
+    b.start(tag)
+    for name in full_names:
+        b.element('FullName', name)
+    b.element('MaxReturned', max_returned)
+    b.element('ActiveStatus', active_status)
+    b.element('FromModifiedDate', from_modified)
+    for element in include:
+        b.element('IncludeRetElement', element)
+    b.end()
+    return b.getvalue()
+
+
+def customer_query_rq(full_names=(), max_returned=None, active_status=None, from_modified=None, include=()):
+    """
+    CustomerQueryRq element.
+
+    Args:
+        full_names: Exact names to look up (cannot be combined with the filters)
+        max_returned: Max records
+        active_status: 'ActiveOnly' (QuickBooks default), 'InactiveOnly' or 'All'
+        from_modified: Only records modified at or after this qbXML datetime
+        include: IncludeRetElement names (trims the response to these fields)
+    """
+    return _list_query_rq('CustomerQueryRq', tuple(full_names), max_returned, active_status,
+                          from_modified, tuple(include))
+
+
+def item_query_rq(full_names=(), max_returned=None, active_status=None, from_modified=None, include=()):
+    """ItemQueryRq element (all item types); arguments as for customer_query_rq."""
+    return _list_query_rq('ItemQueryRq', tuple(full_names), max_returned, active_status,
+                          from_modified, tuple(include))
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _customer_query(full_names, max_returned, active_status, from_modified, include):
+    return request(customer_query_rq(full_names, max_returned, active_status, from_modified, include))
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _item_query(full_names, max_returned, active_status, from_modified, include):
+    return request(item_query_rq(full_names, max_returned, active_status, from_modified, include))
+
+
+def customer_query(full_names=(), max_returned=None, active_status=None, from_modified=None, include=()):
+    """Complete CustomerQuery document (cached); arguments as for customer_query_rq."""
+    return _customer_query(tuple(full_names), max_returned, active_status, from_modified, tuple(include))
+
+
+def item_query(full_names=(), max_returned=None, active_status=None, from_modified=None, include=()):
+    """Complete ItemQuery document (cached); arguments as for customer_query_rq."""
+    return _item_query(tuple(full_names), max_returned, active_status, from_modified, tuple(include))
+
+
+# =============================================================================
+# Invoice queries
+# =============================================================================
+
+def invoice_query_rq(max_returned=None, iterator=None, iterator_id=None, from_modified=None,
+                     include_line_items=False, include=()):
+    """
+    InvoiceQueryRq element.
+
+    Args:
+        max_returned: Max invoices (per page when iterating)
+        iterator: 'Start', 'Continue' or 'Stop' to page with a qbXML iterator
+        iterator_id: iteratorID from the previous page (Continue/Stop)
+        from_modified: Only invoices modified at or after this qbXML datetime
+        include_line_items: Return InvoiceLineRet elements too
+        include: IncludeRetElement names
+    """
+    attrs = {}
+    if iterator:
+        attrs['iterator'] = iterator
+    if iterator_id:
+        attrs['iteratorID'] = iterator_id
+    b = QBXMLBuilder()
+    b.start('InvoiceQueryRq', **attrs)
+    if iterator != 'Stop':
+        b.element('MaxReturned', max_returned)
+        if from_modified:
+            b.start('ModifiedDateRangeFilter')
+            b.element('FromModifiedDate', from_modified)
+            b.end()
+        if include_line_items:
+            b.element('IncludeLineItems', 'true')
+        for element in include:
+            b.element('IncludeRetElement', element)
+    b.end()
+    return b.getvalue()
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _invoice_query(max_returned, iterator, from_modified, include_line_items, include):
+    return request(invoice_query_rq(max_returned, iterator, None, from_modified,
+                                    include_line_items, include))
+
+
+def invoice_query(max_returned=None, iterator=None, iterator_id=None, from_modified=None,
+                  include_line_items=False, include=()):
+    """
+    Complete InvoiceQuery document; arguments as for invoice_query_rq.
+
+    Cached unless iterator_id is set: every iteratorID is used for one
+    iterator only, so caching Continue/Stop pages would just evict the
+    reusable documents.
+    """
+    if iterator_id is not None:
+        return request(invoice_query_rq(max_returned, iterator, iterator_id, from_modified,
+                                        include_line_items, tuple(include)))
+    return _invoice_query(max_returned, iterator, from_modified, include_line_items, tuple(include))
+
+
+# =============================================================================
+# Adds
+# =============================================================================
+
+def customer_add_rq(name, company_name=None):
+    """CustomerAddRq element (company name defaults to the customer name)."""
+    b = QBXMLBuilder()
+    b.start('CustomerAddRq').start('CustomerAdd')
+    b.element('Name', name)
+    b.element('CompanyName', company_name if company_name is not None else name)
+    b.end().end()
+    return b.getvalue()
+
+
+def item_service_add_rq(name, description="", price=0.0, account="Sales"):
+    """
+    ItemServiceAddRq element.
+
+    Args:
+        name: Item name
+        description: Sales description (defaults to the name)
+        price: Default price
+        account: Income account full name (must exist in the company file)
+    """
+    b = QBXMLBuilder()
+    b.start('ItemServiceAddRq').start('ItemServiceAdd')
+    b.element('Name', name)
+    b.start('SalesOrPurchase')
+    b.element('Desc', description or name)
+    b.element('Price', f"{float(price):.2f}")
+    b.ref('AccountRef', account)
+    b.end()
+    b.end().end()
+    return b.getvalue()
+
+
+def invoice_add_rq(customer, txn_date, memo, lines, builder=None):
+    """
+    InvoiceAddRq element.
+
+    Args:
+        customer: Customer full name
+        txn_date: YYYY-MM-DD
+        memo: Invoice memo (None to omit)
+        lines: Iterable of (item full name, description, quantity, rate) -
+            consumed once, so it can be a generator
+        builder: QBXMLBuilder to append to (e.g. to write_to() a stream)
+
+    Returns:
+        The element, or the builder if one was passed in
+    """
+    b = builder or QBXMLBuilder()
+    b.start('InvoiceAddRq').start('InvoiceAdd')
+    b.ref('CustomerRef', customer)
+    b.element('TxnDate', txn_date)
+    b.element('Memo', memo)
+    for item, description, quantity, rate in lines:
+        b.start('InvoiceLineAdd')
+        b.ref('ItemRef', item)
+        b.element('Desc', description)
+        b.element('Quantity', quantity)
+        b.element('Rate', rate if isinstance(rate, str) else f"{rate:.2f}")
+        b.end()
+    b.end().end()
+    return b if builder is not None else b.getvalue()
+
+
+def customer_add(name, company_name=None):
+    """Complete CustomerAdd document."""
+    return request(customer_add_rq(name, company_name))
+
+
+def item_service_add(name, description="", price=0.0, account="Sales"):
+    """Complete ItemServiceAdd document."""
+    return request(item_service_add_rq(name, description, price, account))
+
+
+def invoice_add(customer, txn_date, memo, lines):
+    """Complete InvoiceAdd document; arguments as for invoice_add_rq."""
+    return request(invoice_add_rq(customer, txn_date, memo, lines))
@@ -2,12 +2,60 @@
 QuickBooks Desktop Session Manager
 Wraps the QB SDK connection lifecycle for Python.
 """
+import os
+import re
 import sys
-# CRITICAL: Set COM threading model BEFORE importing pythoncom
-# 0 = COINIT_MULTITHREADED (required for Flask/web apps)
-if not hasattr(sys, 'coinit_flags'):
-    sys.coinit_flags = 0
-import pythoncom
+import threading
+
+from .batch import (
+    DEFAULT_MAX_BATCH_BYTES,
+    DEFAULT_MAX_BATCH_SIZE,
+    BatchResult,
+    build_envelope,
+    chunk_requests,
+    parse_batch_response,
+    tag_requests,
+)
+from .progress import stage
+
+
+# 'com' (QBXMLRP2 via win32com) or 'fake' (in-memory FakeRequestProcessor)
+REQUEST_PROCESSOR = os.getenv('QB_REQUEST_PROCESSOR', 'com').lower()
+
+# First request element of a message set (skips the QBXMLMsgsRq wrapper)
+_REQUEST_TYPE = re.compile(r'<(?!QBXMLMsgsRq)(\w+Rq)\b')
+
+_pythoncom = None
+_pythoncom_loaded = False
+_pythoncom_lock = threading.Lock()
+
+
+def load_pythoncom():
+    """
+    Import pythoncom on first use instead of at module import.
+    
+    Returns:
+        The pythoncom module, or None if pywin32 is not installed (not on
+        Windows - only the fake request processor can be used)
+    """
+    global _pythoncom, _pythoncom_loaded
+    with _pythoncom_lock:
+        if not _pythoncom_loaded:
+            # CRITICAL: Set COM threading model BEFORE importing pythoncom
+            # 0 = COINIT_MULTITHREADED (required for Flask/web apps)
+            if not hasattr(sys, 'coinit_flags'):
+                sys.coinit_flags = 0
+            try:
+                import pythoncom
+                _pythoncom = pythoncom
+            except ImportError:
+                _pythoncom = None
+            _pythoncom_loaded = True
+        return _pythoncom
+
+
+class QBConnectionError(Exception):
+    """Raised when the COM connection, session or a request round trip fails."""
 
 
 class SessionManager:
@@ -20,32 +68,60 @@ class SessionManager:
         qb.begin_session()
         response = qb.send_request(xml_request)
         qb.close_qb()
+    
+    With QB_REQUEST_PROCESSOR=fake (or a processor_factory) the COM object
+    is replaced by a pure-Python stand-in, e.g. for load tests on Linux.
     """
     
-    def __init__(self, application_name="UniversalCellularInvoiceAutomation"):
+    def __init__(self, application_name="UniversalCellularInvoiceAutomation", processor_factory=None):
         """
         Initialize the QB connection manager.
         
         Args:
             application_name: Name that appears in QB authorization dialog
+            processor_factory: Callable returning an object with the
+                QBXMLRP2.RequestProcessor methods, used instead of the COM
+                object (default: per QB_REQUEST_PROCESSOR)
         """
         self.application_name = application_name
+        if processor_factory is None and REQUEST_PROCESSOR == 'fake':
+            from .fake_processor import processor_from_env
+            processor_factory = processor_from_env
+        self.processor_factory = processor_factory
         self.qbXMLRP = None
         self.ticket = None
         self.connection_open = False
         self.session_begun = False
         self.com_initialized = False
-        
+    
     def open_connection(self):
         """
         Open connection to QuickBooks.
         
         Raises:
-            Exception: If connection fails or QB is not running
+            QBConnectionError: If connection fails or QB is not running
         """
         if self.connection_open:
             return
         
+        with stage('qb_open_connection'):
+            self._open_connection()
+    
+    def _open_connection(self):
+        if self.processor_factory is not None:
+            try:
+                self.qbXMLRP = self.processor_factory()
+                self.qbXMLRP.OpenConnection("", self.application_name)
+                self.connection_open = True
+            except Exception as e:
+                raise QBConnectionError(f"Failed to connect to QuickBooks: {str(e)}")
+            return
+        
+        pythoncom = load_pythoncom()
+        if pythoncom is None:
+            raise QBConnectionError("Failed to connect to QuickBooks: pywin32 is not installed "
+                                    "(set QB_REQUEST_PROCESSOR=fake to use the offline processor)")
+        
         try:
             import win32com.client
             # Try to initialize COM - may already be initialized by caller (e.g., create_qb_invoice)
@@ -59,8 +135,8 @@ class SessionManager:
             self.qbXMLRP.OpenConnection("", self.application_name)
             self.connection_open = True
         except Exception as e:
-            raise Exception(f"Failed to connect to QuickBooks: {str(e)}. Is QuickBooks running?")
-        
+            raise QBConnectionError(f"Failed to connect to QuickBooks: {str(e)}. Is QuickBooks running?")
+    
     def begin_session(self, qb_file_path="", mode=0):
         """
         Begin a session with a QuickBooks company file.
@@ -68,43 +144,95 @@ class SessionManager:
         Args:
             qb_file_path: Path to .qbw file (empty string = currently open file)
             mode: 0 = Do Not Care, 1 = Single User, 2 = Multi-User
-            
+        
         Raises:
-            Exception: If session cannot be started
+            QBConnectionError: If session cannot be started
         """
         if not self.connection_open:
             raise Exception("Must open connection before beginning session")
-            
+        
         if self.session_begun:
             return
         
         try:
-            self.ticket = self.qbXMLRP.BeginSession(qb_file_path, mode)
+            with stage('qb_begin_session'):
+                self.ticket = self.qbXMLRP.BeginSession(qb_file_path, mode)
             self.session_begun = True
         except Exception as e:
-            raise Exception(f"Failed to begin session: {str(e)}. Is a company file open in QuickBooks?")
-        
+            raise QBConnectionError(f"Failed to begin session: {str(e)}. Is a company file open in QuickBooks?")
+    
     def send_request(self, xml_request):
         """
         Send qbXML request and return response.
         
         Args:
             xml_request: Full qbXML request string
-            
+        
         Returns:
             XML response string from QuickBooks
-            
+        
         Raises:
-            Exception: If request fails
+            QBConnectionError: If request fails
         """
         if not self.session_begun:
             raise Exception("Must begin session before sending requests")
         
-        try:
-            return self.qbXMLRP.ProcessRequest(self.ticket, xml_request)
-        except Exception as e:
-            raise Exception(f"Request failed: {str(e)}")
+        request_type = _REQUEST_TYPE.search(xml_request)
+        with stage('qb_request', request=request_type.group(1) if request_type else None,
+                   bytes_sent=len(xml_request)) as info:
+            try:
+                response = self.qbXMLRP.ProcessRequest(self.ticket, xml_request)
+            except Exception as e:
+                raise QBConnectionError(f"Request failed: {str(e)}")
+            info['bytes_received'] = len(response)
+            return response
+    
+    def send_batch(self, requests, on_error="continueOnError",
+                   max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_batch_bytes=DEFAULT_MAX_BATCH_BYTES):
+        """
+        Send many requests in as few ProcessRequest round trips as possible.
+        
+        Requests are tagged with requestIDs, packed into QBXMLMsgsRq
+        envelopes (split above max_batch_size requests / max_batch_bytes),
+        and the responses are matched back by requestID.
+        
+        Args:
+            requests: Iterable of *Rq XML fragments (no envelope), e.g.
+                '<ItemQueryRq><FullName>X</FullName></ItemQueryRq>'. A
+                requestID is added unless the fragment already has one.
+            on_error: 'continueOnError' (process every request) or
+                'stopOnError' (stop at the first request with an Error
+                status; later requests are returned unprocessed)
+            max_batch_size: Max requests per envelope
+            max_batch_bytes: Approximate max request XML per envelope
+        
+        Returns:
+            list of BatchResult, one per request, in request order
+        
+        Raises:
+            ValueError: If a request is malformed or on_error is invalid
+            QBConnectionError: If a round trip fails
+        """
+        tagged = tag_requests(requests)
+        results = []
+        stopped = False
+        
+        for chunk in chunk_requests(tagged, max_batch_size, max_batch_bytes):
+            if stopped:
+                results.extend(BatchResult.skipped(rid, rtype) for rid, rtype, _ in chunk)
+                continue
+            
+            response = self.send_request(build_envelope([xml for _, _, xml in chunk], on_error))
+            by_id = parse_batch_response(response)
+            
+            for request_id, request_type, _ in chunk:
+                result = by_id.get(request_id) or BatchResult.skipped(request_id, request_type)
+                results.append(result)
+                if on_error == "stopOnError" and not result.ok:
+                    stopped = True
         
+        return results
+    
     def end_session(self):
         """End the QB session."""
         if self.session_begun:
@@ -114,37 +242,37 @@ class SessionManager:
                 pass  # Ignore errors on cleanup
             self.session_begun = False
             self.ticket = None
-            
+    
     def close_connection(self):
         """Close the connection to QuickBooks."""
-        if self.session_begun:
-            self.end_session()
-            
-        if self.connection_open:
-            try:
-                self.qbXMLRP.CloseConnection()
-            except:
-                pass  # Ignore errors on cleanup
-            self.connection_open = False
+        if self.session_begun or self.connection_open:
+            with stage('qb_cleanup'):
+                self.end_session()
+                if self.connection_open:
+                    try:
+                        self.qbXMLRP.CloseConnection()
+                    except:
+                        pass  # Ignore errors on cleanup
+                    self.connection_open = False
         
         # Only uninitialize COM if WE initialized it (not the caller)
         if self.com_initialized:
             try:
-                pythoncom.CoUninitialize()
+                load_pythoncom().CoUninitialize()
             except:
                 pass  # Ignore errors on cleanup
             self.com_initialized = False
-            
+    
     def close_qb(self):
         """Alias for close_connection (for backward compatibility)."""
         self.close_connection()
-        
+    
     def __enter__(self):
         """Context manager entry."""
         self.open_connection()
         self.begin_session()
         return self
-        
+    
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit."""
         self.close_qb()